@@ -0,0 +1,175 @@
+"""
+Сборка бота: Bot, FSM-хранилище, Dispatcher с middleware и роутерами.
+Используется main.py, воркерами sharding.py и бенчмарками.
+"""
+import logging
+
+import asyncpg
+from aiogram import Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.base import BaseSession
+from aiogram.enums import ParseMode
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from broadcaster import Broadcaster
+from config import Config
+from db.db import create_pool, init_db
+from db.slow_queries import slow_query_tracer
+from handlers import common, catalog, master, admin, reviews, info, search
+from metrics import TelegramRequestMetrics, registry, track_pool
+from middleware import (
+    ConcurrencyLimitMiddleware,
+    ConnectionScopeMiddleware,
+    DatabaseMiddleware,
+    FSMFlushMiddleware,
+    HandlerMetricsMiddleware,
+    ThrottlingMiddleware,
+)
+from notifier import NOTIFY_RATE, Notifier, RateLimiter
+from recording import UpdateRecorder, UpdateRecordingMiddleware
+from services.catalog_cache import catalog_cache
+from services.statements import statements
+from storage.memory import TTLMemoryStorage
+from storage.postgres import PostgresStorage
+from user_registry import UserRegistry, UserRegistryMiddleware
+
+logger = logging.getLogger(__name__)
+
+
+def create_bot(config: Config, session: BaseSession | None = None) -> Bot:
+    bot = Bot(
+        token=config.bot.token,
+        session=session,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    )
+    bot.session.middleware(TelegramRequestMetrics())
+    return bot
+
+
+async def setup_database(config: Config, migrate: bool = True) -> asyncpg.pool.Pool:
+    """
+    Создаёт пул и (если migrate) приводит схему к актуальной версии.
+    """
+    try:
+        db_pool = await create_pool(config.db)
+        if migrate:
+            # Инициализация схемы БД
+            await init_db(db_pool)
+            logger.info("База данных инициализирована")
+    except Exception as e:
+        logger.error(f"Критическая ошибка при инициализации БД: {e}")
+        raise
+    track_pool(db_pool)
+    slow_query_tracer.configure(config.slow_queries, db_pool)
+    registry.add_stats("slow_queries", slow_query_tracer.stats)
+    return db_pool
+
+
+def create_storage(config: Config, db_pool: asyncpg.pool.Pool) -> BaseStorage:
+    """
+    FSM-хранилище по настройке FSM_STORAGE.
+    """
+    if config.fsm.storage == "postgres":
+        storage = PostgresStorage(db_pool, ttl=config.fsm.ttl)
+        storage.start()
+        logger.info("FSM-хранилище: PostgreSQL")
+        return storage
+    if config.fsm.storage == "memory-ttl":
+        storage = TTLMemoryStorage(
+            ttl=config.fsm.ttl, max_entries=config.fsm.max_dialogs
+        )
+        storage.start()
+        logger.info("FSM-хранилище: память с TTL")
+        return storage
+    return MemoryStorage()
+
+
+def build_dispatcher(
+    config: Config,
+    db_pool: asyncpg.pool.Pool,
+    storage: BaseStorage,
+    send_rate: float = NOTIFY_RATE,
+    run_broadcasts: bool = True,
+) -> Dispatcher:
+    """
+    Dispatcher с middleware и всеми роутерами из handlers/*.
+    Роутеры — модульные объекты, поэтому в одном процессе диспетчер собирается один раз.
+    send_rate — сообщений в секунду на процесс (при нескольких процессах лимит
+    Bot API делится между ними); run_broadcasts=False — не запускать рассылку
+    в этом процессе (приёмник sharding.py).
+    """
+    dp = Dispatcher(storage=storage)
+    if config.recording.path:
+        # Первым: в запись попадают и апдейты, которые отбросит ограничитель
+        recorder = UpdateRecorder(config.recording.path)
+        dp.update.outer_middleware(UpdateRecordingMiddleware(recorder))
+
+        async def close_recorder() -> None:
+            recorder.close()
+
+        dp.shutdown.register(close_recorder)
+    # Ограничитель должен стоять снаружи FSM-middleware aiogram (оно регистрируется
+    # в конструкторе Dispatcher): иначе состояние чата читается до того, как
+    # предыдущий апдейт этого чата закончил его менять.
+    limiter = ConcurrencyLimitMiddleware(config.concurrency)
+    dp.update.outer_middleware.unregister(dp.fsm)
+    dp.update.outer_middleware(limiter)
+    # Соединение апдейта — снаружи FSM: состояние читается и сбрасывается
+    # на том же соединении, что и запросы хендлера
+    dp.update.outer_middleware(ConnectionScopeMiddleware(db_pool))
+    dp.update.outer_middleware(dp.fsm)
+    # Сброс буфера FSM одним запросом после каждого апдейта
+    dp.update.outer_middleware(FSMFlushMiddleware())
+    # Учёт пользователей для рассылок: в памяти, в БД — пачками
+    user_registry = UserRegistry(db_pool)
+    dp.update.outer_middleware(UserRegistryMiddleware(user_registry))
+    dp.shutdown.register(user_registry.close)
+
+    # Время хендлеров — первым, чтобы учесть и остальные middleware
+    dp.message.middleware(HandlerMetricsMiddleware())
+    dp.callback_query.middleware(HandlerMetricsMiddleware())
+
+    # Анти-флуд до DatabaseMiddleware: отброшенное событие не берёт соединение.
+    # Одна таблица корзин на сообщения и кнопки — группы общие.
+    throttling = ThrottlingMiddleware()
+    dp.message.middleware(throttling)
+    dp.callback_query.middleware(throttling)
+
+    # Регистрируем middleware для передачи db_pool и config в хендлеры
+    dp.message.middleware(DatabaseMiddleware(db_pool, config))
+    dp.callback_query.middleware(DatabaseMiddleware(db_pool, config))
+    dp.my_chat_member.middleware(DatabaseMiddleware(db_pool, config))
+
+    # Уведомления пользователям из хендлеров и рассылки — в фоне,
+    # с общим ограничением скорости отправки
+    send_limiter = RateLimiter(send_rate)
+    notifier = Notifier(send_limiter)
+    dp["notifier"] = notifier
+    dp.shutdown.register(notifier.close)
+    broadcaster = Broadcaster(db_pool, send_limiter, on_blocked=user_registry.forget)
+    dp["broadcaster"] = broadcaster
+    if run_broadcasts:
+        dp.startup.register(broadcaster.start)
+    dp.shutdown.register(broadcaster.close)
+
+    # Регистрируем роутеры
+    dp.include_router(common.router)
+    dp.include_router(catalog.router)
+    dp.include_router(master.router)
+    dp.include_router(admin.router)
+    dp.include_router(reviews.router)
+    dp.include_router(info.router)
+    # Поиск последним: в режиме поиска кнопки меню должны обрабатываться своими роутерами
+    dp.include_router(search.router)
+
+    registry.add_stats("update_queue", limiter.stats)
+    registry.add_stats("throttling", throttling.stats, label="group")
+    registry.add_stats("catalog_cache", catalog_cache.stats)
+    registry.add_stats("notifier", notifier.stats, label="result")
+    registry.add_stats("broadcast", broadcaster.stats, label="result")
+    registry.add_stats("user_registry", user_registry.stats)
+    registry.add_stats("statements", lambda: {"calls": statements.stats()}, label="statement")
+    if hasattr(storage, "stats"):
+        registry.add_stats("fsm", storage.stats)
+    return dp
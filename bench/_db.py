@@ -0,0 +1,133 @@
+"""
+Общие помощники для бенчмарков: отдельная схема в БД из .env,
+чтобы замеры не трогали рабочие таблицы.
+"""
+from typing import List
+import statistics
+
+import asyncpg
+
+from config import load_db_config
+from db.db import init_connection
+from db.migrate import apply_migrations
+from services.reviews_service import reconcile_master_ratings
+
+
+async def create_bench_pool(schema: str, max_size: int = 10) -> asyncpg.pool.Pool:
+    """
+    Создаёт схему `schema` заново, пул с search_path на неё и накатывает миграции.
+    """
+    db = load_db_config()
+    conn = await asyncpg.connect(
+        host=db.host, port=db.port, user=db.user, password=db.password, database=db.name
+    )
+    try:
+        await conn.execute(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE;')
+        await conn.execute(f'CREATE SCHEMA "{schema}";')
+    finally:
+        await conn.close()
+
+    pool = await asyncpg.create_pool(
+        host=db.host,
+        port=db.port,
+        user=db.user,
+        password=db.password,
+        database=db.name,
+        min_size=1,
+        max_size=max_size,
+        server_settings={"search_path": schema, "jit": "off"},
+        init=init_connection,
+    )
+    await apply_migrations(pool)
+    return pool
+
+
+async def drop_bench_schema(pool: asyncpg.pool.Pool, schema: str) -> None:
+    async with pool.acquire() as conn:
+        await conn.execute(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE;')
+
+
+async def seed_masters(pool: asyncpg.pool.Pool, count: int) -> None:
+    """
+    Генерирует `count` одобренных мастеров со случайными русскими текстами.
+    Подзапросы зависят от i, чтобы Postgres вычислял их для каждой строки.
+    """
+    async with pool.acquire() as conn:
+        await conn.execute(
+            """
+            INSERT INTO masters (
+                name, category, description, price_min, price_max,
+                status, rating, reviews_count
+            )
+            SELECT
+                (ARRAY['Иван', 'Пётр', 'Алексей', 'Сергей', 'Дмитрий',
+                       'Андрей', 'Михаил', 'Николай', 'Ольга', 'Марина'])
+                    [1 + (random() * 9)::int]
+                || ' '
+                || (ARRAY['Иванов', 'Петров', 'Смирнов', 'Кузнецов', 'Попов',
+                          'Соколов', 'Лебедев', 'Козлов', 'Новиков', 'Морозов'])
+                    [1 + (random() * 9)::int],
+                (ARRAY['Сантехника', 'Электрика', 'Ремонт'])[1 + i % 3],
+                array_to_string(ARRAY(
+                    SELECT (ARRAY['установка', 'ремонт', 'замена', 'смесителей',
+                                  'розеток', 'проводки', 'унитазов', 'труб',
+                                  'плитки', 'ламината', 'обоев', 'дверей',
+                                  'стиральных', 'машин', 'котлов', 'счётчиков',
+                                  'быстро', 'недорого', 'гарантия', 'выезд'])
+                        [1 + (random() * 19)::int]
+                    FROM generate_series(1, 10 + i % 3)
+                ), ' '),
+                500 + (random() * 5000)::int,
+                6000 + (random() * 20000)::int,
+                'approved',
+                round((1 + random() * 4)::numeric, 2),
+                (random() * 200)::int
+            FROM generate_series(1, $1) AS i;
+            """,
+            count,
+        )
+        await conn.execute("ANALYZE masters;")
+
+
+async def seed_reviews(pool: asyncpg.pool.Pool, count: int) -> None:
+    """
+    Генерирует `count` видимых отзывов к случайным мастерам
+    и пересчитывает агрегаты рейтинга.
+    """
+    async with pool.acquire() as conn:
+        await conn.execute(
+            """
+            INSERT INTO reviews (master_id, user_id, username, rating, text)
+            SELECT
+                m.ids[1 + (random() * (array_length(m.ids, 1) - 1))::int],
+                1000000 + i,
+                'bench_' || i,
+                1 + (random() * 4)::int,
+                'Отзыв ' || i
+            FROM generate_series(1, $1) AS i,
+                 (SELECT array_agg(id) AS ids FROM masters) AS m;
+            """,
+            count,
+        )
+        await conn.execute("ANALYZE reviews;")
+    await reconcile_master_ratings(pool)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def describe(samples: List[float]) -> str:
+    """
+    Короткая сводка по замерам в миллисекундах.
+    """
+    ms = [s * 1000 for s in samples]
+    return (
+        f"n={len(ms)} mean={statistics.fmean(ms):.2f}ms "
+        f"p50={percentile(ms, 50):.2f}ms p95={percentile(ms, 95):.2f}ms "
+        f"p99={percentile(ms, 99):.2f}ms"
+    )
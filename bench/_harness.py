@@ -0,0 +1,136 @@
+"""
+Общая обвязка бенчмарков, которые гоняют апдейты через настоящий Dispatcher
+(bench/load_bench.py, bench/replay.py): бот с FakeTelegramSession, пул и
+хранилище как в main.py, замеры по хендлерам и отчёт.
+"""
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List
+import itertools
+import time
+
+import asyncpg
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.types import TelegramObject, Update
+
+from app import build_dispatcher, create_bot, create_storage, setup_database
+from bench._db import describe, percentile
+from bench.fake_telegram import FakeTelegramSession
+from config import Config
+
+
+class LatencyRecorder(BaseMiddleware):
+    """
+    Inner-middleware: сырые замеры времени по имени хендлера для перцентилей.
+    """
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        name = getattr(getattr(data.get("handler"), "callback", None), "__name__", "unknown")
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.samples[name].append(time.perf_counter() - started)
+
+
+class Harness:
+    def __init__(
+        self,
+        bot: Bot,
+        dp: Dispatcher,
+        session: FakeTelegramSession,
+        db_pool: asyncpg.pool.Pool,
+        storage: BaseStorage,
+        recorder: LatencyRecorder,
+    ):
+        self.bot = bot
+        self.dp = dp
+        self.session = session
+        self.db_pool = db_pool
+        self.storage = storage
+        self.recorder = recorder
+        self.update_ids = itertools.count(1)
+        self.update_samples: List[float] = []
+        self.errors = 0
+
+    async def feed(self, raw: Dict[str, Any]) -> None:
+        update = Update.model_validate(raw, context={"bot": self.bot})
+        started = time.perf_counter()
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception:
+            self.errors += 1
+        finally:
+            self.update_samples.append(time.perf_counter() - started)
+
+
+async def start_harness(config: Config, latency: float = 0.0) -> Harness:
+    """
+    Бот, пул, хранилище и диспетчер как в main.py, но с фейковым Telegram.
+    Схема БД должна быть уже готова (см. bench._db.create_bench_pool).
+    """
+    session = FakeTelegramSession(latency=latency)
+    bot = create_bot(config, session)
+    db_pool = await setup_database(config, migrate=False)
+    storage = create_storage(config, db_pool)
+    dp = build_dispatcher(config, db_pool, storage)
+    recorder = LatencyRecorder()
+    dp.message.middleware(recorder)
+    dp.callback_query.middleware(recorder)
+    return Harness(bot, dp, session, db_pool, storage, recorder)
+
+
+async def stop_harness(harness: Harness) -> None:
+    await harness.dp.emit_shutdown(bot=harness.bot)
+    await harness.storage.close()
+    await harness.db_pool.close()
+
+
+def summary(harness: Harness, elapsed: float) -> Dict[str, Any]:
+    """
+    Итоги замера в виде словаря (для сохранения в JSON и сравнения прогонов), мс.
+    """
+
+    def stats(samples: List[float]) -> Dict[str, float]:
+        ms = [s * 1000 for s in samples]
+        return {
+            "n": len(ms),
+            "p50": percentile(ms, 50),
+            "p95": percentile(ms, 95),
+            "p99": percentile(ms, 99),
+        }
+
+    updates = len(harness.update_samples)
+    return {
+        "updates": updates,
+        "elapsed": elapsed,
+        "updates_per_sec": updates / elapsed if elapsed else 0.0,
+        "errors": harness.errors,
+        "update": stats(harness.update_samples),
+        "handlers": {
+            name: stats(samples) for name, samples in harness.recorder.samples.items()
+        },
+    }
+
+
+def report(harness: Harness, elapsed: float) -> None:
+    updates = len(harness.update_samples)
+    print(
+        f"\nАпдейтов: {updates} за {elapsed:.1f} с — {updates / elapsed:.0f} апдейтов/с, "
+        f"ошибок: {harness.errors}"
+    )
+    print(f"Апдейт целиком: {describe(harness.update_samples)}")
+    print("\nХендлеры:")
+    for name, samples in sorted(harness.recorder.samples.items(), key=lambda item: -len(item[1])):
+        print(f"  {name:<28} {describe(samples)}")
+    print("\nВызовы Bot API:")
+    for method, count in harness.session.calls.most_common():
+        print(f"  {method:<28} {count}")
@@ -0,0 +1,81 @@
+"""
+Сессия Bot, которая вместо запросов к Telegram сразу возвращает
+правдоподобный ответ. Нужна бенчмаркам: хендлеры работают как обычно,
+но сеть не участвует (можно добавить искусственную задержку latency).
+
+Считает вызовы по методам (calls) и помнит последнее сообщение бота
+с inline-клавиатурой в каждом чате (keyboard_messages) — по нему
+сценарии нагрузочного теста «нажимают» кнопки.
+"""
+from collections import Counter
+from typing import Any, AsyncGenerator, Dict, Optional
+import asyncio
+import itertools
+import json
+import time
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import InlineKeyboardMarkup
+
+
+class FakeTelegramSession(BaseSession):
+    def __init__(self, latency: float = 0.0, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self.keyboard_messages: Dict[int, Dict[str, Any]] = {}
+        self._message_ids = itertools.count(1)
+
+    def _result(self, bot: Bot, method: TelegramMethod) -> Any:
+        name = method.__api_method__
+        if name == "getMe":
+            return {"id": bot.id, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is not None and name.startswith(("send", "edit")):
+            message: Dict[str, Any] = {
+                "message_id": getattr(method, "message_id", None) or next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": int(chat_id), "type": "private"},
+            }
+            text = getattr(method, "text", None) or getattr(method, "caption", None)
+            if text:
+                message["text"] = text
+            markup = getattr(method, "reply_markup", None)
+            if isinstance(markup, InlineKeyboardMarkup):
+                message["reply_markup"] = markup.model_dump(mode="json", exclude_none=True)
+                self.keyboard_messages[int(chat_id)] = message
+            return message
+        return True
+
+    async def make_request(
+        self,
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+        timeout: Optional[int] = None,
+    ) -> TelegramType:
+        self.calls[method.__api_method__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        content = json.dumps({"ok": True, "result": self._result(bot, method)})
+        response = self.check_response(
+            bot=bot, method=method, status_code=200, content=content
+        )
+        return response.result
+
+    async def stream_content(
+        self,
+        url: str,
+        headers: Optional[Dict[str, Any]] = None,
+        timeout: int = 30,
+        chunk_size: int = 65536,
+        raise_for_status: bool = True,
+    ) -> AsyncGenerator[bytes, None]:
+        raise NotImplementedError("FakeTelegramSession не скачивает файлы")
+        yield b""
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,210 @@
+"""
+Нагрузочный тест всего бота: настоящий Dispatcher (app.build_dispatcher)
+со всеми роутерами и middleware, БД из .env в отдельной схеме
+и фейковый Telegram (FakeTelegramSession) вместо сети.
+
+Виртуальные пользователи проходят сценарии:
+- browse — /start, каталог, смена категории и сортировки;
+- carousel — каталог, «Смотреть мастеров» и листание карточек;
+- lookup — карточка по #ID;
+- review — карточка по #ID и отзыв через форму;
+- apply — заявка мастера от начала до подтверждения.
+
+Сценарии запускаются с частотой --rate в секунду в течение --duration секунд.
+Отчёт: p50/p95/p99 по каждому хендлеру и апдейтов в секунду.
+
+Запуск:
+    python -m bench.load_bench --masters 10000 --reviews 50000 --rate 50 --duration 30
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import time
+
+from bench._db import create_bench_pool, drop_bench_schema, seed_masters, seed_reviews
+from bench._harness import Harness, report, start_harness, stop_harness
+from config import load_config
+
+SCHEMA = "bench_load"
+
+# Сценарий -> вес в смеси
+JOURNEY_MIX = {
+    "browse": 4,
+    "carousel": 3,
+    "lookup": 4,
+    "review": 1,
+    "apply": 1,
+}
+
+
+class VirtualUser:
+    def __init__(self, harness: Harness, user_id: int):
+        self.harness = harness
+        self.user = {
+            "id": user_id,
+            "is_bot": False,
+            "first_name": "Bench",
+            "username": f"bench{user_id}",
+        }
+
+    async def send(self, text: str) -> None:
+        update_id = next(self.harness.update_ids)
+        await self.harness.feed({
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": self.user["id"], "type": "private", "first_name": "Bench"},
+                "from": self.user,
+                "text": text,
+            },
+        })
+
+    async def press(self, match: str) -> bool:
+        """
+        Нажать первую кнопку, в callback_data которой есть match,
+        в последнем сообщении бота с клавиатурой. False — такой кнопки нет.
+        """
+        message = self.harness.session.keyboard_messages.get(self.user["id"])
+        if message is None:
+            return False
+        for row in message["reply_markup"].get("inline_keyboard", []):
+            for button in row:
+                data = button.get("callback_data")
+                if data and match in data:
+                    update_id = next(self.harness.update_ids)
+                    await self.harness.feed({
+                        "update_id": update_id,
+                        "callback_query": {
+                            "id": str(update_id),
+                            "from": self.user,
+                            "chat_instance": str(self.user["id"]),
+                            "message": message,
+                            "data": data,
+                        },
+                    })
+                    return True
+        return False
+
+
+async def journey_browse(user: VirtualUser, rnd: random.Random, masters: int) -> None:
+    await user.send("/start")
+    await user.send("Каталог мастеров")
+    await user.press(f"catalog:cat:{rnd.choice(['Сантехника', 'Электрика', 'Ремонт'])}")
+    await user.press(f"catalog:sort:{rnd.choice(['price', 'reviews'])}")
+
+
+async def journey_carousel(user: VirtualUser, rnd: random.Random, masters: int) -> None:
+    await user.send("Каталог мастеров")
+    await user.press("catalog:view:")
+    for _ in range(rnd.randint(2, 5)):
+        if not await user.press(":next:"):
+            break
+
+
+async def journey_lookup(user: VirtualUser, rnd: random.Random, masters: int) -> None:
+    await user.send(f"#{rnd.randint(1, masters)}")
+
+
+async def journey_review(user: VirtualUser, rnd: random.Random, masters: int) -> None:
+    await user.send(f"#{rnd.randint(1, masters)}")
+    if not await user.press("review:add:"):
+        return
+    await user.send(str(rnd.randint(1, 5)))
+    await user.send("Всё сделал быстро и аккуратно")
+    await user.send("Да")
+
+
+async def journey_apply(user: VirtualUser, rnd: random.Random, masters: int) -> None:
+    for text in (
+        "Стать мастером",
+        "Иван Тестов",
+        "+79990000000",
+        "-",
+        rnd.choice(["Сантехника", "Электрика", "Ремонт"]),
+        "Установка смесителей и замена труб",
+        "1000 5000",
+        "-",
+        "Да",
+    ):
+        await user.send(text)
+
+
+JOURNEYS = {
+    "browse": journey_browse,
+    "carousel": journey_carousel,
+    "lookup": journey_lookup,
+    "review": journey_review,
+    "apply": journey_apply,
+}
+
+
+async def drive(harness: Harness, rate: float, duration: float, masters: int, seed: int) -> float:
+    """
+    Запускать сценарии с частотой rate в секунду (у каждого свой пользователь)
+    и дождаться завершения всех. Возвращает затраченное время.
+    """
+    rnd = random.Random(seed)
+    names = list(JOURNEY_MIX)
+    weights = [JOURNEY_MIX[name] for name in names]
+    user_ids = itertools.count(5_000_000)
+    tasks = set()
+
+    started = time.perf_counter()
+    for i in itertools.count():
+        if time.perf_counter() - started >= duration:
+            break
+        journey = JOURNEYS[rnd.choices(names, weights)[0]]
+        user = VirtualUser(harness, next(user_ids))
+        task = asyncio.create_task(journey(user, random.Random(rnd.random()), masters))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        delay = started + (i + 1) / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return time.perf_counter() - started
+
+
+async def run(args: argparse.Namespace) -> None:
+    bench_pool = await create_bench_pool(SCHEMA)
+    harness = None
+    try:
+        print(f"Генерирую {args.masters} мастеров и {args.reviews} отзывов...")
+        await seed_masters(bench_pool, args.masters)
+        await seed_reviews(bench_pool, args.reviews)
+
+        os.environ.setdefault("BOT_TOKEN", "42:TEST")
+        os.environ["DB_SCHEMA"] = SCHEMA
+        os.environ["METRICS_PORT"] = "0"
+        config = load_config()
+
+        harness = await start_harness(config, args.latency)
+        print(f"Нагрузка: {args.rate} сценариев/с в течение {args.duration} с")
+        elapsed = await drive(harness, args.rate, args.duration, args.masters, args.seed)
+        report(harness, elapsed)
+    finally:
+        if harness is not None:
+            await stop_harness(harness)
+        if not args.keep:
+            await drop_bench_schema(bench_pool, SCHEMA)
+        await bench_pool.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--masters", type=int, default=10_000)
+    parser.add_argument("--reviews", type=int, default=50_000)
+    parser.add_argument("--rate", type=float, default=50, help="сценариев в секунду")
+    parser.add_argument("--duration", type=float, default=30, help="секунд")
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка фейкового Telegram, с")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep", action="store_true", help="не удалять схему после замера")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
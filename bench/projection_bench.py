@@ -0,0 +1,84 @@
+"""
+Память и пропускная способность списка мастеров для админки:
+SELECT * в asyncpg.Record против узкой проекции в MasterListItem.
+
+Запуск (нужен PostgreSQL из .env):
+    python -m bench.projection_bench --masters 10000 --repeat 20
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from bench._db import create_bench_pool, drop_bench_schema, seed_masters, describe
+from services.masters_service import LIST_SELECT
+from services.models import MasterListItem
+
+SCHEMA = "bench_projection"
+
+# Прежняя реализация списка мастеров для админки — для сравнения.
+SELECT_ALL_SQL = "SELECT * FROM masters ORDER BY created_at DESC;"
+# Та же выборка с узкой проекцией (бывшая get_all_masters; админка теперь
+# листает страницы через get_masters_page).
+SELECT_SLIM_SQL = f"SELECT {LIST_SELECT} FROM masters ORDER BY created_at DESC;"
+
+
+async def _select_all(pool):
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(SELECT_ALL_SQL)
+    # Рендер раньше делал float() над Decimal для каждой строки.
+    for row in rows:
+        float(row["rating"] or 0)
+    return list(rows)
+
+
+async def _slim(pool):
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(SELECT_SLIM_SQL)
+    return [MasterListItem.from_record(row) for row in rows]
+
+
+async def _measure(pool, fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn(pool)
+        samples.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    result = await fn(pool)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return samples, peak, len(result)
+
+
+async def run(masters: int, repeat: int, keep: bool) -> None:
+    pool = await create_bench_pool(SCHEMA)
+    try:
+        print(f"Генерирую {masters} мастеров...")
+        await seed_masters(pool, masters)
+
+        for title, fn in (("SELECT *", _select_all), ("проекция", _slim)):
+            samples, peak, rows = await _measure(pool, fn, repeat)
+            rows_per_sec = rows * len(samples) / sum(samples)
+            print(
+                f"{title:>10}: {describe(samples)}, {rows_per_sec:,.0f} строк/с, "
+                f"пик памяти {peak / 1024 / 1024:.1f} МБ"
+            )
+    finally:
+        if not keep:
+            await drop_bench_schema(pool, SCHEMA)
+        await pool.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--masters", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="не удалять схему после замера")
+    args = parser.parse_args()
+    asyncio.run(run(args.masters, args.repeat, args.keep))
+
+
+if __name__ == "__main__":
+    main()
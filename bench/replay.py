@@ -0,0 +1,141 @@
+"""
+Воспроизведение записанных апдейтов (recording.py) через настоящий Dispatcher
+с фейковым Telegram и локальной БД — чтобы сравнивать релизы на одной нагрузке.
+
+Скорость: --speed 1 — как в записи, 10 — в десять раз быстрее,
+0 — без пауз (максимальная пропускная способность). Отчёт — перцентили
+по хендлерам и апдейтов в секунду; --json сохраняет итоги, --compare
+печатает разницу с итогами прошлого прогона.
+
+Записанные #ID и кнопки ссылаются на мастеров рабочей БД, поэтому
+в схеме замера генерируется --masters мастеров (id 1..N).
+
+Запуск:
+    python -m bench.replay updates.ndjson.gz --speed 10 --masters 5000 --json new.json --compare old.json
+"""
+from typing import Any, Dict, Iterator, List, Tuple
+import argparse
+import asyncio
+import heapq
+import json
+import os
+import time
+
+from bench._db import create_bench_pool, describe, drop_bench_schema, seed_masters, seed_reviews
+from bench._harness import Harness, report, start_harness, stop_harness, summary
+from config import load_config
+from recording import read_recording
+
+SCHEMA = "bench_replay"
+
+
+def merged_recordings(paths: List[str]) -> Iterator[Tuple[float, Dict[str, Any]]]:
+    """
+    Апдейты из нескольких файлов (например, по одному на воркер) в порядке времени.
+    """
+    return heapq.merge(*(read_recording(path) for path in paths), key=lambda entry: entry[0])
+
+
+async def replay(
+    harness: Harness,
+    entries: Iterator[Tuple[float, Dict[str, Any]]],
+    speed: float,
+) -> Tuple[float, List[float]]:
+    """
+    Подать апдейты в диспетчер с исходными интервалами, делёнными на speed.
+    Возвращает затраченное время и отставания от расписания (секунды).
+    """
+    tasks = set()
+    lags: List[float] = []
+    first_t = None
+    started = time.perf_counter()
+    for i, (t, raw) in enumerate(entries, 1):
+        if first_t is None:
+            first_t = t
+        if speed:
+            delay = started + (t - first_t) / speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                lags.append(-delay)
+        task = asyncio.create_task(harness.feed(raw))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        if not speed and i % 1000 == 0:
+            # Даём обработке идти параллельно с чтением файла
+            await asyncio.sleep(0)
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return time.perf_counter() - started, lags
+
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any]) -> None:
+    print("\nСравнение с прошлым прогоном (p95, мс):")
+    print(
+        f"  {'апдейтов/с':<28} {previous['updates_per_sec']:.0f} -> "
+        f"{current['updates_per_sec']:.0f}"
+    )
+    rows = [("апдейт целиком", previous["update"], current["update"])]
+    for name, stats in current["handlers"].items():
+        if name in previous["handlers"]:
+            rows.append((name, previous["handlers"][name], stats))
+    for name, old, new in rows:
+        change = (new["p95"] - old["p95"]) / old["p95"] * 100 if old["p95"] else 0.0
+        print(f"  {name:<28} {old['p95']:.2f} -> {new['p95']:.2f} ({change:+.0f}%)")
+
+
+async def run(args: argparse.Namespace) -> None:
+    bench_pool = await create_bench_pool(SCHEMA)
+    harness = None
+    try:
+        print(f"Генерирую {args.masters} мастеров и {args.reviews} отзывов...")
+        await seed_masters(bench_pool, args.masters)
+        await seed_reviews(bench_pool, args.reviews)
+
+        os.environ.setdefault("BOT_TOKEN", "42:TEST")
+        os.environ["DB_SCHEMA"] = SCHEMA
+        os.environ["METRICS_PORT"] = "0"
+        os.environ["RECORD_UPDATES"] = ""
+        # Замер, а не защита: лишние апдейты ждут очереди, а не отбрасываются
+        os.environ.setdefault("OVERLOAD_POLICY", "delay")
+        os.environ.setdefault("OVERLOAD_DELAY", "3600")
+        config = load_config()
+
+        harness = await start_harness(config, args.latency)
+        speed = f"{args.speed:g}×" if args.speed else "максимальной скоростью"
+        print(f"Воспроизвожу {', '.join(args.paths)} {speed}")
+        elapsed, lags = await replay(harness, merged_recordings(args.paths), args.speed)
+        report(harness, elapsed)
+        if lags:
+            print(f"\nОтставание от расписания: {describe(lags)}")
+
+        result = summary(harness, elapsed)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+        if args.compare:
+            with open(args.compare, encoding="utf-8") as f:
+                compare(json.load(f), result)
+    finally:
+        if harness is not None:
+            await stop_harness(harness)
+        if not args.keep:
+            await drop_bench_schema(bench_pool, SCHEMA)
+        await bench_pool.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("paths", nargs="+", help="файлы записи RECORD_UPDATES")
+    parser.add_argument("--speed", type=float, default=1.0, help="1, 10, ...; 0 — без пауз")
+    parser.add_argument("--masters", type=int, default=10_000)
+    parser.add_argument("--reviews", type=int, default=50_000)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка фейкового Telegram, с")
+    parser.add_argument("--json", help="сохранить итоги в файл")
+    parser.add_argument("--compare", help="итоги прошлого прогона для сравнения")
+    parser.add_argument("--keep", action="store_true", help="не удалять схему после замера")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Сравнение полнотекстового поиска (tsvector + GIN) со старым ILIKE.
+
+Запуск (нужен PostgreSQL из .env):
+    python -m bench.search_bench --masters 100000 --repeat 50
+"""
+import argparse
+import asyncio
+import time
+
+from bench._db import create_bench_pool, drop_bench_schema, seed_masters, describe
+from services.masters_service import search_masters
+
+SCHEMA = "bench_search"
+QUERIES = ["сантехник", "ремонт смесителей", "Иванов", "замена проводки", "котлов"]
+
+# Прежняя реализация search_masters — для сравнения.
+ILIKE_SQL = """
+SELECT *
+FROM masters
+WHERE status = 'approved'
+  AND (
+    name ILIKE $1
+    OR description ILIKE $1
+    OR category ILIKE $1
+  )
+ORDER BY rating DESC, reviews_count DESC
+LIMIT $2;
+"""
+
+
+async def _measure(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def run(masters: int, repeat: int, keep: bool) -> None:
+    pool = await create_bench_pool(SCHEMA)
+    try:
+        print(f"Генерирую {masters} мастеров...")
+        await seed_masters(pool, masters)
+
+        for text in QUERIES:
+            async def ilike(text=text):
+                async with pool.acquire() as conn:
+                    await conn.fetch(ILIKE_SQL, f"%{text}%", 10)
+
+            async def fts(text=text):
+                await search_masters(pool, text, limit=10)
+
+            print(f"\nЗапрос «{text}»")
+            print(f"  ILIKE: {describe(await _measure(ilike, repeat))}")
+            print(f"  FTS:   {describe(await _measure(fts, repeat))}")
+    finally:
+        if not keep:
+            await drop_bench_schema(pool, SCHEMA)
+        await pool.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--masters", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--keep", action="store_true", help="не удалять схему после замера")
+    args = parser.parse_args()
+    asyncio.run(run(args.masters, args.repeat, args.keep))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Пропускная способность: один процесс против N воркеров (sharding.py).
+
+Поток апдейтов фиксирован (seed), Telegram заменён FakeTelegramSession
+с задержкой --latency, БД — отдельная схема из .env.
+
+Запуск:
+    python -m bench.sharding_bench --updates 20000 --chats 2000 --workers 4
+"""
+from functools import partial
+from typing import Any, Dict, List
+import argparse
+import asyncio
+import os
+import random
+import time
+
+from bench._db import create_bench_pool, drop_bench_schema, seed_masters
+from bench.fake_telegram import FakeTelegramSession
+from config import Config, load_config
+from sharding import WorkerPool
+
+SCHEMA = "bench_sharding"
+
+TEXTS = ["/start", "/menu", "Каталог мастеров", "О нас", "Контакты", "FAQ"]
+
+
+def make_updates(count: int, chats: int, masters: int, seed: int) -> List[Dict[str, Any]]:
+    rnd = random.Random(seed)
+    updates = []
+    for update_id in range(1, count + 1):
+        chat_id = 100_000 + rnd.randrange(chats)
+        if rnd.random() < 0.3:
+            text = f"#{rnd.randint(1, masters)}"
+        else:
+            text = rnd.choice(TEXTS)
+        user = {"id": chat_id, "is_bot": False, "first_name": "Bench"}
+        updates.append({
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private", "first_name": "Bench"},
+                "from": user,
+                "text": text,
+            },
+        })
+    return updates
+
+
+async def _measure(
+    config: Config, workers: int, updates: List[Dict[str, Any]], latency: float
+) -> float:
+    pool = WorkerPool(config, workers, session_factory=partial(FakeTelegramSession, latency=latency))
+    await pool.start()
+    started = time.perf_counter()
+    for raw in updates:
+        pool.submit(raw)
+    await pool.stop()
+    return time.perf_counter() - started
+
+
+async def run(args: argparse.Namespace) -> None:
+    db_pool = await create_bench_pool(SCHEMA)
+    try:
+        print(f"Генерирую {args.masters} мастеров...")
+        await seed_masters(db_pool, args.masters)
+
+        # Воркеры читают конфиг из окружения и работают в схеме бенчмарка.
+        os.environ.setdefault("BOT_TOKEN", "42:TEST")
+        os.environ["DB_SCHEMA"] = SCHEMA
+        os.environ["FSM_STORAGE"] = "memory"
+        os.environ["METRICS_PORT"] = "0"
+        config = load_config()
+
+        updates = make_updates(args.updates, args.chats, args.masters, args.seed)
+        for workers in sorted({1, args.workers}):
+            elapsed = await _measure(config, workers, updates, args.latency)
+            print(
+                f"Воркеров: {workers}: {len(updates)} апдейтов за {elapsed:.2f} с, "
+                f"{len(updates) / elapsed:.0f} апдейтов/с"
+            )
+    finally:
+        if not args.keep:
+            await drop_bench_schema(db_pool, SCHEMA)
+        await db_pool.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--chats", type=int, default=2000)
+    parser.add_argument("--masters", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка фейкового Telegram, с")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep", action="store_true", help="не удалять схему после замера")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Рассылка сообщений всем активным пользователям по заданиям из таблицы broadcasts.
+
+Фоновая задача (Broadcaster.start на dp.startup) берёт незаконченное задание
+(services/broadcast_service.claim_broadcast) и идёт по users пачками
+по id. Сообщения пачки уходят параллельно, но в темпе общего с Notifier
+RateLimiter; каждому пользователю одно сообщение, так что лимит
+«1 сообщение в секунду на чат» не затрагивается. После каждой пачки
+прогресс и курсор сохраняются в БД, поэтому после перезапуска рассылка
+продолжается с места остановки: повторно может уйти не больше одной пачки.
+Заблокировавшие бота помечаются неактивными (и забываются реестром
+пользователей через on_blocked, см. user_registry.py). Админу раз в несколько
+секунд обновляется сообщение с прогрессом.
+
+При нескольких процессах задание выполняет один: тот, кто его захватил
+и продлевает lease — после каждой пачки и во время пачки, пока она ждёт
+(например, RetryAfter). Упавший процесс перестаёт продлевать — задание
+подхватывает другой.
+"""
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import logging
+import time
+
+import asyncpg
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+
+from keyboards.admin import admin_broadcast_progress_keyboard
+from notifier import BLOCKED, FAILED, SENT, RateLimiter, send_message_safely
+from services.broadcast_service import (
+    checkpoint_broadcast,
+    claim_broadcast,
+    extend_broadcast_lease,
+    finish_broadcast,
+    get_broadcast_recipients,
+)
+
+logger = logging.getLogger(__name__)
+
+# Получателей за пачку: между сохранениями прогресса ~1 с при 25 сообщениях/с
+BATCH_SIZE = 25
+# Секунд без продления, после которых задание считается брошенным
+LEASE_SECONDS = 60.0
+# Как часто продлевать lease, пока пачка отправляется
+LEASE_RENEW_INTERVAL = LEASE_SECONDS / 3
+# Как часто искать брошенные задания, если новых не создавали
+POLL_INTERVAL = 30.0
+# Как часто обновлять сообщение с прогрессом
+PROGRESS_INTERVAL = 5.0
+
+STATUS_TITLES = {
+    "pending": "ожидает",
+    "running": "идёт",
+    "done": "завершена",
+    "cancelled": "отменена",
+}
+
+
+def broadcast_progress_text(job: asyncpg.Record) -> str:
+    processed = job["sent"] + job["blocked"] + job["failed"]
+    return (
+        f"Рассылка #{job['id']} — {STATUS_TITLES.get(job['status'], job['status'])}\n"
+        f"Обработано: {processed} из {job['total']}\n"
+        f"Доставлено: {job['sent']}, заблокировали бота: {job['blocked']}, "
+        f"ошибок: {job['failed']}"
+    )
+
+
+class Broadcaster:
+    def __init__(
+        self,
+        pool: asyncpg.pool.Pool,
+        limiter: RateLimiter,
+        batch_size: int = BATCH_SIZE,
+        on_blocked: Optional[Callable[[List[int]], None]] = None,
+    ):
+        self.pool = pool
+        self.limiter = limiter
+        self.on_blocked = on_blocked
+        self.batch_size = batch_size
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.jobs = 0
+        self.results: Dict[str, int] = {SENT: 0, BLOCKED: 0, FAILED: 0}
+
+    async def start(self, bot: Bot) -> None:
+        self._task = asyncio.create_task(self._loop(bot))
+
+    def wake(self) -> None:
+        """
+        Проверить задания сейчас, не дожидаясь POLL_INTERVAL (после создания нового).
+        """
+        self._wake.set()
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _loop(self, bot: Bot) -> None:
+        while True:
+            try:
+                job = await claim_broadcast(self.pool, LEASE_SECONDS)
+                if job is not None:
+                    await self._run(bot, job)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка рассылки: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def _run(self, bot: Bot, job: asyncpg.Record) -> None:
+        logger.info(f"Рассылка #{job['id']}: старт с users.id > {job['cursor_user_id']}")
+        self.jobs += 1
+        cursor = job["cursor_user_id"]
+        reported_at = 0.0
+        while True:
+            recipients = await get_broadcast_recipients(self.pool, cursor, self.batch_size)
+            if not recipients:
+                break
+
+            results = await self._send_batch(bot, job, recipients)
+            counts = {SENT: 0, BLOCKED: 0, FAILED: 0}
+            for result in results:
+                counts[result] += 1
+                self.results[result] += 1
+            blocked_ids = [
+                r["telegram_id"] for r, result in zip(recipients, results) if result == BLOCKED
+            ]
+            cursor = recipients[-1]["id"]
+
+            updated = await checkpoint_broadcast(
+                self.pool, job["id"], cursor,
+                counts[SENT], counts[BLOCKED], counts[FAILED],
+                blocked_ids, LEASE_SECONDS,
+            )
+            if blocked_ids and self.on_blocked is not None:
+                self.on_blocked(blocked_ids)
+            if updated is None:
+                logger.info(f"Рассылка #{job['id']} остановлена: задание отменено")
+                return
+            job = updated
+            if time.monotonic() - reported_at >= PROGRESS_INTERVAL:
+                await self._report(bot, job)
+                reported_at = time.monotonic()
+
+        finished = await finish_broadcast(self.pool, job["id"])
+        if finished is not None:
+            logger.info(f"Рассылка #{job['id']} завершена: {finished['sent']} доставлено")
+            await self._report(bot, finished)
+
+    async def _send_batch(
+        self,
+        bot: Bot,
+        job: asyncpg.Record,
+        recipients: List[asyncpg.Record],
+    ) -> List[str]:
+        """
+        Отправить пачку, продлевая lease каждые LEASE_RENEW_INTERVAL секунд:
+        на RetryAfter пачка может ждать дольше LEASE_SECONDS, и без продления
+        задание подхватил бы другой процесс и отправил бы пачку повторно.
+        """
+        batch = asyncio.ensure_future(asyncio.gather(*(
+            send_message_safely(bot, r["telegram_id"], job["text"], self.limiter)
+            for r in recipients
+        )))
+        try:
+            while True:
+                done, _ = await asyncio.wait({batch}, timeout=LEASE_RENEW_INTERVAL)
+                if done:
+                    return batch.result()
+                try:
+                    await extend_broadcast_lease(self.pool, job["id"], LEASE_SECONDS)
+                except Exception as e:
+                    logger.warning(f"Не удалось продлить lease рассылки #{job['id']}: {e}")
+        finally:
+            batch.cancel()
+
+    async def _report(self, bot: Bot, job: asyncpg.Record) -> None:
+        if not job["progress_message_id"]:
+            return
+        keyboard = (
+            admin_broadcast_progress_keyboard(job["id"]) if job["status"] == "running" else None
+        )
+        try:
+            await bot.edit_message_text(
+                broadcast_progress_text(job),
+                chat_id=job["admin_chat_id"],
+                message_id=job["progress_message_id"],
+                reply_markup=keyboard,
+            )
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                logger.warning(f"Не удалось обновить прогресс рассылки #{job['id']}: {e}")
+        except Exception as e:
+            logger.warning(f"Не удалось обновить прогресс рассылки #{job['id']}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": int(self._task is not None and not self._task.done()),
+            "jobs": self.jobs,
+            "results": dict(self.results),
+        }
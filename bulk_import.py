@@ -0,0 +1,93 @@
+"""
+Массовая загрузка мастеров и отзывов в БД из .env (см. services/import_service.py).
+
+Файл — CSV с заголовком или JSONL (по расширению, .gz читается на лету).
+Вместо файла можно сгенерировать синтетические данные для больших
+тестовых баз: --generate N.
+
+Запуск:
+    python bulk_import.py masters partners.csv --status new
+    python bulk_import.py reviews reviews.jsonl.gz
+    python bulk_import.py masters --generate 1000000
+    python bulk_import.py reviews --generate 10000000
+"""
+import argparse
+import asyncio
+import gzip
+import logging
+
+from config import load_db_config
+from db.db import create_pool, init_db
+from services.import_service import (
+    DEFAULT_BATCH_SIZE,
+    MASTER_STATUSES,
+    detect_format,
+    import_masters,
+    import_reviews,
+    read_rows,
+    synthetic_masters,
+    synthetic_reviews,
+)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+async def run(args: argparse.Namespace) -> None:
+    pool = await create_pool(load_db_config())
+    stream = None
+    try:
+        await init_db(pool)
+        if args.generate:
+            if args.target == "masters":
+                rows = synthetic_masters(args.generate, args.seed)
+            else:
+                max_master_id = await pool.fetchval("SELECT MAX(id) FROM masters;")
+                if not max_master_id:
+                    logger.error("Мастеров нет: сначала загрузите или сгенерируйте мастеров")
+                    return
+                rows = synthetic_reviews(args.generate, max_master_id, args.seed)
+        else:
+            path = args.path
+            opener = gzip.open if path.endswith(".gz") else open
+            stream = opener(path, "rt", encoding="utf-8-sig", newline="")
+            rows = read_rows(stream, detect_format(path.removesuffix(".gz")))
+
+        logger.info(f"Загрузка {args.target}...")
+        if args.target == "masters":
+            result = await import_masters(pool, rows, args.status, args.batch_size)
+        else:
+            result = await import_reviews(pool, rows, args.batch_size)
+
+        logger.info(result.summary())
+        for error in result.errors:
+            logger.warning(error)
+    finally:
+        if stream is not None:
+            stream.close()
+        await pool.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("target", choices=("masters", "reviews"))
+    parser.add_argument("path", nargs="?", help="CSV или JSONL, можно .gz")
+    parser.add_argument("--generate", type=int, default=0, help="сгенерировать N строк вместо файла")
+    parser.add_argument("--status", choices=MASTER_STATUSES, default="approved",
+                        help="статус мастеров, если в файле его нет")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    if not args.path and not args.generate:
+        parser.error("нужен файл или --generate N")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
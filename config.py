@@ -15,18 +15,85 @@ class DBConfig:
     name: str
     user: str
     password: str
+    schema: str = ""  # search_path; пусто — схема по умолчанию
+    pool_size: int = 10  # максимум соединений в пуле одного процесса
 
 
 @dataclass
 class BotConfig:
     token: str
     admin_ids: List[int]
+    workers: int  # число процессов-обработчиков; 1 — всё в одном процессе
+
+
+@dataclass
+class FSMConfig:
+    storage: str  # memory / memory-ttl / postgres
+    ttl: int  # сколько секунд хранить брошенный диалог
+    max_dialogs: int  # предел числа диалогов в памяти для memory-ttl
+
+
+@dataclass
+class WebhookConfig:
+    mode: str  # polling / webhook
+    url: str  # публичный адрес бота; пусто — setWebhook не вызываем (локальный запуск)
+    path: str
+    secret: str
+    host: str
+    port: int
+
+
+@dataclass
+class ConcurrencyConfig:
+    max_handlers: int  # апдейтов в обработке одновременно
+    max_queue: int  # апдейтов, ожидающих свободного места
+    policy: str  # drop / busy / delay — что делать при переполнении очереди
+    delay_timeout: float  # сколько ждать места при политике delay, секунды
+
+
+@dataclass
+class MetricsConfig:
+    host: str
+    port: int  # 0 — не поднимать /metrics
+
+
+@dataclass
+class SlowQueryConfig:
+    threshold_ms: float  # запросы дольше пишутся в лог; 0 — выключено
+    explain_limit: int  # сколько планов EXPLAIN ANALYZE снимать на выражение; 0 — не снимать
+
+
+@dataclass
+class RecordingConfig:
+    path: str  # файл записи апдейтов (recording.py); пусто — не записывать
 
 
 @dataclass
 class Config:
     bot: BotConfig
     db: DBConfig
+    fsm: FSMConfig
+    webhook: WebhookConfig
+    concurrency: ConcurrencyConfig
+    metrics: MetricsConfig
+    slow_queries: SlowQueryConfig
+    recording: RecordingConfig
+
+
+def load_db_config() -> DBConfig:
+    """
+    Параметры подключения к PostgreSQL из переменных окружения.
+    Используется и ботом, и вспомогательными скриптами (bench/), которым не нужен BOT_TOKEN.
+    """
+    return DBConfig(
+        host=os.getenv("DB_HOST", "localhost"),
+        port=int(os.getenv("DB_PORT", "5432")),
+        name=os.getenv("DB_NAME", "masters_db"),
+        user=os.getenv("DB_USER", "postgres"),
+        password=os.getenv("DB_PASSWORD", "postgres"),
+        schema=os.getenv("DB_SCHEMA", ""),
+        pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+    )
 
 
 def load_config() -> Config:
@@ -34,6 +101,13 @@ def load_config() -> Config:
     Загружает конфигурацию из переменных окружения / .env.
     Обязательные переменные:
     BOT_TOKEN, DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD, ADMIN_IDS
+    Необязательные:
+    FSM_STORAGE (memory / memory-ttl / postgres), FSM_TTL, FSM_MAX_DIALOGS
+    BOT_MODE (polling / webhook), WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET,
+    WEBHOOK_HOST, WEBHOOK_PORT, BOT_WORKERS, DB_SCHEMA, DB_POOL_SIZE,
+    HANDLER_CONCURRENCY, HANDLER_QUEUE, OVERLOAD_POLICY (drop / busy / delay), OVERLOAD_DELAY,
+    METRICS_HOST, METRICS_PORT (0 — без /metrics; воркеры берут следующие порты),
+    SLOW_QUERY_MS, SLOW_QUERY_EXPLAIN, RECORD_UPDATES (путь, можно с {pid})
     """
     token = os.getenv("BOT_TOKEN", "")
     if not token:
@@ -50,13 +124,55 @@ def load_config() -> Config:
                 except ValueError:
                     pass
 
-    db_config = DBConfig(
-        host=os.getenv("DB_HOST", "localhost"),
-        port=int(os.getenv("DB_PORT", "5432")),
-        name=os.getenv("DB_NAME", "masters_db"),
-        user=os.getenv("DB_USER", "postgres"),
-        password=os.getenv("DB_PASSWORD", "postgres"),
+    db_config = load_db_config()
+
+    fsm_config = FSMConfig(
+        storage=os.getenv("FSM_STORAGE", "memory"),
+        ttl=int(os.getenv("FSM_TTL", "86400")),
+        max_dialogs=int(os.getenv("FSM_MAX_DIALOGS", "100000")),
+    )
+
+    webhook_config = WebhookConfig(
+        mode=os.getenv("BOT_MODE", "polling"),
+        url=os.getenv("WEBHOOK_URL", ""),
+        path=os.getenv("WEBHOOK_PATH", "/webhook"),
+        secret=os.getenv("WEBHOOK_SECRET", ""),
+        host=os.getenv("WEBHOOK_HOST", "0.0.0.0"),
+        port=int(os.getenv("WEBHOOK_PORT", "8080")),
+    )
+
+    concurrency_config = ConcurrencyConfig(
+        # по умолчанию — по числу соединений пула: больше всё равно будут ждать acquire()
+        max_handlers=int(os.getenv("HANDLER_CONCURRENCY", str(db_config.pool_size))),
+        max_queue=int(os.getenv("HANDLER_QUEUE", "500")),
+        policy=os.getenv("OVERLOAD_POLICY", "busy"),
+        delay_timeout=float(os.getenv("OVERLOAD_DELAY", "10")),
+    )
+
+    metrics_config = MetricsConfig(
+        host=os.getenv("METRICS_HOST", "0.0.0.0"),
+        port=int(os.getenv("METRICS_PORT", "9100")),
+    )
+
+    slow_query_config = SlowQueryConfig(
+        threshold_ms=float(os.getenv("SLOW_QUERY_MS", "500")),
+        explain_limit=int(os.getenv("SLOW_QUERY_EXPLAIN", "0")),
     )
 
-    bot_config = BotConfig(token=token, admin_ids=admin_ids)
-    return Config(bot=bot_config, db=db_config)
+    recording_config = RecordingConfig(path=os.getenv("RECORD_UPDATES", ""))
+
+    bot_config = BotConfig(
+        token=token,
+        admin_ids=admin_ids,
+        workers=int(os.getenv("BOT_WORKERS", "1")),
+    )
+    return Config(
+        bot=bot_config,
+        db=db_config,
+        fsm=fsm_config,
+        webhook=webhook_config,
+        concurrency=concurrency_config,
+        metrics=metrics_config,
+        slow_queries=slow_query_config,
+        recording=recording_config,
+    )
@@ -1,20 +1,125 @@
-from typing import Optional
+from contextlib import asynccontextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Optional, Union
 import asyncio
 import logging
+import time
 
 import asyncpg
 
 from config import DBConfig
+from db.migrate import apply_migrations
+from db.slow_queries import slow_query_tracer
+from metrics import DB_ACQUIRE_SECONDS, query_logger
+from services.statements import statements
 
 logger = logging.getLogger(__name__)
 
 
+async def _timed_acquire(pool: asyncpg.pool.Pool) -> asyncpg.Connection:
+    started = time.perf_counter()
+    conn = await pool.acquire()
+    DB_ACQUIRE_SECONDS.observe(time.perf_counter() - started)
+    return conn
+
+
+@asynccontextmanager
+async def _pool_connection(pool: asyncpg.pool.Pool):
+    conn = await _timed_acquire(pool)
+    try:
+        yield conn
+    finally:
+        await pool.release(conn)
+
+
+class ConnectionScope:
+    """
+    Соединение на время обработки одного апдейта.
+
+    Берётся из пула при первом обращении (апдейты без запросов к БД пул не трогают)
+    и возвращается в пул в release(). Повторяет интерфейс pool.acquire(),
+    поэтому передаётся в сервисы вместо пула. Рассчитан на последовательное
+    использование внутри одного хендлера.
+    """
+
+    def __init__(self, pool: asyncpg.pool.Pool):
+        self._pool = pool
+        self._conn: Optional[asyncpg.Connection] = None
+        self._released = False
+
+    @asynccontextmanager
+    async def _scoped(self):
+        if self._conn is None:
+            self._conn = await _timed_acquire(self._pool)
+        yield self._conn
+
+    def acquire(self):
+        # После release (например, scope сохранили в фоновой задаче)
+        # работаем как обычный пул, чтобы не держать соединение.
+        if self._released:
+            return _pool_connection(self._pool)
+        return self._scoped()
+
+    async def release(self) -> None:
+        self._released = True
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            await self._pool.release(conn)
+
+
+# То, что принимают функции services/*: пул, соединение или ConnectionScope.
+Executor = Union[asyncpg.pool.Pool, asyncpg.Connection, ConnectionScope]
+
+# ConnectionScope обрабатываемого апдейта (см. middleware.ConnectionScopeMiddleware).
+# Через него работают те, кому хендлер соединение не передаёт, — FSM-хранилище.
+current_scope: ContextVar[Optional[ConnectionScope]] = ContextVar("current_scope", default=None)
+
+
+def acquire(executor: Executor):
+    """
+    Получить соединение из пула / ConnectionScope или использовать готовое:
+        async with acquire(executor) as conn: ...
+    """
+    if isinstance(executor, asyncpg.pool.Pool):
+        return _pool_connection(executor)
+    if hasattr(executor, "acquire"):
+        return executor.acquire()
+    return nullcontext(executor)
+
+
+async def init_connection(conn: asyncpg.Connection) -> None:
+    """
+    Настройка каждого нового соединения пула.
+    NUMERIC (рейтинг мастеров) декодируем сразу во float, а не в Decimal.
+    Затем прогреваем выражения каталога из services.statements
+    и подключаем учёт времени запросов (metrics.query_logger)
+    и журнал медленных запросов (db.slow_queries).
+    """
+    await conn.set_type_codec(
+        "numeric",
+        encoder=str,
+        decoder=float,
+        schema="pg_catalog",
+        format="text",
+    )
+    await statements.prewarm(conn)
+    conn.add_query_logger(query_logger)
+    conn.add_query_logger(slow_query_tracer)
+
+
 async def create_pool(db_config: DBConfig) -> asyncpg.pool.Pool:
     """
     Создаёт connection pool для PostgreSQL с обработкой ошибок и повторными попытками.
     """
     max_retries = 3
     retry_delay = 2  # секунды
+
+    server_settings = {
+        'application_name': 'tg_masters_bot',
+        'jit': 'off',  # отключаем JIT для стабильности
+    }
+    if db_config.schema:
+        server_settings['search_path'] = db_config.schema
     
     for attempt in range(1, max_retries + 1):
         try:
@@ -30,13 +135,13 @@ async def create_pool(db_config: DBConfig) -> asyncpg.pool.Pool:
                 password=db_config.password,
                 database=db_config.name,
                 min_size=1,
-                max_size=10,
+                max_size=db_config.pool_size,
                 command_timeout=30,  # таймаут выполнения команды (30 сек)
                 timeout=10,  # таймаут подключения (10 сек)
-                server_settings={
-                    'application_name': 'tg_masters_bot',
-                    'jit': 'off',  # отключаем JIT для стабильности
-                },
+                init=init_connection,
+                # все формы запросов каталога (services/statements.py) + запас
+                statement_cache_size=256,
+                server_settings=server_settings,
             )
             
             # Проверяем соединение
@@ -88,95 +193,6 @@ async def create_pool(db_config: DBConfig) -> asyncpg.pool.Pool:
 
 async def init_db(pool: asyncpg.pool.Pool) -> None:
     """
-    Простая "миграция" — создаём таблицы, если их нет.
+    Приводит схему БД к актуальной версии (см. db/migrate.py и db/migrations).
     """
-    async with pool.acquire() as conn:
-        # Таблица пользователей
-        await conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                id SERIAL PRIMARY KEY,
-                telegram_id BIGINT UNIQUE NOT NULL,
-                role TEXT DEFAULT 'user',
-                master_id INTEGER,
-                created_at TIMESTAMPTZ DEFAULT NOW()
-            );
-            """
-        )
-
-        # Таблица мастеров
-        await conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS masters (
-                id SERIAL PRIMARY KEY,
-                telegram_id BIGINT,
-                name TEXT NOT NULL,
-                username TEXT,
-                phone TEXT,
-                category TEXT,
-                description TEXT,
-                price_min INTEGER,
-                price_max INTEGER,
-                photo_file_id TEXT,
-                photo_url TEXT,
-                status TEXT DEFAULT 'new', -- new / approved / rejected / inactive
-                rating NUMERIC(3, 2) DEFAULT 0,
-                reviews_count INTEGER DEFAULT 0,
-                created_at TIMESTAMPTZ DEFAULT NOW(),
-                updated_at TIMESTAMPTZ DEFAULT NOW()
-            );
-            """
-        )
-
-        # Таблица отзывов
-        await conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS reviews (
-                id SERIAL PRIMARY KEY,
-                master_id INTEGER NOT NULL REFERENCES masters(id) ON DELETE CASCADE,
-                user_id BIGINT NOT NULL,
-                username TEXT,
-                rating SMALLINT NOT NULL CHECK (rating >= 1 AND rating <= 5),
-                text TEXT,
-                is_visible BOOLEAN DEFAULT TRUE,
-                created_at TIMESTAMPTZ DEFAULT NOW()
-            );
-            """
-        )
-
-        # Таблица инфо-страниц
-        await conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS info_pages (
-                slug TEXT PRIMARY KEY,
-                title TEXT NOT NULL,
-                content TEXT NOT NULL,
-                updated_at TIMESTAMPTZ DEFAULT NOW()
-            );
-            """
-        )
-
-        # Таблица FAQ
-        await conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS faq (
-                id SERIAL PRIMARY KEY,
-                question TEXT NOT NULL,
-                answer TEXT NOT NULL,
-                is_visible BOOLEAN DEFAULT TRUE,
-                created_at TIMESTAMPTZ DEFAULT NOW(),
-                updated_at TIMESTAMPTZ DEFAULT NOW()
-            );
-            """
-        )
-
-        # Минимальные дефолтные страницы
-        await conn.execute(
-            """
-            INSERT INTO info_pages (slug, title, content)
-            VALUES 
-                ('about', 'О нас', 'Информация о сервисе мастеров.'),
-                ('contacts', 'Контакты администрации', 'Свяжитесь с нами в Telegram.')
-            ON CONFLICT (slug) DO NOTHING;
-            """
-        )
+    await apply_migrations(pool)
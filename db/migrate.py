@@ -0,0 +1,111 @@
+"""
+Версионные миграции схемы БД.
+
+Миграции — это SQL-файлы в db/migrations вида NNNN_name.sql, применяются
+по возрастанию номера. Применённые версии записываются в schema_version.
+Если схема актуальна, при старте выполняется один SELECT и никакого DDL.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+import logging
+import re
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+
+# Ключ advisory lock: не даёт двум процессам бота накатывать миграции одновременно.
+MIGRATIONS_LOCK_KEY = 73010001
+
+_FILENAME_RE = re.compile(r"^(\d+)_([\w\-]+)\.sql$")
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    sql: str
+
+
+def load_migrations(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    """
+    Читает файлы миграций и возвращает их отсортированными по версии.
+    """
+    migrations: List[Migration] = []
+    for path in sorted(directory.glob("*.sql")):
+        match = _FILENAME_RE.match(path.name)
+        if not match:
+            logger.warning(f"Пропускаю файл миграции с некорректным именем: {path.name}")
+            continue
+        migrations.append(
+            Migration(
+                version=int(match.group(1)),
+                name=match.group(2),
+                sql=path.read_text(encoding="utf-8"),
+            )
+        )
+
+    migrations.sort(key=lambda m: m.version)
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Повторяющиеся номера миграций: {versions}")
+    return migrations
+
+
+async def _current_version(conn: asyncpg.Connection) -> int:
+    try:
+        version = await conn.fetchval("SELECT MAX(version) FROM schema_version;")
+    except asyncpg.exceptions.UndefinedTableError:
+        return 0
+    return int(version or 0)
+
+
+async def apply_migrations(pool: asyncpg.pool.Pool) -> int:
+    """
+    Применяет недостающие миграции и возвращает текущую версию схемы.
+    """
+    migrations = load_migrations()
+    latest = migrations[-1].version if migrations else 0
+
+    async with pool.acquire() as conn:
+        current = await _current_version(conn)
+        if current >= latest:
+            logger.info(f"Схема БД актуальна (версия {current})")
+            return current
+
+        await conn.execute("SELECT pg_advisory_lock($1);", MIGRATIONS_LOCK_KEY)
+        try:
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TIMESTAMPTZ DEFAULT NOW()
+                );
+                """
+            )
+            # Пока ждали блокировку, миграции мог применить другой процесс.
+            current = await _current_version(conn)
+
+            for migration in migrations:
+                if migration.version <= current:
+                    continue
+                logger.info(
+                    f"Применяю миграцию {migration.version:04d}_{migration.name}"
+                )
+                async with conn.transaction():
+                    await conn.execute(migration.sql)
+                    await conn.execute(
+                        "INSERT INTO schema_version (version, name) VALUES ($1, $2);",
+                        migration.version,
+                        migration.name,
+                    )
+                current = migration.version
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1);", MIGRATIONS_LOCK_KEY)
+
+    logger.info(f"Схема БД обновлена до версии {current}")
+    return current
@@ -0,0 +1,68 @@
+-- Исходная схема. IF NOT EXISTS оставлены, чтобы миграция спокойно
+-- накатывалась на базы, созданные до появления schema_version.
+
+-- Таблица пользователей
+CREATE TABLE IF NOT EXISTS users (
+    id SERIAL PRIMARY KEY,
+    telegram_id BIGINT UNIQUE NOT NULL,
+    role TEXT DEFAULT 'user',
+    master_id INTEGER,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Таблица мастеров
+CREATE TABLE IF NOT EXISTS masters (
+    id SERIAL PRIMARY KEY,
+    telegram_id BIGINT,
+    name TEXT NOT NULL,
+    username TEXT,
+    phone TEXT,
+    category TEXT,
+    description TEXT,
+    price_min INTEGER,
+    price_max INTEGER,
+    photo_file_id TEXT,
+    photo_url TEXT,
+    status TEXT DEFAULT 'new', -- new / approved / rejected / inactive
+    rating NUMERIC(3, 2) DEFAULT 0,
+    reviews_count INTEGER DEFAULT 0,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Таблица отзывов
+CREATE TABLE IF NOT EXISTS reviews (
+    id SERIAL PRIMARY KEY,
+    master_id INTEGER NOT NULL REFERENCES masters(id) ON DELETE CASCADE,
+    user_id BIGINT NOT NULL,
+    username TEXT,
+    rating SMALLINT NOT NULL CHECK (rating >= 1 AND rating <= 5),
+    text TEXT,
+    is_visible BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Таблица инфо-страниц
+CREATE TABLE IF NOT EXISTS info_pages (
+    slug TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Таблица FAQ
+CREATE TABLE IF NOT EXISTS faq (
+    id SERIAL PRIMARY KEY,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    is_visible BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Минимальные дефолтные страницы
+INSERT INTO info_pages (slug, title, content)
+VALUES
+    ('about', 'О нас', 'Информация о сервисе мастеров.'),
+    ('contacts', 'Контакты администрации', 'Свяжитесь с нами в Telegram.')
+ON CONFLICT (slug) DO NOTHING;
@@ -0,0 +1,42 @@
+-- Индексы под запросы services/*.
+-- Порядок колонок в индексах каталога совпадает с _SORT_KEYS
+-- из services/masters_service.py, чтобы и список (ORDER BY ... LIMIT),
+-- и keyset-навигация по карусели шли по индексу без сортировки.
+
+-- get_approved_masters / get_adjacent_master, сортировка по рейтингу
+CREATE INDEX IF NOT EXISTS ix_masters_approved_rating
+    ON masters (rating DESC, reviews_count DESC, id DESC)
+    WHERE status = 'approved';
+CREATE INDEX IF NOT EXISTS ix_masters_approved_category_rating
+    ON masters (category, rating DESC, reviews_count DESC, id DESC)
+    WHERE status = 'approved';
+
+-- ... сортировка по количеству отзывов
+CREATE INDEX IF NOT EXISTS ix_masters_approved_reviews
+    ON masters (reviews_count DESC, rating DESC, id DESC)
+    WHERE status = 'approved';
+CREATE INDEX IF NOT EXISTS ix_masters_approved_category_reviews
+    ON masters (category, reviews_count DESC, rating DESC, id DESC)
+    WHERE status = 'approved';
+
+-- ... сортировка по цене
+CREATE INDEX IF NOT EXISTS ix_masters_approved_price
+    ON masters ((COALESCE(price_min, 2147483647)), id)
+    WHERE status = 'approved';
+CREATE INDEX IF NOT EXISTS ix_masters_approved_category_price
+    ON masters (category, (COALESCE(price_min, 2147483647)), id)
+    WHERE status = 'approved';
+
+-- claim_pending_masters
+CREATE INDEX IF NOT EXISTS ix_masters_pending
+    ON masters (created_at)
+    WHERE status = 'new';
+
+-- полный список по дате (bench/projection_bench.py)
+CREATE INDEX IF NOT EXISTS ix_masters_created
+    ON masters (created_at DESC);
+
+-- get_reviews_for_master
+CREATE INDEX IF NOT EXISTS ix_reviews_master_visible
+    ON reviews (master_id, created_at DESC)
+    WHERE is_visible = TRUE;
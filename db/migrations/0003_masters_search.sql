@@ -0,0 +1,13 @@
+-- Полнотекстовый поиск по мастерам (services/masters_service.search_masters).
+-- Вектор поддерживается самой БД: имя важнее категории, категория важнее описания.
+ALTER TABLE masters
+    ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', COALESCE(name, '')), 'A')
+        || setweight(to_tsvector('russian', COALESCE(category, '')), 'B')
+        || setweight(to_tsvector('russian', COALESCE(description, '')), 'C')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS ix_masters_search
+    ON masters USING GIN (search_vector)
+    WHERE status = 'approved';
@@ -0,0 +1,34 @@
+-- Агрегаты рейтинга прямо в строке мастера: add_review обновляет их за O(1),
+-- services/reviews_service.reconcile_master_ratings периодически сверяет с reviews.
+ALTER TABLE masters
+    ADD COLUMN IF NOT EXISTS rating_sum INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS stars_1 INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS stars_2 INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS stars_3 INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS stars_4 INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS stars_5 INTEGER NOT NULL DEFAULT 0;
+
+UPDATE masters m
+SET rating_sum = agg.rating_sum,
+    reviews_count = agg.cnt,
+    rating = ROUND(agg.rating_sum::numeric / agg.cnt, 2),
+    stars_1 = agg.stars_1,
+    stars_2 = agg.stars_2,
+    stars_3 = agg.stars_3,
+    stars_4 = agg.stars_4,
+    stars_5 = agg.stars_5
+FROM (
+    SELECT
+        master_id,
+        SUM(rating) AS rating_sum,
+        COUNT(*) AS cnt,
+        COUNT(*) FILTER (WHERE rating = 1) AS stars_1,
+        COUNT(*) FILTER (WHERE rating = 2) AS stars_2,
+        COUNT(*) FILTER (WHERE rating = 3) AS stars_3,
+        COUNT(*) FILTER (WHERE rating = 4) AS stars_4,
+        COUNT(*) FILTER (WHERE rating = 5) AS stars_5
+    FROM reviews
+    WHERE is_visible = TRUE
+    GROUP BY master_id
+) AS agg
+WHERE m.id = agg.master_id;
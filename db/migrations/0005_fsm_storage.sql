@@ -0,0 +1,18 @@
+-- Хранилище FSM (storage/postgres.py): состояние и данные диалога одной строкой,
+-- чтобы шаг диалога записывался одним UPSERT.
+CREATE TABLE IF NOT EXISTS fsm_storage (
+    bot_id BIGINT NOT NULL,
+    chat_id BIGINT NOT NULL,
+    user_id BIGINT NOT NULL,
+    thread_id BIGINT NOT NULL DEFAULT 0,
+    business_connection_id TEXT NOT NULL DEFAULT '',
+    destiny TEXT NOT NULL DEFAULT 'default',
+    state TEXT,
+    data JSONB NOT NULL DEFAULT '{}',
+    expires_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (bot_id, chat_id, user_id, thread_id, business_connection_id, destiny)
+);
+
+-- Для очистки брошенных диалогов
+CREATE INDEX IF NOT EXISTS ix_fsm_storage_expires
+    ON fsm_storage (expires_at);
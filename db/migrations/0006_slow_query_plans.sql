@@ -0,0 +1,14 @@
+-- Планы медленных запросов (db/slow_queries.py): EXPLAIN (ANALYZE, BUFFERS)
+-- первых нескольких медленных выполнений каждого выражения.
+CREATE TABLE IF NOT EXISTS slow_query_plans (
+    id BIGSERIAL PRIMARY KEY,
+    query TEXT NOT NULL,
+    service TEXT NOT NULL,
+    param_types TEXT NOT NULL DEFAULT '',
+    duration_ms DOUBLE PRECISION NOT NULL,
+    plan TEXT NOT NULL,
+    captured_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS ix_slow_query_plans_captured
+    ON slow_query_plans (captured_at DESC);
@@ -0,0 +1,5 @@
+-- Очередь модерации (services/masters_service.claim_pending_masters):
+-- кто из админов взял заявку и до какого времени она за ним.
+ALTER TABLE masters
+    ADD COLUMN IF NOT EXISTS claimed_by BIGINT,
+    ADD COLUMN IF NOT EXISTS claim_expires_at TIMESTAMPTZ;
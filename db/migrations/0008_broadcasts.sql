@@ -0,0 +1,36 @@
+-- Аудитория рассылок: users заполняется при первом обращении к боту,
+-- is_active = FALSE — пользователь заблокировал бота.
+ALTER TABLE users
+    ADD COLUMN IF NOT EXISTS username TEXT,
+    ADD COLUMN IF NOT EXISTS first_name TEXT,
+    ADD COLUMN IF NOT EXISTS is_active BOOLEAN NOT NULL DEFAULT TRUE,
+    ADD COLUMN IF NOT EXISTS last_seen_at TIMESTAMPTZ DEFAULT NOW();
+
+-- get_broadcast_recipients: keyset по id среди активных
+CREATE INDEX IF NOT EXISTS ix_users_active
+    ON users (id)
+    WHERE is_active;
+
+-- Задания рассылки (broadcaster.py). cursor_user_id — users.id последнего
+-- обработанного получателя: после перезапуска рассылка продолжается с него.
+-- Задание выполняет тот процесс, у которого не истёк lease_expires_at.
+CREATE TABLE IF NOT EXISTS broadcasts (
+    id SERIAL PRIMARY KEY,
+    admin_chat_id BIGINT NOT NULL,
+    progress_message_id BIGINT,
+    text TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending', -- pending / running / done / cancelled
+    cursor_user_id INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    sent INTEGER NOT NULL DEFAULT 0,
+    blocked INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    lease_expires_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS ix_broadcasts_unfinished
+    ON broadcasts (id)
+    WHERE status IN ('pending', 'running');
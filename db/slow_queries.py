@@ -0,0 +1,145 @@
+"""
+Журнал медленных запросов.
+
+Подключается к каждому соединению пула как query logger asyncpg.
+Запрос дольше SLOW_QUERY_MS попадает в лог: текст, типы параметров
+(сами значения не пишем), длительность и сервис, который его выполнил
+(metrics.current_service). Для первых SLOW_QUERY_EXPLAIN медленных выполнений
+каждого выражения в фоне снимается план на отдельном соединении и сохраняется
+в slow_query_plans (админка: «Медленные запросы»).
+
+EXPLAIN ANALYZE выполняет запрос ещё раз, поэтому так снимаются только
+SELECT/WITH и только в READ ONLY транзакции. Для INSERT/UPDATE/DELETE
+и для запросов, которые в такой транзакции выполнить нельзя (FOR UPDATE,
+CTE с изменением данных), — обычный EXPLAIN без выполнения: повторять запись
+на и без того медленной БД (блокировки строк, триггеры, id) нельзя.
+"""
+from collections import Counter
+from typing import Any, Optional, Sequence, Set
+import asyncio
+import logging
+import re
+
+import asyncpg
+
+from config import SlowQueryConfig
+from metrics import current_service
+
+logger = logging.getLogger(__name__)
+
+PLANS_TABLE = "slow_query_plans"
+
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+# Их можно выполнить повторно под EXPLAIN ANALYZE
+_READ_ONLY = ("SELECT", "WITH")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _compact(query: str, limit: int = 500) -> str:
+    text = _WHITESPACE_RE.sub(" ", query).strip()
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+def _param_types(args: Optional[Sequence[Any]]) -> str:
+    return ", ".join(type(arg).__name__ for arg in args or ())
+
+
+class SlowQueryTracer:
+    def __init__(self):
+        self.threshold: Optional[float] = None  # секунды; None — выключен
+        self.explain_limit = 0
+        self._pool: Optional[asyncpg.pool.Pool] = None
+        self._explained: Counter = Counter()
+        self._tasks: Set[asyncio.Task] = set()
+        self.slow = 0
+
+    def configure(self, config: SlowQueryConfig, pool: asyncpg.pool.Pool) -> None:
+        self.threshold = config.threshold_ms / 1000 if config.threshold_ms > 0 else None
+        self.explain_limit = config.explain_limit
+        self._pool = pool
+
+    def __call__(self, record: "asyncpg.connection.LoggedQuery") -> None:
+        if self.threshold is None or record.elapsed < self.threshold:
+            return
+        query = record.query
+        head = query.lstrip()[:16].upper()
+        if head.startswith("EXPLAIN") or PLANS_TABLE in query:
+            # Собственные запросы трассировщика
+            return
+
+        self.slow += 1
+        service = current_service.get()
+        param_types = _param_types(record.args)
+        logger.warning(
+            f"Медленный запрос {record.elapsed * 1000:.0f} мс [{service}] "
+            f"({param_types}): {_compact(query)}"
+        )
+
+        if (
+            self._pool is None
+            or self._explained[query] >= self.explain_limit
+            or not head.startswith(_EXPLAINABLE)
+            or ";" in query.strip().rstrip(";")
+        ):
+            return
+        self._explained[query] += 1
+        task = asyncio.create_task(
+            self._explain(
+                query, record.args, service, param_types, record.elapsed,
+                analyze=head.startswith(_READ_ONLY),
+            )
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _explain(
+        self,
+        query: str,
+        args: Optional[Sequence[Any]],
+        service: str,
+        param_types: str,
+        elapsed: float,
+        analyze: bool,
+    ) -> None:
+        statement = query.strip().rstrip(";")
+        try:
+            async with self._pool.acquire() as conn:
+                rows = None
+                if analyze:
+                    try:
+                        async with conn.transaction(readonly=True):
+                            rows = await conn.fetch(
+                                f"EXPLAIN (ANALYZE, BUFFERS) {statement}", *(args or ())
+                            )
+                    except asyncpg.ReadOnlySQLTransactionError:
+                        # Запрос всё-таки пишет (FOR UPDATE, CTE с UPDATE)
+                        rows = None
+                if rows is None:
+                    rows = await conn.fetch(f"EXPLAIN {statement}", *(args or ()))
+
+                await conn.execute(
+                    f"""
+                    INSERT INTO {PLANS_TABLE} (query, service, param_types, duration_ms, plan)
+                    VALUES ($1, $2, $3, $4, $5);
+                    """,
+                    query,
+                    service,
+                    param_types,
+                    elapsed * 1000,
+                    "\n".join(row[0] for row in rows),
+                )
+        except Exception as e:
+            logger.error(f"Не удалось снять план медленного запроса: {e}")
+
+    def stats(self) -> dict:
+        return {"slow": self.slow, "explained": sum(self._explained.values())}
+
+    async def close(self) -> None:
+        """
+        Дождаться сохранения уже снимаемых планов (перед закрытием пула).
+        """
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+slow_query_tracer = SlowQueryTracer()
@@ -1,31 +1,49 @@
+from datetime import datetime
 from typing import List
+import html
+import io
+import os
 
-from aiogram import Router, F
+from aiogram import Bot, Router, F
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, FSInputFile
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.fsm.context import FSMContext
 
 from asyncpg.pool import Pool
+from broadcaster import Broadcaster, broadcast_progress_text
 from config import Config
+from notifier import Notifier
 
 from keyboards.admin import (
     admin_main_keyboard,
-    admin_pending_master_keyboard,
+    admin_moderation_keyboard,
+    admin_bulk_keyboard,
+    admin_masters_page_keyboard,
+    admin_broadcast_confirm_keyboard,
+    admin_broadcast_progress_keyboard,
     admin_info_menu_keyboard,
     admin_faq_menu_keyboard,
+    admin_slow_queries_keyboard,
 )
 from services.masters_service import (
-    get_pending_masters,
+    claim_pending_masters,
     get_master_by_id,
-    set_master_status,
-    get_all_masters,
+    release_pending_masters,
+    resolve_pending_master,
+    set_master_status_many,
+    get_masters_page,
 )
 from services.info_service import (
     get_info_page,
     update_info_page,
     add_faq,
 )
+from services.broadcast_service import cancel_broadcast, count_active_users, create_broadcast
+from services.diagnostics_service import get_slow_query_plans, get_slow_query_plan
+from services.export_service import EXPORTS, export_table
+from services.import_service import detect_format, import_masters, import_reviews, read_rows
 
 router = Router()
 
@@ -72,6 +90,71 @@ async def admin_panel(message: Message, config: Config):
 #   Заявки мастеров
 # ======================
 
+# Сколько заявок модератор захватывает за раз
+MODERATION_BATCH = 10
+
+MODERATION_DECISIONS = {
+    "approve": (
+        "approved",
+        "одобрен",
+        "Ваша заявка мастера одобрена! Вы теперь видны в каталоге.",
+    ),
+    "reject": (
+        "rejected",
+        "отклонён",
+        "К сожалению, ваша заявка мастера была отклонена.",
+    ),
+}
+
+
+def _moderation_text(m, index: int, count: int) -> str:
+    return (
+        f"Заявка мастера #{m['id']} ({index + 1} из {count} взятых, "
+        f"всего в очереди: {m['queue_total']}):\n\n"
+        f"Имя: {html.escape(m['name'])}\n"
+        f"Телефон: {html.escape(m['phone'] or '-')}\n"
+        f"Username: @{html.escape(m['username'] or '-')}\n"
+        f"Категория: {html.escape(m['category'] or '-')}\n"
+        f"Описание: {html.escape(m['description'] or '-')}\n"
+        f"Цены: {m['price_min'] or ''}–{m['price_max'] or ''}\n"
+        f"Фото: {'есть' if m['photo_file_id'] else 'нет'}"
+    )
+
+
+async def _show_moderation_queue(
+    message: Message,
+    db_pool: Pool,
+    admin_id: int,
+    index: int = 0,
+    edit: bool = True,
+) -> None:
+    """
+    Захватить (или продлить) пачку заявок и показать заявку index
+    в сообщении очереди: редактированием или новым сообщением.
+    """
+    masters = await claim_pending_masters(db_pool, admin_id, MODERATION_BATCH)
+    if masters:
+        index = min(index, len(masters) - 1)
+        m = masters[index]
+        text = _moderation_text(m, index, len(masters))
+        keyboard = admin_moderation_keyboard(
+            m["id"], index, len(masters), bool(m["photo_file_id"])
+        )
+    else:
+        text = "Нет заявок мастеров."
+        keyboard = None
+
+    if not edit:
+        await message.answer(text, reply_markup=keyboard)
+        return
+    try:
+        await message.edit_text(text, reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        # Повторное нажатие на ту же страницу — сообщение не изменилось
+        if "message is not modified" not in str(e):
+            raise
+
+
 @router.callback_query(F.data == "admin:masters:pending")
 async def admin_show_pending(
     callback: CallbackQuery,
@@ -79,155 +162,526 @@ async def admin_show_pending(
     config: Config,
 ):
     """
-    Показать список заявок мастеров со статусом 'new'.
+    Открыть очередь заявок мастеров со статусом 'new'.
     """
     if not _is_admin(callback.from_user.id, config):
         await callback.answer("Нет доступа")
         return
 
-    masters = await get_pending_masters(db_pool)
-    if not masters:
-        await callback.message.answer("Нет заявок мастеров.")
-        await callback.answer()
+    await _show_moderation_queue(
+        callback.message, db_pool, callback.from_user.id, edit=False
+    )
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("admin:mod:page:"))
+async def admin_moderation_page(
+    callback: CallbackQuery,
+    db_pool: Pool,
+    config: Config,
+):
+    """
+    Листание захваченных заявок.
+    """
+    if not _is_admin(callback.from_user.id, config):
+        await callback.answer("Нет доступа")
         return
 
-    for m in masters:
-        text = (
-            f"Заявка мастера #{m['id']}:\n\n"
-            f"Имя: {m['name']}\n"
-            f"Телефон: {m['phone']}\n"
-            f"Username: @{m['username'] or '-'}\n"
-            f"Категория: {m['category']}\n"
-            f"Описание: {m['description']}\n"
-            f"Цены: {m['price_min'] or ''}–{m['price_max'] or ''}\n"
-        )
-        if m["photo_file_id"]:
-            await callback.message.answer_photo(
-                photo=m["photo_file_id"],
-                caption=text,
-                reply_markup=admin_pending_master_keyboard(m["id"]),
-            )
-        else:
-            await callback.message.answer(
-                text,
-                reply_markup=admin_pending_master_keyboard(m["id"]),
-            )
+    try:
+        index = int(callback.data.rsplit(":", 1)[1])
+    except ValueError:
+        await callback.answer("Некорректные данные")
+        return
 
+    await _show_moderation_queue(callback.message, db_pool, callback.from_user.id, index)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("admin:masters:approve:"))
-async def admin_approve_master(
+@router.callback_query(
+    F.data.startswith("admin:mod:approve:") | F.data.startswith("admin:mod:reject:")
+)
+async def admin_moderation_decide(
     callback: CallbackQuery,
     db_pool: Pool,
     config: Config,
+    notifier: Notifier,
 ):
     """
-    Одобрение заявки мастера.
+    Одобрение или отклонение заявки. Переход статуса — один UPDATE
+    с проверкой, что заявка ещё новая и не захвачена другим модератором.
     """
     if not _is_admin(callback.from_user.id, config):
         await callback.answer("Нет доступа")
         return
 
     try:
-        _, _, _, master_id_str = callback.data.split(":", 3)
+        _, _, action, master_id_str, index_str = callback.data.split(":", 4)
         master_id = int(master_id_str)
-    except Exception:
+        index = int(index_str)
+        status, verb, notice = MODERATION_DECISIONS[action]
+    except (ValueError, KeyError):
         await callback.answer("Некорректные данные")
         return
 
-    master = await get_master_by_id(db_pool, master_id)
-    if not master:
-        await callback.message.answer("Мастер не найден.")
-        await callback.answer()
-        return
-
-    await set_master_status(db_pool, master_id, "approved")
-    await callback.message.answer(f"Мастер #{master_id} одобрен.")
-    await callback.answer()
+    master = await resolve_pending_master(db_pool, master_id, status, callback.from_user.id)
+    if master:
+        await callback.answer(f"Мастер #{master_id} {verb}.")
+        # Уведомим мастера
+        if master["telegram_id"]:
+            notifier.notify(callback.bot, master["telegram_id"], notice)
+    else:
+        await callback.answer("Заявку уже обработал другой модератор.", show_alert=True)
 
-    # Уведомим мастера
-    if master["telegram_id"]:
-        try:
-            await callback.bot.send_message(
-                master["telegram_id"],
-                "Ваша заявка мастера одобрена! Вы теперь видны в каталоге.",
-            )
-        except Exception:
-            # Могут быть ошибки, если пользователь запретил сообщения от бота и т.п.
-            pass
+    await _show_moderation_queue(callback.message, db_pool, callback.from_user.id, index)
 
 
-@router.callback_query(F.data.startswith("admin:masters:reject:"))
-async def admin_reject_master(
+@router.callback_query(F.data.startswith("admin:mod:photo:"))
+async def admin_moderation_photo(
     callback: CallbackQuery,
     db_pool: Pool,
     config: Config,
 ):
     """
-    Отклонение заявки мастера.
+    Фото из заявки — отдельным сообщением, очередь остаётся текстовой.
     """
     if not _is_admin(callback.from_user.id, config):
         await callback.answer("Нет доступа")
         return
 
     try:
-        _, _, _, master_id_str = callback.data.split(":", 3)
-        master_id = int(master_id_str)
-    except Exception:
+        master_id = int(callback.data.rsplit(":", 1)[1])
+    except ValueError:
         await callback.answer("Некорректные данные")
         return
 
     master = await get_master_by_id(db_pool, master_id)
-    if not master:
-        await callback.message.answer("Мастер не найден.")
-        await callback.answer()
+    if not master or not master["photo_file_id"]:
+        await callback.answer("Фото нет")
         return
 
-    await set_master_status(db_pool, master_id, "rejected")
-    await callback.message.answer(f"Мастер #{master_id} отклонён.")
+    await callback.message.answer_photo(
+        photo=master["photo_file_id"],
+        caption=f"Заявка мастера #{master_id}",
+    )
     await callback.answer()
 
-    if master["telegram_id"]:
+
+@router.callback_query(F.data == "admin:mod:release")
+async def admin_moderation_release(
+    callback: CallbackQuery,
+    db_pool: Pool,
+    config: Config,
+):
+    """
+    Закончить модерацию: отпустить захваченные заявки для других админов.
+    """
+    if not _is_admin(callback.from_user.id, config):
+        await callback.answer("Нет доступа")
+        return
+
+    await release_pending_masters(db_pool, callback.from_user.id)
+    await callback.message.edit_text("Модерация завершена, заявки отпущены.")
+    await callback.answer()
+
+
+# Сколько заявок показывать в массовом режиме (до 100 кнопок в сообщении)
+BULK_MODERATION_BATCH = 30
+
+
+async def _show_bulk_queue(
+    callback: CallbackQuery,
+    db_pool: Pool,
+    state: FSMContext,
+) -> None:
+    """
+    Массовая модерация в сообщении очереди: захваченные заявки с переключателями.
+    Выбор хранится в данных FSM (bulk_selected).
+    """
+    masters = await claim_pending_masters(db_pool, callback.from_user.id, BULK_MODERATION_BATCH)
+    data = await state.get_data()
+    selected = set(data.get("bulk_selected", [])) & {m["id"] for m in masters}
+
+    if not masters:
+        await callback.message.edit_text("Нет заявок мастеров.")
+        return
+
+    lines: List[str] = [
+        f"Массовая модерация: взято {len(masters)}, "
+        f"всего в очереди {masters[0]['queue_total']}.",
+        "Отметьте заявки и примените решение.",
+        "",
+    ]
+    for m in masters:
+        lines.append(
+            f"#{m['id']} {html.escape(m['name'])} — {html.escape(m['category'] or '-')}, "
+            f"{m['price_min'] or ''}–{m['price_max'] or ''}, "
+            f"тел. {html.escape(m['phone'] or '-')}"
+        )
+    labels = [(m["id"], f"#{m['id']} {m['name'][:30]}") for m in masters]
+    try:
+        await callback.message.edit_text(
+            "\n".join(lines), reply_markup=admin_bulk_keyboard(labels, selected)
+        )
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            raise
+
+
+@router.callback_query(F.data == "admin:bulk:open")
+async def admin_bulk_open(
+    callback: CallbackQuery,
+    db_pool: Pool,
+    config: Config,
+    state: FSMContext,
+):
+    """
+    Переключить очередь модерации в массовый режим.
+    """
+    if not _is_admin(callback.from_user.id, config):
+        await callback.answer("Нет доступа")
+        return
+
+    await state.update_data(bulk_selected=[])
+    await _show_bulk_queue(callback, db_pool, state)
+    await callback.answer()
+
+
+@router.callback_query(
+    F.data.startswith("admin:bulk:toggle:")
+    | (F.data == "admin:bulk:all")
+    | (F.data == "admin:bulk:none")
+)
+async def admin_bulk_select(
+    callback: CallbackQuery,
+    db_pool: Pool,
+    config: Config,
+    state: FSMContext,
+):
+    """
+    Отметить или снять заявку; «Выбрать все» / «Снять все».
+    """
+    if not _is_admin(callback.from_user.id, config):
+        await callback.answer("Нет доступа")
+        return
+
+    data = await state.get_data()
+    selected = set(data.get("bulk_selected", []))
+    if callback.data == "admin:bulk:all":
+        masters = await claim_pending_masters(
+            db_pool, callback.from_user.id, BULK_MODERATION_BATCH
+        )
+        selected = {m["id"] for m in masters}
+    elif callback.data == "admin:bulk:none":
+        selected = set()
+    else:
         try:
-            await callback.bot.send_message(
-                master["telegram_id"],
-                "К сожалению, ваша заявка мастера была отклонена.",
-            )
-        except Exception:
-            pass
+            master_id = int(callback.data.rsplit(":", 1)[1])
+        except ValueError:
+            await callback.answer("Некорректные данные")
+            return
+        selected ^= {master_id}
+
+    await state.update_data(bulk_selected=sorted(selected))
+    await _show_bulk_queue(callback, db_pool, state)
+    await callback.answer()
 
 
-@router.callback_query(F.data == "admin:masters:all")
-async def admin_all_masters(
+@router.callback_query(F.data.startswith("admin:bulk:apply:"))
+async def admin_bulk_apply(
     callback: CallbackQuery,
     db_pool: Pool,
     config: Config,
+    state: FSMContext,
+    notifier: Notifier,
 ):
     """
-    Показ списка всех мастеров.
+    Применить решение ко всем выбранным заявкам одним UPDATE;
+    уведомления мастерам уходят в фоне через Notifier.
     """
     if not _is_admin(callback.from_user.id, config):
         await callback.answer("Нет доступа")
         return
 
-    masters = await get_all_masters(db_pool)
+    try:
+        status, _, notice = MODERATION_DECISIONS[callback.data.rsplit(":", 1)[1]]
+    except KeyError:
+        await callback.answer("Некорректные данные")
+        return
+
+    data = await state.get_data()
+    selected = data.get("bulk_selected", [])
+    if not selected:
+        await callback.answer("Ничего не выбрано")
+        return
+
+    masters = await set_master_status_many(db_pool, selected, status, callback.from_user.id)
+    await state.update_data(bulk_selected=[])
+    skipped = len(selected) - len(masters)
+    text = f"Готово: {len(masters)}."
+    if skipped:
+        text += f" Пропущено {skipped}: их уже обработал другой модератор."
+    await callback.answer(text, show_alert=bool(skipped))
+
+    for m in masters:
+        if m["telegram_id"]:
+            notifier.notify(callback.bot, m["telegram_id"], notice)
+
+    await _show_bulk_queue(callback, db_pool, state)
+
+
+# Мастеров на странице списка: строка ~100 символов, запас до 4096
+MASTERS_PAGE_SIZE = 25
+
+
+async def _show_masters_page(
+    message: Message,
+    db_pool: Pool,
+    cursor_id: int = 0,
+    direction: str = "next",
+    edit: bool = True,
+) -> None:
+    masters, has_newer, has_older = await get_masters_page(
+        db_pool, cursor_id, direction, MASTERS_PAGE_SIZE
+    )
     if not masters:
-        await callback.message.answer("Мастеров пока нет.")
-        await callback.answer()
+        await message.answer("Мастеров пока нет.")
         return
 
     lines: List[str] = ["Список всех мастеров:", ""]
     for m in masters:
         lines.append(
-            f"#{m['id']} {m['name']} — статус: {m['status']}, "
-            f"категория: {m['category']}, рейтинг: {m['rating']}"
+            f"#{m.id} {html.escape(m.name)} — статус: {m.status}, "
+            f"категория: {html.escape(m.category or '-')}, рейтинг: {m.rating}"
+        )
+    text = "\n".join(lines)
+    keyboard = admin_masters_page_keyboard(
+        masters[0].id, masters[-1].id, has_newer, has_older
+    )
+    if edit:
+        await message.edit_text(text, reply_markup=keyboard)
+    else:
+        await message.answer(text, reply_markup=keyboard)
+
+
+@router.callback_query(F.data == "admin:masters:all")
+async def admin_all_masters(
+    callback: CallbackQuery,
+    db_pool: Pool,
+    config: Config,
+):
+    """
+    Список всех мастеров постранично, новые первыми.
+    """
+    if not _is_admin(callback.from_user.id, config):
+        await callback.answer("Нет доступа")
+        return
+
+    await _show_masters_page(callback.message, db_pool, edit=False)
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("admin:masters:page:"))
+async def admin_masters_page(
+    callback: CallbackQuery,
+    db_pool: Pool,
+    config: Config,
+):
+    """
+    Листание списка всех мастеров в том же сообщении.
+    """
+    if not _is_admin(callback.from_user.id, config):
+        await callback.answer("Нет доступа")
+        return
+
+    try:
+        _, _, _, direction, cursor_str = callback.data.split(":", 4)
+        cursor_id = int(cursor_str)
+    except ValueError:
+        await callback.answer("Некорректные данные")
+        return
+
+    await _show_masters_page(callback.message, db_pool, cursor_id, direction)
+    await callback.answer()
+
+
+async def _send_export(message: Message, db_pool: Pool, table: str) -> None:
+    """
+    Выгрузить таблицу во временный .csv.gz и отправить документом.
+    """
+    await message.bot.send_chat_action(message.chat.id, "upload_document")
+    path, rows = await export_table(db_pool, table)
+    try:
+        await message.answer_document(
+            FSInputFile(path, filename=f"{table}-{datetime.now():%Y%m%d-%H%M}.csv.gz"),
+            caption=f"Выгрузка {table}: {rows} строк.",
         )
+    finally:
+        os.remove(path)
+
 
-    await callback.message.answer("\n".join(lines))
+@router.message(Command("export"))
+async def admin_export_command(
+    message: Message,
+    db_pool: Pool,
+    config: Config,
+):
+    """
+    /export [masters|reviews] — выгрузка в CSV (по умолчанию мастера).
+    """
+    if not _is_admin(message.from_user.id, config):
+        await message.answer("У вас нет доступа к выгрузке.")
+        return
+
+    parts = message.text.split()
+    table = parts[1] if len(parts) > 1 else "masters"
+    if table not in EXPORTS:
+        await message.answer("Использование: /export masters или /export reviews")
+        return
+
+    await _send_export(message, db_pool, table)
+
+
+@router.callback_query(F.data.startswith("admin:export:"))
+async def admin_export(
+    callback: CallbackQuery,
+    db_pool: Pool,
+    config: Config,
+):
+    """
+    Кнопки выгрузки под списком мастеров.
+    """
+    if not _is_admin(callback.from_user.id, config):
+        await callback.answer("Нет доступа")
+        return
+
+    table = callback.data.rsplit(":", 1)[1]
+    if table not in EXPORTS:
+        await callback.answer("Некорректные данные")
+        return
+
+    await callback.answer("Готовлю выгрузку...")
+    await _send_export(callback.message, db_pool, table)
+
+
+# ======================
+#   Рассылка
+# ======================
+
+class BroadcastStates(StatesGroup):
+    text = State()
+
+
+@router.callback_query(F.data == "admin:broadcast:new")
+async def admin_broadcast_new(
+    callback: CallbackQuery,
+    state: FSMContext,
+    config: Config,
+):
+    """
+    Начать рассылку: запросить текст.
+    """
+    if not _is_admin(callback.from_user.id, config):
+        await callback.answer("Нет доступа")
+        return
+
+    await state.set_state(BroadcastStates.text)
+    await callback.message.answer(
+        "Пришлите текст рассылки. Форматирование (жирный, ссылки и т.п.) сохранится."
+    )
+    await callback.answer()
+
+
+@router.message(BroadcastStates.text)
+async def admin_broadcast_text(
+    message: Message,
+    state: FSMContext,
+    db_pool: Pool,
+):
+    """
+    Предпросмотр рассылки и подтверждение.
+    """
+    if not message.text:
+        await message.answer("Нужен текст сообщения.")
+        return
+
+    await state.update_data(broadcast_text=message.html_text)
+    recipients = await count_active_users(db_pool)
+    await message.answer(message.html_text)
+    await message.answer(
+        f"Так увидят рассылку пользователи. Отправить {recipients} активным пользователям?",
+        reply_markup=admin_broadcast_confirm_keyboard(),
+    )
+
+
+@router.callback_query(F.data == "admin:broadcast:send")
+async def admin_broadcast_send(
+    callback: CallbackQuery,
+    state: FSMContext,
+    db_pool: Pool,
+    config: Config,
+    broadcaster: Broadcaster,
+):
+    """
+    Создать задание рассылки; отправляет её фоновый Broadcaster.
+    """
+    if not _is_admin(callback.from_user.id, config):
+        await callback.answer("Нет доступа")
+        return
+
+    data = await state.get_data()
+    text = data.get("broadcast_text")
+    await state.clear()
+    if not text:
+        await callback.answer("Рассылка устарела, начните заново")
+        return
+
+    await callback.message.edit_text("Рассылка готовится...")
+    job = await create_broadcast(
+        db_pool, callback.message.chat.id, callback.message.message_id, text
+    )
+    await callback.message.edit_text(
+        broadcast_progress_text(job),
+        reply_markup=admin_broadcast_progress_keyboard(job["id"]),
+    )
+    broadcaster.wake()
+    await callback.answer()
+
+
+@router.callback_query(F.data == "admin:broadcast:abort")
+async def admin_broadcast_abort(callback: CallbackQuery, state: FSMContext):
+    await state.clear()
+    await callback.message.edit_text("Рассылка отменена.")
     await callback.answer()
 
 
+@router.callback_query(F.data.startswith("admin:broadcast:cancel:"))
+async def admin_broadcast_cancel(
+    callback: CallbackQuery,
+    db_pool: Pool,
+    config: Config,
+):
+    """
+    Остановить идущую рассылку: Broadcaster заметит это после текущей пачки.
+    """
+    if not _is_admin(callback.from_user.id, config):
+        await callback.answer("Нет доступа")
+        return
+
+    try:
+        broadcast_id = int(callback.data.rsplit(":", 1)[1])
+    except ValueError:
+        await callback.answer("Некорректные данные")
+        return
+
+    job = await cancel_broadcast(db_pool, broadcast_id)
+    if job is None:
+        await callback.answer("Рассылка уже завершена")
+        return
+
+    await callback.message.edit_text(broadcast_progress_text(job))
+    await callback.answer("Рассылка остановлена")
+
+
 # ======================
 #   Инфо-разделы
 # ======================
@@ -384,3 +838,134 @@ async def admin_faq_answer(
     await add_faq(db_pool, question=question, answer=answer)
     await message.answer("FAQ добавлен.")
     await state.clear()
+
+
+# ======================
+#   Медленные запросы
+# ======================
+
+# Запас под заголовок в пределах 4096 символов сообщения
+PLAN_TEXT_LIMIT = 3500
+
+
+@router.callback_query(F.data == "admin:slow:list")
+async def admin_slow_queries(
+    callback: CallbackQuery,
+    db_pool: Pool,
+    config: Config,
+):
+    """
+    Последние планы медленных запросов (см. db/slow_queries.py).
+    """
+    if not _is_admin(callback.from_user.id, config):
+        await callback.answer("Нет доступа")
+        return
+
+    plans = await get_slow_query_plans(db_pool)
+    if not plans:
+        await callback.message.answer(
+            "Планов медленных запросов нет. "
+            "Сбор включается переменными SLOW_QUERY_MS и SLOW_QUERY_EXPLAIN."
+        )
+        await callback.answer()
+        return
+
+    lines: List[str] = ["Медленные запросы:"]
+    for p in plans:
+        lines.append(
+            f"#{p['id']} {p['captured_at']:%d.%m %H:%M} — {p['duration_ms']:.0f} мс, "
+            f"{html.escape(p['service'])}\n<code>{html.escape(p['query'])}</code>"
+        )
+
+    await callback.message.answer(
+        "\n\n".join(lines),
+        reply_markup=admin_slow_queries_keyboard([p["id"] for p in plans]),
+    )
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("admin:slow:view:"))
+async def admin_slow_query_plan(
+    callback: CallbackQuery,
+    db_pool: Pool,
+    config: Config,
+):
+    """
+    План EXPLAIN (ANALYZE, BUFFERS) одного медленного запроса.
+    """
+    if not _is_admin(callback.from_user.id, config):
+        await callback.answer("Нет доступа")
+        return
+
+    try:
+        plan_id = int(callback.data.rsplit(":", 1)[1])
+    except ValueError:
+        await callback.answer("Некорректные данные")
+        return
+
+    plan = await get_slow_query_plan(db_pool, plan_id)
+    if not plan:
+        await callback.answer("План не найден")
+        return
+
+    plan_text = plan["plan"]
+    if len(plan_text) > PLAN_TEXT_LIMIT:
+        plan_text = plan_text[:PLAN_TEXT_LIMIT] + "\n…"
+    await callback.message.answer(
+        f"План #{plan['id']} — {plan['duration_ms']:.0f} мс, "
+        f"{html.escape(plan['service'])}\n"
+        f"Параметры: {html.escape(plan['param_types'] or '-')}\n\n"
+        f"<pre>{html.escape(plan_text)}</pre>"
+    )
+    await callback.answer()
+
+
+# ======================
+#   Массовый импорт
+# ======================
+
+IMPORT_USAGE = (
+    "Пришлите CSV или JSONL файлом с подписью <code>/import masters</code> "
+    "или <code>/import reviews</code>.\n"
+    "Мастера: name, category, telegram_id, username, phone, description, "
+    "price_min, price_max, status (по умолчанию approved).\n"
+    "Отзывы: master_id, user_id, rating, username, text."
+)
+
+
+@router.message(F.document, F.caption.startswith("/import"))
+async def admin_import_file(
+    message: Message,
+    bot: Bot,
+    db_pool: Pool,
+    config: Config,
+):
+    """
+    Импорт мастеров или отзывов из присланного файла через COPY
+    (см. services/import_service.py; большие файлы — через bulk_import.py).
+    """
+    if not _is_admin(message.from_user.id, config):
+        await message.answer("У вас нет доступа к импорту.")
+        return
+
+    parts = message.caption.split()
+    target = parts[1] if len(parts) > 1 else ""
+    if target not in ("masters", "reviews"):
+        await message.answer(IMPORT_USAGE)
+        return
+
+    buffer = await bot.download(message.document, destination=io.BytesIO())
+    stream = io.TextIOWrapper(buffer, encoding="utf-8-sig", newline="")
+    rows = read_rows(stream, detect_format(message.document.file_name or ""))
+    # Разбор и проверка строк идут в потоке (см. import_service._BatchReader).
+    # Ошибка чтения посреди файла не теряет уже загруженное: она попадает
+    # в result.aborted, и в отчёте видно, сколько строк успело загрузиться.
+    if target == "masters":
+        result = await import_masters(db_pool, rows)
+    else:
+        result = await import_reviews(db_pool, rows)
+
+    text = html.escape(result.summary())
+    if result.errors:
+        text += "\n\nОшибки:\n" + "\n".join(html.escape(e) for e in result.errors)
+    await message.answer(text)
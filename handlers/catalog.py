@@ -1,39 +1,59 @@
-from typing import Optional
+from typing import NamedTuple, Optional
 import asyncpg
 
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery, InputMediaPhoto
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InputMediaPhoto
 
 from keyboards.catalog import (
     catalog_filters_keyboard,
     master_card_keyboard,
     CATEGORIES,
 )
-from services.masters_service import get_approved_masters, get_master_by_id
+from services.masters_service import (
+    get_adjacent_master,
+    get_approved_masters,
+    get_master_card,
+)
 from services.reviews_service import get_reviews_for_master
+from services.catalog_cache import catalog_cache
+from services.models import MasterListItem
 
 router = Router()
 DEFAULT_CATEGORY = "Все"
 DEFAULT_SORT = "rating"
+CATALOG_SORTS = ("rating", "price", "reviews")
+# Правка без изменений: карточка уже показана, новое сообщение не нужно
+_NOT_MODIFIED = "message is not modified"
 
 
-async def _render_master_short(record) -> str:
+async def _render_master_short(master: MasterListItem) -> str:
     """
     Формирует короткое описание мастера для списка.
     """
     price_part = ""
-    if record["price_min"] or record["price_max"]:
-        p_from = record["price_min"] or ""
-        p_to = record["price_max"] or ""
+    if master.price_min or master.price_max:
+        p_from = master.price_min or ""
+        p_to = master.price_max or ""
         price_part = f"\nЦена: {p_from}–{p_to}"
-    rating = float(record["rating"] or 0)
-    reviews_count = int(record["reviews_count"] or 0)
     return (
-        f"#{record['id']} {record['name']} ({record['category'] or 'Без категории'})"
-        f"{price_part}\nРейтинг: {rating} ({reviews_count} отзывов)"
+        f"#{master.id} {master.name} ({master.category or 'Без категории'})"
+        f"{price_part}\nРейтинг: {master.rating} ({master.reviews_count} отзывов)"
     )
 
 
+def _render_stars_histogram(record, reviews_count: int, width: int = 10) -> list[str]:
+    """
+    Распределение оценок по звёздам: от 5 к 1, полоска пропорциональна доле отзывов.
+    """
+    lines = []
+    for star in range(5, 0, -1):
+        count = int(record[f"stars_{star}"] or 0)
+        bar = "▇" * round(count / reviews_count * width)
+        lines.append(f"{star}⭐ {bar} {count}")
+    return lines
+
+
 async def _render_master_full(record, reviews) -> str:
     """
     Формирует полное описание мастера для карточки.
@@ -62,6 +82,8 @@ async def _render_master_full(record, reviews) -> str:
     rating = float(record["rating"] or 0)
     reviews_count = int(record["reviews_count"] or 0)
     lines.append(f"\nРейтинг: {rating} ({reviews_count} отзывов)")
+    if reviews_count:
+        lines.extend(_render_stars_histogram(record, reviews_count))
 
     if reviews:
         lines.append("\nПоследние отзывы:")
@@ -72,35 +94,28 @@ async def _render_master_full(record, reviews) -> str:
     return "\n".join(lines)
 
 
-async def _get_masters_for_view(
-    db_pool: asyncpg.Pool,
-    category: str,
-    sort_key: str,
-    limit: int = 50,
-):
-    return await get_approved_masters(
-        db_pool,
-        category=category if category != DEFAULT_CATEGORY else None,
-        sort_by=sort_key,  # type: ignore[arg-type]
-        limit=limit,
-    )
-
-
 async def _send_master_card(
     target_message: Message,
     master,
     reviews,
-    category: str,
-    sort_key: str,
-    index: int,
-    total: int,
+    category: Optional[str],
+    sort_key: Optional[str],
     send_new: bool = False,
+    position: Optional[int] = None,
+    total: Optional[int] = None,
+    has_neighbours: bool = True,
 ):
     """
     Показать карточку мастера: либо новым сообщением, либо редактируя текущее.
+    Без category/sort_key или без соседей карточка показывается без навигации.
+    Если известно место мастера в каталоге (position/total), оно выводится в карточке.
+    Новое сообщение вместо правки отправляется, только если текущее
+    отредактировать нельзя (слишком старое, удалено и т.п.).
     """
     text = await _render_master_full(master, reviews)
-    keyboard = master_card_keyboard(master["id"], category, sort_key, index, total)
+    if position is not None and total:
+        text += f"\n\nМесто в каталоге: {position} из {total}"
+    keyboard = master_card_keyboard(master["id"], category, sort_key, has_neighbours)
 
     target_has_photo = bool(target_message.photo)
     master_has_photo = bool(master["photo_file_id"])
@@ -124,7 +139,9 @@ async def _send_master_card(
                     ),
                     reply_markup=keyboard,
                 )
-            except Exception:
+            except TelegramBadRequest as e:
+                if _NOT_MODIFIED in str(e):
+                    return
                 await target_message.answer_photo(
                     photo=master["photo_file_id"],
                     caption=text,
@@ -142,43 +159,77 @@ async def _send_master_card(
                     text,
                     reply_markup=keyboard,
                 )
-            except Exception:
+            except TelegramBadRequest as e:
+                if _NOT_MODIFIED in str(e):
+                    return
                 await target_message.answer(
                     text,
                     reply_markup=keyboard,
                 )
 
 
-@router.message(F.text == "Каталог мастеров")
+class CatalogPage(NamedTuple):
+    text: str
+    keyboard: InlineKeyboardMarkup
+    is_empty: bool
+
+
+async def _get_catalog_page(
+    db_pool: asyncpg.Pool,
+    category: str,
+    sort_key: str,
+) -> CatalogPage:
+    """
+    Готовая страница каталога для (категория, сортировка).
+    Берётся из catalog_cache, в БД идём только при промахе.
+    """
+
+    async def render() -> CatalogPage:
+        masters = await get_approved_masters(
+            db_pool,
+            category=category if category != DEFAULT_CATEGORY else None,
+            sort_by=sort_key,  # type: ignore[arg-type]
+        )
+        keyboard = catalog_filters_keyboard(
+            current_category=category, current_sort=sort_key
+        )
+        # Заголовок "Каталог мастеров — <категория>" нужен catalog_change_sort,
+        # который восстанавливает из него текущую категорию.
+        text_lines = [f"Каталог мастеров — {category}", ""]
+        if not masters:
+            text_lines.append("Подходящих мастеров пока не найдено.")
+            return CatalogPage("\n".join(text_lines), keyboard, is_empty=True)
+
+        for m in masters:
+            text_lines.append(await _render_master_short(m))
+        return CatalogPage("\n".join(text_lines), keyboard, is_empty=False)
+
+    # callback_data приходит от клиента: кэшируем только известные комбинации,
+    # чтобы число страниц в кэше было ограничено.
+    if category not in CATEGORIES or sort_key not in CATALOG_SORTS:
+        return await render()
+    return await catalog_cache.get_or_render(category, sort_key, render)
+
+
+@router.message(F.text == "Каталог мастеров", flags={"throttling_key": "catalog"})
 async def catalog_entry(message: Message, db_pool: asyncpg.Pool):
     """
     Вход в каталог: показываем краткий список по дефолту (Все, сортировка по рейтингу).
     """
-    masters = await get_approved_masters(
-        db_pool, category=None, sort_by=DEFAULT_SORT
-    )
-    if not masters:
+    page = await _get_catalog_page(db_pool, DEFAULT_CATEGORY, DEFAULT_SORT)
+    if page.is_empty:
         await message.answer(
             "Пока нет одобренных мастеров. Попробуйте позже."
         )
         return
 
-    text_lines = ["Каталог мастеров (топ 10):", ""]
-    for m in masters:
-        text_lines.append(await _render_master_short(m))
-
-    await message.answer(
-        "\n".join(text_lines),
-        reply_markup=catalog_filters_keyboard(
-            current_category=DEFAULT_CATEGORY, current_sort=DEFAULT_SORT
-        ),
-    )
+    await message.answer(page.text, reply_markup=page.keyboard)
     await message.answer(
         "Чтобы посмотреть карточку мастера отправьте в чат его ID или нажмите Смотреть мастеров\n Например: #1"
     )
 
 
-@router.callback_query(F.data.startswith("catalog:cat:"))
+@router.callback_query(F.data.startswith("catalog:cat:"), flags={"throttling_key": "catalog"})
 async def catalog_change_category(
     callback: CallbackQuery,
     db_pool: asyncpg.Pool,
@@ -188,36 +239,12 @@ async def catalog_change_category(
     """
     _, _, category = callback.data.split(":", 2)
 
-    masters = await get_approved_masters(
-        db_pool,
-        category=category if category != DEFAULT_CATEGORY else None,
-        sort_by=DEFAULT_SORT,
-    )
-
-    if not masters:
-        await callback.message.edit_text(
-            f"Мастера в категории «{category}» пока не найдены.",
-            reply_markup=catalog_filters_keyboard(
-                current_category=category, current_sort=DEFAULT_SORT
-            ),
-        )
-        await callback.answer()
-        return
-
-    text_lines = [f"Каталог мастеров — {category}", ""]
-    for m in masters:
-        text_lines.append(await _render_master_short(m))
-
-    await callback.message.edit_text(
-        "\n".join(text_lines),
-        reply_markup=catalog_filters_keyboard(
-            current_category=category, current_sort=DEFAULT_SORT
-        ),
-    )
+    page = await _get_catalog_page(db_pool, category, DEFAULT_SORT)
+    await callback.message.edit_text(page.text, reply_markup=page.keyboard)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("catalog:sort:"))
+@router.callback_query(F.data.startswith("catalog:sort:"), flags={"throttling_key": "catalog"})
 async def catalog_change_sort(
     callback: CallbackQuery,
     db_pool: asyncpg.Pool,
@@ -229,67 +256,52 @@ async def catalog_change_sort(
 
     # попытаемся извлечь последнюю выбранную категорию из текста (упрощённо)
     text = callback.message.text or ""
-    current_category: Optional[str] = "Все"
+    current_category = DEFAULT_CATEGORY
     for cat in CATEGORIES:
-        if f"— {cat}" in text or f"Каталог мастеров — {cat}" in text:
+        if f"Каталог мастеров — {cat}" in text:
             current_category = cat
             break
 
-    masters = await get_approved_masters(
-        db_pool,
-        category=current_category if current_category != DEFAULT_CATEGORY else None,
-        sort_by=sort_key,  # type: ignore[arg-type]
-    )
-
-    if not masters:
-        await callback.message.edit_text(
-            "Подходящих мастеров не найдено.",
-            reply_markup=catalog_filters_keyboard(
-                current_category=current_category or DEFAULT_CATEGORY,
-                current_sort=sort_key,
-            ),
-        )
-        await callback.answer()
-        return
-
-    text_lines = [f"Каталог мастеров — {current_category}", ""]
-    for m in masters:
-        text_lines.append(await _render_master_short(m))
-
-    await callback.message.edit_text(
-        "\n".join(text_lines),
-        reply_markup=catalog_filters_keyboard(
-            current_category=current_category or DEFAULT_CATEGORY,
-            current_sort=sort_key,
-        ),
-    )
+    page = await _get_catalog_page(db_pool, current_category, sort_key)
+    await callback.message.edit_text(page.text, reply_markup=page.keyboard)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("catalog:view:"))
+@router.callback_query(F.data.startswith("catalog:view:"), flags={"throttling_key": "master_card"})
 async def catalog_view_master(
     callback: CallbackQuery,
     db_pool: asyncpg.Pool,
 ):
     """
     Просмотр карточки мастера и навигация по списку через inline-кнопки.
+    В callback_data приходит курсор — id мастера, от которого идём вперёд/назад.
     """
     try:
-        _, _, category, sort_key, index_str = callback.data.split(":", 4)
-        index = int(index_str)
+        _, _, category, sort_key, direction, cursor_str = callback.data.split(":", 5)
+        cursor_id = int(cursor_str)
     except ValueError:
         await callback.answer("Не удалось открыть карточку.")
         return
 
-    masters = await _get_masters_for_view(db_pool, category, sort_key)
-    if not masters:
-        await callback.answer("Мастера не найдены.")
+    if direction not in ("next", "prev"):
+        await callback.answer("Не удалось открыть карточку.")
         return
 
-    if index < 0 or index >= len(masters):
-        index = 0
+    master = await get_adjacent_master(
+        db_pool,
+        cursor_id,
+        direction=direction,  # type: ignore[arg-type]
+        category=category if category != DEFAULT_CATEGORY else None,
+        sort_by=sort_key,  # type: ignore[arg-type]
+    )
+    if not master:
+        await callback.answer("Мастера не найдены.")
+        return
+    if master["id"] == cursor_id:
+        # Мастер в каталоге один: листать некуда, карточка уже на экране
+        await callback.answer()
+        return
 
-    master = masters[index]
     reviews = await get_reviews_for_master(db_pool, master["id"])
 
     # Если нажали из списка каталога — отправляем новое сообщение, иначе редактируем карточку.
@@ -300,14 +312,16 @@ async def catalog_view_master(
         reviews=reviews,
         category=category,
         sort_key=sort_key,
-        index=index,
-        total=len(masters),
         send_new=send_new,
+        has_neighbours=master["has_neighbours"],
     )
     await callback.answer()
 
 
-@router.message(F.text.startswith("#") & F.text.regexp(r"^#\d+"))
+@router.message(
+    F.text.startswith("#") & F.text.regexp(r"^#\d+"),
+    flags={"throttling_key": "master_card"},
+)
 async def show_master_by_hash(message: Message, db_pool: asyncpg.Pool):
     """
     Простой хак: если пользователь отправит #ID мастера - покажем карточку мастера.
@@ -318,33 +332,25 @@ async def show_master_by_hash(message: Message, db_pool: asyncpg.Pool):
     except (TypeError, ValueError):
         return
 
-    master = await get_master_by_id(db_pool, master_id)
+    # Мастер, последние отзывы и его место в каталоге — одним запросом.
+    master = await get_master_card(
+        db_pool, master_id, category=None, sort_by=DEFAULT_SORT
+    )
     if not master:
         await message.answer("Мастер не найден.")
         return
 
-    reviews = await get_reviews_for_master(db_pool, master_id)
-
-    masters_for_nav = await _get_masters_for_view(
-        db_pool, DEFAULT_CATEGORY, DEFAULT_SORT
-    )
-    total = len(masters_for_nav)
-    index = 0
-    for idx, m in enumerate(masters_for_nav):
-        if m["id"] == master_id:
-            index = idx
-            break
-    else:
-        # если запрошенный мастер не попал в топ списка — отключаем навигацию
-        total = 1
+    # Навигация есть, только если мастер входит в каталог (одобрен)
+    # и в каталоге есть кто-то кроме него.
+    navigable = master["position"] is not None and master["total"] > 1
 
     await _send_master_card(
         target_message=message,
         master=master,
-        reviews=reviews,
-        category=DEFAULT_CATEGORY,
-        sort_key=DEFAULT_SORT,
-        index=index,
-        total=total if total > 0 else 1,
+        reviews=master["latest_reviews"] or [],
+        category=DEFAULT_CATEGORY if navigable else None,
+        sort_key=DEFAULT_SORT if navigable else None,
         send_new=True,
+        position=master["position"],
+        total=master["total"],
     )
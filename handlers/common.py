@@ -1,8 +1,10 @@
 from aiogram import Router, F
-from aiogram.filters import CommandStart, Command
-from aiogram.types import Message
+from aiogram.enums import ChatType
+from aiogram.filters import KICKED, ChatMemberUpdatedFilter, CommandStart, Command
+from aiogram.types import ChatMemberUpdated, Message
 
 from keyboards.common import main_menu_keyboard
+from services.broadcast_service import deactivate_users
 
 
 router = Router()
@@ -35,3 +37,14 @@ async def cmd_menu(message: Message):
     await message.answer(
         "Главное меню:", reply_markup=main_menu_keyboard()
     )
+
+
+@router.my_chat_member(F.chat.type == ChatType.PRIVATE, ChatMemberUpdatedFilter(KICKED))
+async def bot_blocked(event: ChatMemberUpdated, db_pool):
+    """
+    Пользователь заблокировал бота — не слать ему рассылки.
+    Этот хендлер же включает my_chat_member в allowed_updates: без него
+    Telegram не присылает ни блокировку, ни разблокировку, и
+    UserRegistryMiddleware не узнаёт о возвращении пользователя.
+    """
+    await deactivate_users(db_pool, [event.from_user.id])
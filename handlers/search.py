@@ -0,0 +1,95 @@
+import html
+
+import asyncpg
+
+from aiogram import Router, F
+from aiogram.types import Message, CallbackQuery
+from aiogram.fsm.state import StatesGroup, State
+from aiogram.fsm.context import FSMContext
+
+from handlers.catalog import _render_master_short
+from keyboards.search import search_results_keyboard
+from services.masters_service import search_masters
+
+router = Router()
+PAGE_SIZE = 5
+
+
+class SearchStates(StatesGroup):
+    query = State()
+
+
+async def _render_search_page(db_pool: asyncpg.Pool, query: str, page: int):
+    """
+    Текст и клавиатура страницы результатов поиска.
+    Берём на одну запись больше, чтобы понять, есть ли следующая страница.
+    """
+    masters = await search_masters(
+        db_pool, query, limit=PAGE_SIZE + 1, offset=page * PAGE_SIZE
+    )
+    has_next = len(masters) > PAGE_SIZE
+    masters = masters[:PAGE_SIZE]
+
+    if not masters:
+        return f"По запросу «{html.escape(query)}» ничего не найдено.", None
+
+    text_lines = [f"Результаты поиска «{html.escape(query)}» (стр. {page + 1}):", ""]
+    for m in masters:
+        text_lines.append(await _render_master_short(m))
+    text_lines.append("")
+    text_lines.append("Чтобы открыть карточку, отправьте ID мастера, например: #1")
+
+    keyboard = search_results_keyboard(page, has_prev=page > 0, has_next=has_next)
+    return "\n".join(text_lines), keyboard
+
+
+@router.message(F.text == "Поиск")
+async def search_start(message: Message, state: FSMContext):
+    """
+    Вход в режим поиска.
+    """
+    await state.clear()
+    await message.answer(
+        "Что ищем? Напишите имя мастера, категорию или услугу.\n"
+        "Например: сантехник смеситель"
+    )
+    await state.set_state(SearchStates.query)
+
+
+@router.message(SearchStates.query, F.text, flags={"throttling_key": "search"})
+async def search_query(message: Message, state: FSMContext, db_pool: asyncpg.Pool):
+    """
+    Выполняем поиск. Остаёмся в режиме поиска, чтобы можно было уточнить запрос.
+    """
+    query = message.text.strip()
+    await state.update_data(search_query=query)
+
+    text, keyboard = await _render_search_page(db_pool, query, page=0)
+    await message.answer(text, reply_markup=keyboard)
+
+
+@router.callback_query(F.data.startswith("search:page:"), flags={"throttling_key": "search"})
+async def search_page(
+    callback: CallbackQuery,
+    state: FSMContext,
+    db_pool: asyncpg.Pool,
+):
+    """
+    Листание страниц результатов поиска.
+    """
+    try:
+        _, _, page_str = callback.data.split(":", 2)
+        page = max(int(page_str), 0)
+    except ValueError:
+        await callback.answer("Некорректные данные")
+        return
+
+    data = await state.get_data()
+    query = data.get("search_query")
+    if not query:
+        await callback.answer("Поиск устарел, начните заново.")
+        return
+
+    text, keyboard = await _render_search_page(db_pool, query, page)
+    await callback.message.edit_text(text, reply_markup=keyboard)
+    await callback.answer()
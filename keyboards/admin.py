@@ -1,3 +1,5 @@
+from typing import List, Set, Tuple
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
 
@@ -27,28 +29,137 @@ def admin_main_keyboard() -> InlineKeyboardMarkup:
                     text="FAQ", callback_data="admin:faq:menu"
                 )
             ],
+            [
+                InlineKeyboardButton(
+                    text="Рассылка", callback_data="admin:broadcast:new"
+                )
+            ],
+            [
+                InlineKeyboardButton(
+                    text="Медленные запросы", callback_data="admin:slow:list"
+                )
+            ],
         ]
     )
 
 
-def admin_pending_master_keyboard(master_id: int) -> InlineKeyboardMarkup:
+def admin_moderation_keyboard(
+    master_id: int,
+    index: int,
+    count: int,
+    has_photo: bool,
+) -> InlineKeyboardMarkup:
     """
-    Клавиатура для заявки мастера (одобрить / отклонить).
+    Клавиатура очереди модерации: решение по заявке index из count захваченных
+    и навигация по ним в том же сообщении.
     """
-    return InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(
-                    text="✅ Одобрить",
-                    callback_data=f"admin:masters:approve:{master_id}",
-                ),
-                InlineKeyboardButton(
-                    text="❌ Отклонить",
-                    callback_data=f"admin:masters:reject:{master_id}",
-                ),
-            ]
+    rows = [
+        [
+            InlineKeyboardButton(
+                text="✅ Одобрить",
+                callback_data=f"admin:mod:approve:{master_id}:{index}",
+            ),
+            InlineKeyboardButton(
+                text="❌ Отклонить",
+                callback_data=f"admin:mod:reject:{master_id}:{index}",
+            ),
+        ],
+        [
+            InlineKeyboardButton(
+                text="◀️", callback_data=f"admin:mod:page:{(index - 1) % count}"
+            ),
+            InlineKeyboardButton(
+                text=f"{index + 1} / {count}", callback_data=f"admin:mod:page:{index}"
+            ),
+            InlineKeyboardButton(
+                text="▶️", callback_data=f"admin:mod:page:{(index + 1) % count}"
+            ),
+        ],
+    ]
+    if has_photo:
+        rows.append(
+            [InlineKeyboardButton(text="📷 Фото", callback_data=f"admin:mod:photo:{master_id}")]
+        )
+    rows.append(
+        [
+            InlineKeyboardButton(text="Массовый режим", callback_data="admin:bulk:open"),
+            InlineKeyboardButton(text="Завершить", callback_data="admin:mod:release"),
+        ]
+    )
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def admin_bulk_keyboard(
+    masters: List[Tuple[int, str]],
+    selected: Set[int],
+) -> InlineKeyboardMarkup:
+    """
+    Массовая модерация: переключатель на каждую заявку (id, подпись)
+    и применение решения к выбранным.
+    """
+    rows = [
+        [
+            InlineKeyboardButton(
+                text=f"{'☑️' if master_id in selected else '⬜'} {label}",
+                callback_data=f"admin:bulk:toggle:{master_id}",
+            )
+        ]
+        for master_id, label in masters
+    ]
+    rows.append(
+        [
+            InlineKeyboardButton(text="Выбрать все", callback_data="admin:bulk:all"),
+            InlineKeyboardButton(text="Снять все", callback_data="admin:bulk:none"),
+        ]
+    )
+    rows.append(
+        [
+            InlineKeyboardButton(
+                text=f"✅ Одобрить ({len(selected)})",
+                callback_data="admin:bulk:apply:approve",
+            ),
+            InlineKeyboardButton(
+                text=f"❌ Отклонить ({len(selected)})",
+                callback_data="admin:bulk:apply:reject",
+            ),
+        ]
+    )
+    rows.append(
+        [InlineKeyboardButton(text="По одной", callback_data="admin:mod:page:0")]
+    )
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def admin_masters_page_keyboard(
+    first_id: int,
+    last_id: int,
+    has_newer: bool,
+    has_older: bool,
+) -> InlineKeyboardMarkup:
+    """
+    Листание списка всех мастеров и выгрузка в CSV.
+    """
+    nav = []
+    if has_newer:
+        nav.append(
+            InlineKeyboardButton(
+                text="◀️ Новее", callback_data=f"admin:masters:page:prev:{first_id}"
+            )
+        )
+    if has_older:
+        nav.append(
+            InlineKeyboardButton(
+                text="Старше ▶️", callback_data=f"admin:masters:page:next:{last_id}"
+            )
+        )
+    rows = [nav] if nav else []
+    rows.append(
+        [
+            InlineKeyboardButton(text="⬇️ Мастера CSV", callback_data="admin:export:masters"),
+            InlineKeyboardButton(text="⬇️ Отзывы CSV", callback_data="admin:export:reviews"),
         ]
     )
+    return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
 def admin_info_menu_keyboard() -> InlineKeyboardMarkup:
@@ -83,3 +194,54 @@ def admin_faq_menu_keyboard() -> InlineKeyboardMarkup:
             ]
         ]
     )
+
+
+def admin_slow_queries_keyboard(plan_ids: List[int]) -> InlineKeyboardMarkup:
+    """
+    Кнопки открытия планов медленных запросов.
+    """
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text=f"План #{plan_id}",
+                    callback_data=f"admin:slow:view:{plan_id}",
+                )
+            ]
+            for plan_id in plan_ids
+        ]
+    )
+
+
+def admin_broadcast_confirm_keyboard() -> InlineKeyboardMarkup:
+    """
+    Подтверждение рассылки после предпросмотра.
+    """
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="📣 Отправить", callback_data="admin:broadcast:send"
+                ),
+                InlineKeyboardButton(
+                    text="Отмена", callback_data="admin:broadcast:abort"
+                ),
+            ]
+        ]
+    )
+
+
+def admin_broadcast_progress_keyboard(broadcast_id: int) -> InlineKeyboardMarkup:
+    """
+    Кнопка остановки под сообщением с прогрессом рассылки.
+    """
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="⏹ Остановить",
+                    callback_data=f"admin:broadcast:cancel:{broadcast_id}",
+                )
+            ]
+        ]
+    )
@@ -17,7 +17,7 @@ def catalog_filters_keyboard(
     callback_data в формате:
     - "catalog:cat:<category>"
     - "catalog:sort:<sort>"
-    - "catalog:view:<category>:<sort>:<index>"
+    - "catalog:view:<category>:<sort>:<direction>:<master_id>"
     """
     buttons_cat = []
     for cat in CATEGORIES:
@@ -46,7 +46,7 @@ def catalog_filters_keyboard(
 
     view_button = InlineKeyboardButton(
         text="Смотреть мастеров",
-        callback_data=f"catalog:view:{current_category}:{current_sort}:0",
+        callback_data=f"catalog:view:{current_category}:{current_sort}:next:0",
     )
 
     return InlineKeyboardMarkup(
@@ -62,26 +62,26 @@ def master_card_keyboard(
     master_id: int,
     category: str | None = None,
     sort_key: str | None = None,
-    index: int = 0,
-    total: int = 1,
+    has_neighbours: bool = True,
 ) -> InlineKeyboardMarkup:
     """
     Клавиатура для карточки мастера: навигация и оставить отзыв.
+    Навигация передаёт в callback_data курсор — id текущего мастера,
+    соседний мастер выбирается уже в БД по ключу сортировки.
+    Если мастер в каталоге один (has_neighbours=False), навигации нет.
     """
     rows = []
 
-    if category and sort_key and total > 1:
-        prev_idx = (index - 1) % total
-        next_idx = (index + 1) % total
+    if category and sort_key and has_neighbours:
         rows.append(
             [
                 InlineKeyboardButton(
                     text="⬅️ Предыдущий",
-                    callback_data=f"catalog:view:{category}:{sort_key}:{prev_idx}",
+                    callback_data=f"catalog:view:{category}:{sort_key}:prev:{master_id}",
                 ),
                 InlineKeyboardButton(
                     text="Следующий ➡️",
-                    callback_data=f"catalog:view:{category}:{sort_key}:{next_idx}",
+                    callback_data=f"catalog:view:{category}:{sort_key}:next:{master_id}",
                 ),
             ]
         )
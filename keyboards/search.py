@@ -0,0 +1,27 @@
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+
+def search_results_keyboard(
+    page: int, has_prev: bool, has_next: bool
+) -> InlineKeyboardMarkup:
+    """
+    Клавиатура листания результатов поиска.
+    callback_data в формате "search:page:<page>".
+    """
+    buttons = []
+    if has_prev:
+        buttons.append(
+            InlineKeyboardButton(
+                text="⬅️ Назад",
+                callback_data=f"search:page:{page - 1}",
+            )
+        )
+    if has_next:
+        buttons.append(
+            InlineKeyboardButton(
+                text="Дальше ➡️",
+                callback_data=f"search:page:{page + 1}",
+            )
+        )
+
+    return InlineKeyboardMarkup(inline_keyboard=[buttons] if buttons else [])
@@ -1,15 +1,13 @@
 import asyncio
 import logging
 
-from aiogram import Bot, Dispatcher
-from aiogram.client.default import DefaultBotProperties
-from aiogram.enums import ParseMode
-from aiogram.fsm.storage.memory import MemoryStorage
-
+from app import build_dispatcher, create_bot, create_storage, setup_database
 from config import load_config
-from db.db import create_pool, init_db
-from handlers import common, catalog, master, admin, reviews, info
-from middleware import DatabaseMiddleware
+from db.slow_queries import slow_query_tracer
+from metrics import start_metrics_server
+from services.reviews_service import rating_reconciliation_loop
+from sharding import run_sharded
+from webhook import run_webhook
 
 # Настройка логирования
 logging.basicConfig(
@@ -23,44 +21,40 @@ logger = logging.getLogger(__name__)
 async def main() -> None:
     """
     Точка входа в приложение.
-    Инициализирует бота, БД, регистрирует роутеры и запускает polling.
+    Инициализирует бота, БД, регистрирует роутеры и запускает polling или webhook.
+    При BOT_WORKERS > 1 апдейты раздаются нескольким процессам (см. sharding.py).
     """
     config = load_config()
     logger.info("Запуск бота...")
 
-    bot = Bot(
-        token=config.bot.token,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
-    )
-
-    # FSM-хранилище в памяти
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
+    if config.bot.workers > 1:
+        await run_sharded(config)
+        return
 
-    # Создаём connection pool для БД
-    try:
-        db_pool = await create_pool(config.db)
-        # Инициализация схемы БД
-        await init_db(db_pool)
-        logger.info("База данных инициализирована")
-    except Exception as e:
-        logger.error(f"Критическая ошибка при инициализации БД: {e}")
-        raise
+    bot = create_bot(config)
+    db_pool = await setup_database(config)
+    storage = create_storage(config, db_pool)
+    dp = build_dispatcher(config, db_pool, storage)
+    metrics_runner = await start_metrics_server(config.metrics.host, config.metrics.port)
 
-    # Регистрируем middleware для передачи db_pool и config в хендлеры
-    dp.message.middleware(DatabaseMiddleware(db_pool, config))
-    dp.callback_query.middleware(DatabaseMiddleware(db_pool, config))
-
-    # Регистрируем роутеры
-    dp.include_router(common.router)
-    dp.include_router(catalog.router)
-    dp.include_router(master.router)
-    dp.include_router(admin.router)
-    dp.include_router(reviews.router)
-    dp.include_router(info.router)
+    # Фоновая сверка агрегатов рейтинга с отзывами
+    reconcile_task = asyncio.create_task(rating_reconciliation_loop(db_pool))
 
     # Запуск бота
-    await dp.start_polling(bot)
+    try:
+        if config.webhook.mode == "webhook":
+            await run_webhook(bot, dp, config.webhook, db_pool)
+        else:
+            await dp.start_polling(bot)
+    finally:
+        reconcile_task.cancel()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await storage.close()
+        await slow_query_tracer.close()
+        await db_pool.close()
+        await bot.session.close()
+        logger.info("Бот остановлен")
 
 
 if __name__ == "__main__":
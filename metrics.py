@@ -0,0 +1,356 @@
+"""
+Метрики в текстовом формате Prometheus без внешних зависимостей.
+
+Счётчики, гистограммы и gauge живут в памяти процесса (registry) и отдаются
+HTTP-эндпоинтом /metrics (start_metrics_server). Сюда же подключаются
+stats() кэшей, хранилищ и middleware через registry.add_stats.
+
+Что измеряется:
+- время хендлеров и ошибки (middleware.HandlerMetricsMiddleware);
+- время функций services/* (@timed_service) и запросов к БД по сервису,
+  вызвавшему запрос (query_logger, подключается к каждому соединению пула);
+- размер пула, свободные соединения, ожидание acquire();
+- запросы к Bot API: время и ошибки по методу (TelegramRequestMetrics);
+- сбросы буфера пользователей (user_registry.py).
+"""
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+import logging
+import math
+import time
+
+import asyncpg
+from aiohttp import web
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "masters_bot_"
+
+# Секунды: от быстрого SELECT по индексу до таймаута запроса.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # метки -> [счётчики по корзинам (последняя — +Inf), сумма, количество]
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        series = self._values.get(key)
+        if series is None:
+            series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        counts = series[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                le = f'le="{_number(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class _StatsCollector:
+    """
+    Превращает словарь из stats() в gauge {prefix}_{ключ}; вложенный словарь
+    становится одной метрикой с меткой label. Нечисловые значения пропускаются.
+    """
+
+    def __init__(self, prefix: str, stats: Callable[[], Dict[str, Any]], label: str):
+        self.prefix = PREFIX + prefix
+        self.stats = stats
+        self.label = label
+
+    def render(self) -> List[str]:
+        lines: List[str] = []
+        for key, value in self.stats().items():
+            name = f"{self.prefix}_{key}"
+            if isinstance(value, dict):
+                lines.append(f"# TYPE {name} gauge")
+                for sub, sub_value in value.items():
+                    lines.append(f"{name}{_labels((self.label,), (sub,))} {_number(sub_value)}")
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_number(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        metric = Gauge(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_stats(self, prefix: str, stats: Callable[[], Dict[str, Any]], label: str = "key") -> None:
+        """
+        Отдавать результат stats() как набор gauge при каждом чтении /metrics.
+        """
+        self._metrics.append(_StatsCollector(prefix, stats, label))
+
+    def add_collector(self, collect: Callable[[], None]) -> None:
+        """
+        Функция, обновляющая gauge перед каждым чтением /metrics.
+        """
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        for collect in self._collectors:
+            try:
+                collect()
+            except Exception as e:
+                logger.error(f"Ошибка сбора метрик: {e}")
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HANDLER_SECONDS = registry.histogram(
+    "handler_seconds", "Время обработки события хендлером", ("router", "handler")
+)
+HANDLER_ERRORS = registry.counter(
+    "handler_errors_total", "Исключения в хендлерах", ("router", "handler")
+)
+SERVICE_SECONDS = registry.histogram(
+    "service_seconds", "Время вызова функции services/*", ("service",)
+)
+DB_QUERY_SECONDS = registry.histogram(
+    "db_query_seconds", "Время запросов к БД по вызвавшему сервису", ("service",)
+)
+DB_QUERY_ERRORS = registry.counter(
+    "db_query_errors_total", "Запросы к БД, завершившиеся ошибкой", ("service",)
+)
+DB_POOL_SIZE = registry.gauge("db_pool_size", "Открытых соединений в пуле")
+DB_POOL_IDLE = registry.gauge("db_pool_idle", "Свободных соединений в пуле")
+DB_POOL_MAX = registry.gauge("db_pool_max_size", "Предельный размер пула")
+DB_ACQUIRE_SECONDS = registry.histogram(
+    "db_acquire_seconds", "Ожидание соединения из пула"
+)
+TELEGRAM_SECONDS = registry.histogram(
+    "telegram_request_seconds", "Время запросов к Bot API", ("method",)
+)
+TELEGRAM_ERRORS = registry.counter(
+    "telegram_request_errors_total", "Ошибки запросов к Bot API", ("method", "error")
+)
+UPDATE_QUEUE_WAIT_SECONDS = registry.histogram(
+    "update_queue_wait_seconds", "Ожидание апдейта в очереди ConcurrencyLimitMiddleware"
+)
+USER_FLUSH_SECONDS = registry.histogram(
+    "user_registry_flush_seconds", "Время сброса буфера пользователей в БД"
+)
+USER_FLUSH_ROWS = registry.counter(
+    "user_registry_flushed_rows_total", "Пользователей записано в БД"
+)
+USER_FLUSH_ERRORS = registry.counter(
+    "user_registry_flush_errors_total", "Неудачные сбросы буфера пользователей"
+)
+
+# Сервис, выполняющий текущий запрос к БД (выставляет @timed_service).
+current_service: ContextVar[str] = ContextVar("current_service", default="other")
+
+
+def timed_service(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """
+    Декоратор async-функций services/*: время вызова в service_seconds
+    и имя сервиса для запросов к БД внутри вызова.
+    """
+    name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+    @wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        token = current_service.set(name)
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            SERVICE_SECONDS.observe(time.perf_counter() - started, service=name)
+            current_service.reset(token)
+
+    return wrapper
+
+
+def query_logger(record: "asyncpg.connection.LoggedQuery") -> None:
+    """
+    Колбэк asyncpg add_query_logger. Вызывается в контексте задачи, выполнившей
+    запрос, поэтому current_service указывает на вызвавший сервис.
+    """
+    service = current_service.get()
+    DB_QUERY_SECONDS.observe(record.elapsed, service=service)
+    if record.exception is not None:
+        DB_QUERY_ERRORS.inc(service=service)
+
+
+def track_pool(pool: asyncpg.pool.Pool) -> None:
+    """
+    Обновлять gauge пула при каждом чтении /metrics.
+    """
+
+    def collect() -> None:
+        DB_POOL_SIZE.set(pool.get_size())
+        DB_POOL_IDLE.set(pool.get_idle_size())
+        DB_POOL_MAX.set(pool.get_max_size())
+
+    registry.add_collector(collect)
+
+
+class TelegramRequestMetrics(BaseRequestMiddleware):
+    """
+    Middleware сессии Bot: время и ошибки запросов к Bot API по методу.
+    """
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        name = method.__api_method__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            TELEGRAM_ERRORS.inc(method=name, error=type(e).__name__)
+            raise
+        finally:
+            TELEGRAM_SECONDS.observe(time.perf_counter() - started, method=name)
+
+
+def create_metrics_app() -> web.Application:
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(
+            text=registry.render(),
+            content_type="text/plain",
+            charset="utf-8",
+            headers={"X-Content-Type-Options": "nosniff"},
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    return app
+
+
+async def start_metrics_server(host: str, port: int) -> Optional[web.AppRunner]:
+    """
+    Поднять /metrics на host:port. port = 0 — метрики по HTTP не отдаются.
+    """
+    if not port:
+        return None
+    runner = web.AppRunner(create_metrics_app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Метрики: http://{host}:{port}/metrics")
+    return runner
@@ -1,15 +1,77 @@
 """
-Middleware для передачи db_pool и config в хендлеры.
+Middleware для передачи db_pool и config в хендлеры (одно соединение на апдейт),
+сброса буфера FSM-хранилища после обработки апдейта,
+ограничения числа одновременно обрабатываемых апдейтов,
+защиты от флуда и учёта времени хендлеров.
 """
-from typing import Any, Awaitable, Callable, Dict
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+import asyncio
+import logging
+import time
 
 from aiogram import BaseMiddleware
-from aiogram.types import TelegramObject
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, Chat, TelegramObject, Update, User
+
+from config import ConcurrencyConfig
+from db.db import ConnectionScope, current_scope
+from metrics import HANDLER_ERRORS, HANDLER_SECONDS, UPDATE_QUEUE_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+BUSY_TEXT = "Бот сейчас перегружен, попробуйте через минуту."
+
+THROTTLED_TEXT = "Слишком часто, подождите секунду."
+
+# Группа хендлеров (флаг throttling_key) -> (запросов в секунду, запас подряд).
+# Хендлеры без флага попадают в "default".
+THROTTLE_RATES: Dict[str, Tuple[float, float]] = {
+    "default": (3.0, 10.0),
+    "catalog": (1.0, 5.0),
+    "master_card": (2.0, 6.0),
+    "search": (0.5, 3.0),
+}
+
+# Границы корзин гистограммы ожидания в очереди, секунды.
+WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+class ConnectionScopeMiddleware(BaseMiddleware):
+    """
+    Outer-middleware на dp.update: один ConnectionScope на весь апдейт.
+    Стоит снаружи FSM-middleware aiogram, поэтому на том же соединении идут
+    и чтение состояния, и хендлер (через DatabaseMiddleware), и сброс FSM
+    в FSMFlushMiddleware. Соединение берётся только при первом запросе.
+    """
+
+    def __init__(self, db_pool):
+        self.db_pool = db_pool
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        scope = ConnectionScope(self.db_pool)
+        data["db_scope"] = scope
+        token = current_scope.set(scope)
+        try:
+            return await handler(event, data)
+        finally:
+            current_scope.reset(token)
+            await scope.release()
 
 
 class DatabaseMiddleware(BaseMiddleware):
     """
     Middleware для добавления db_pool и config в data для всех хендлеров.
+
+    В хендлер под именем db_pool передаётся ConnectionScope: соединение берётся
+    из пула при первом запросе и возвращается после завершения апдейта,
+    так что один апдейт занимает не больше одного соединения. Если снаружи
+    стоит ConnectionScopeMiddleware, используется его ConnectionScope.
     """
 
     def __init__(self, db_pool, config):
@@ -25,6 +87,300 @@ class DatabaseMiddleware(BaseMiddleware):
         """
         Добавляет db_pool и config в data перед вызовом хендлера.
         """
-        data["db_pool"] = self.db_pool
+        scope = data.get("db_scope")
+        owned = scope is None
+        if owned:
+            scope = ConnectionScope(self.db_pool)
+        data["db_pool"] = scope
         data["config"] = self.config
-        return await handler(event, data)
\ No newline at end of file
+        try:
+            return await handler(event, data)
+        finally:
+            if owned:
+                await scope.release()
+
+
+class FSMFlushMiddleware(BaseMiddleware):
+    """
+    Outer-middleware на dp.update: после обработки апдейта сбрасывает
+    накопленные изменения FSM одним запросом (если хранилище это умеет,
+    как storage.postgres.PostgresStorage).
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        try:
+            return await handler(event, data)
+        finally:
+            state = data.get("state")
+            flush = getattr(getattr(state, "storage", None), "flush", None)
+            if flush is not None:
+                await flush(state.key)
+
+
+class ChatLocks:
+    """
+    Замки по чатам: апдейты одного чата обрабатываются строго по очереди,
+    разные чаты — параллельно. Замок удаляется, когда его никто не ждёт.
+    """
+
+    def __init__(self):
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        self._waiters: Dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    async def run(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            async with lock:
+                return await call()
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+                del self._locks[key]
+
+
+class ConcurrencyLimitMiddleware(BaseMiddleware):
+    """
+    Outer-middleware на dp.update: не больше max_handlers апдейтов обрабатываются
+    одновременно, ещё до max_queue ждут своей очереди, апдейты одного чата
+    идут строго по порядку. Сверх этого апдейт отбрасывается по политике:
+    - drop — молча пропустить;
+    - busy — ответить «бот перегружен» (сообщению или нажатию кнопки);
+    - delay — ждать места в очереди до delay_timeout секунд, потом пропустить.
+
+    Регистрируется снаружи FSM-middleware aiogram (см. app.build_dispatcher),
+    чтобы состояние чата читалось уже после обработки предыдущего апдейта.
+    """
+
+    def __init__(self, config: ConcurrencyConfig):
+        self.config = config
+        self._slots = asyncio.Semaphore(config.max_handlers)
+        self._admission = asyncio.Semaphore(config.max_handlers + config.max_queue)
+        self._chats = ChatLocks()
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.processed = 0
+        self.shed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets: List[int] = [0] * (len(WAIT_BUCKETS) + 1)
+        self._overloaded = False
+
+    @staticmethod
+    def _chat_key(data: Dict[str, Any]) -> Optional[int]:
+        chat: Optional[Chat] = data.get("event_chat")
+        if chat is not None:
+            return chat.id
+        user: Optional[User] = data.get("event_from_user")
+        return user.id if user is not None else None
+
+    async def _admit(self) -> bool:
+        if self.config.policy == "delay":
+            try:
+                await asyncio.wait_for(self._admission.acquire(), self.config.delay_timeout)
+            except asyncio.TimeoutError:
+                return False
+            return True
+        if self._admission.locked():
+            return False
+        await self._admission.acquire()
+        return True
+
+    async def _reject(self, event: TelegramObject) -> None:
+        self.shed += 1
+        if not self._overloaded:
+            self._overloaded = True
+            logger.warning(
+                f"Перегрузка: в работе {self.in_flight}, в очереди {self.queued}; "
+                f"лишние апдейты отбрасываются ({self.config.policy})"
+            )
+        if self.config.policy != "busy" or not isinstance(event, Update):
+            return
+        try:
+            if event.callback_query is not None:
+                await event.callback_query.answer(BUSY_TEXT)
+            elif event.message is not None:
+                await event.message.answer(BUSY_TEXT)
+        except Exception as e:
+            logger.error(f"Не удалось ответить о перегрузке: {e}")
+
+    def _observe_wait(self, waited: float) -> None:
+        UPDATE_QUEUE_WAIT_SECONDS.observe(waited)
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        for i, bound in enumerate(WAIT_BUCKETS):
+            if waited <= bound:
+                self.wait_buckets[i] += 1
+                return
+        self.wait_buckets[-1] += 1
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not await self._admit():
+            await self._reject(event)
+            return None
+
+        arrived = time.monotonic()
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+
+        entered = False
+
+        async def run() -> Any:
+            nonlocal entered
+            async with self._slots:
+                entered = True
+                self.queued -= 1
+                self.in_flight += 1
+                self._observe_wait(time.monotonic() - arrived)
+                try:
+                    return await handler(event, data)
+                finally:
+                    self.in_flight -= 1
+                    self.processed += 1
+
+        try:
+            key = self._chat_key(data)
+            if key is None:
+                return await run()
+            return await self._chats.run(key, run)
+        finally:
+            if not entered:
+                # Отменили, пока ждали очереди
+                self.queued -= 1
+            self._admission.release()
+            if self._overloaded and not self.queued:
+                self._overloaded = False
+                logger.info("Перегрузка снята: очередь обработчиков пуста")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Глубина очереди и время ожидания; wait_buckets — число апдейтов,
+        ждавших не дольше соответствующей границы WAIT_BUCKETS (последняя — дольше).
+        """
+        processed = self.processed or 1
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "chats_waiting": len(self._chats),
+            "processed": self.processed,
+            "shed": self.shed,
+            "wait_avg": self.wait_total / processed,
+            "wait_max": self.wait_max,
+            "wait_buckets": list(self.wait_buckets),
+        }
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Анти-флуд: на каждую пару (пользователь, группа хендлеров) — token bucket
+    из THROTTLE_RATES. Группа задаётся флагом хендлера throttling_key.
+    Если токенов нет, хендлер не вызывается; на нажатие кнопки отвечаем
+    коротким уведомлением, сообщение просто пропускаем.
+
+    Регистрируется как inner-middleware перед DatabaseMiddleware: флаги известны
+    только для выбранного хендлера, а отброшенное событие не занимает соединение.
+    Корзины, не трогавшиеся дольше времени полного пополнения, удаляются —
+    новая корзина ничем от них не отличается.
+    """
+
+    def __init__(self, rates: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.rates = rates or THROTTLE_RATES
+        # Время, за которое любая корзина наполняется целиком.
+        self.idle_ttl = max(burst / rate for rate, burst in self.rates.values())
+        # (user_id, группа) -> [токены, время последнего обращения]; порядок = давность обращения
+        self._buckets: "OrderedDict[Tuple[int, str], List[float]]" = OrderedDict()
+        self.passed = 0
+        self.throttled: Counter = Counter()
+
+    def _evict_idle(self, now: float) -> None:
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if now - bucket[1] < self.idle_ttl:
+                break
+            del self._buckets[key]
+
+    def _take(self, key: Tuple[int, str], now: float) -> bool:
+        rate, burst = self.rates.get(key[1], self.rates["default"])
+        bucket = self._buckets.pop(key, None)
+        if bucket is None:
+            bucket = [burst, now]
+        else:
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        self._buckets[key] = bucket
+        if bucket[0] < 1:
+            return False
+        bucket[0] -= 1
+        return True
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user: Optional[User] = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        group = get_flag(data, "throttling_key", default="default")
+        now = time.monotonic()
+        self._evict_idle(now)
+        if self._take((user.id, group), now):
+            self.passed += 1
+            return await handler(event, data)
+
+        self.throttled[group] += 1
+        if isinstance(event, CallbackQuery):
+            await event.answer(THROTTLED_TEXT)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buckets": len(self._buckets),
+            "passed": self.passed,
+            "throttled": dict(self.throttled),
+        }
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Inner-middleware: время и исключения хендлера в metrics.
+    Метки: router — модуль хендлера (handlers.catalog), handler — имя функции.
+    Регистрируется первым, чтобы в замер попадали и остальные inner-middleware.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        callback = getattr(handler_object, "callback", None)
+        router = getattr(callback, "__module__", "unknown")
+        name = getattr(callback, "__name__", "unknown")
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(router=router, handler=name)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, router=router, handler=name)
@@ -0,0 +1,138 @@
+"""
+Отправка сообщений пользователям в фоне с ограничением скорости.
+
+Хендлеры ставят уведомления в очередь (Notifier.notify) и сразу отвечают
+админу, а одна фоновая задача отправляет их в темпе общего RateLimiter
+(лимит Bot API — около 30 сообщений в секунду на бота). Тот же RateLimiter
+использует рассылка (broadcaster.py), так что вместе они лимит не превышают.
+На TelegramRetryAfter отправка ждёт, сколько сказал Telegram, и повторяется;
+пользователей, заблокировавших бота, send_message_safely пропускает.
+"""
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import logging
+import time
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Сообщений в секунду: с запасом до лимита Bot API
+NOTIFY_RATE = 25.0
+# Сколько раз повторять отправку после RetryAfter
+MAX_RETRIES = 5
+
+SENT = "sent"
+BLOCKED = "blocked"
+FAILED = "failed"
+
+
+class RateLimiter:
+    """
+    Равномерный темп отправки: каждый wait() занимает следующий слот
+    через 1/rate секунды после предыдущего. pause() сдвигает все слоты —
+    RetryAfter от Telegram касается всего бота, а не одного чата.
+    """
+
+    def __init__(self, rate: float = NOTIFY_RATE):
+        self.interval = 1.0 / rate
+        self._next = 0.0
+
+    async def wait(self) -> None:
+        now = time.monotonic()
+        slot = max(self._next, now)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def pause(self, seconds: float) -> None:
+        self._next = max(self._next, time.monotonic() + seconds)
+
+
+async def send_message_safely(
+    bot: Bot,
+    chat_id: int,
+    text: str,
+    limiter: Optional[RateLimiter] = None,
+    **kwargs: Any,
+) -> str:
+    """
+    Отправить сообщение в темпе limiter, переждав RetryAfter. Возвращает SENT,
+    BLOCKED (бот заблокирован или чат не существует) или FAILED.
+    """
+    for _ in range(MAX_RETRIES):
+        if limiter is not None:
+            await limiter.wait()
+        try:
+            await bot.send_message(chat_id, text, **kwargs)
+            return SENT
+        except TelegramRetryAfter as e:
+            logger.warning(f"Flood control, ждём {e.retry_after} с")
+            if limiter is not None:
+                limiter.pause(e.retry_after)
+            else:
+                await asyncio.sleep(e.retry_after)
+        except TelegramForbiddenError:
+            return BLOCKED
+        except TelegramBadRequest as e:
+            if "chat not found" in str(e).lower():
+                return BLOCKED
+            logger.error(f"Не удалось отправить сообщение {chat_id}: {e}")
+            return FAILED
+        except Exception as e:
+            logger.error(f"Не удалось отправить сообщение {chat_id}: {e}")
+            return FAILED
+    return FAILED
+
+
+class Notifier:
+    def __init__(self, limiter: RateLimiter, max_queue: int = 10_000):
+        self.limiter = limiter
+        self._queue: "asyncio.Queue[Tuple[Bot, int, str, Dict[str, Any]]]" = asyncio.Queue(max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self.results: Dict[str, int] = {SENT: 0, BLOCKED: 0, FAILED: 0}
+        self.dropped = 0
+
+    def notify(self, bot: Bot, chat_id: int, text: str, **kwargs: Any) -> bool:
+        """
+        Поставить сообщение в очередь. False — очередь переполнена, сообщение не уйдёт.
+        """
+        try:
+            self._queue.put_nowait((bot, chat_id, text, kwargs))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"Очередь уведомлений переполнена, сообщение {chat_id} отброшено")
+            return False
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            bot, chat_id, text, kwargs = await self._queue.get()
+            try:
+                result = await send_message_safely(bot, chat_id, text, self.limiter, **kwargs)
+                self.results[result] += 1
+            finally:
+                self._queue.task_done()
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """
+        Дождаться отправки очереди (не дольше timeout) и остановить задачу.
+        """
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Не отправлено уведомлений: {self._queue.qsize()}")
+        self._task.cancel()
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "dropped": self.dropped,
+            "results": dict(self.results),
+        }
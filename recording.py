@@ -0,0 +1,208 @@
+"""
+Запись входящих апдейтов для воспроизведения (bench/replay.py).
+
+Включается переменной RECORD_UPDATES — путь к файлу, можно с {pid}
+(при BOT_WORKERS > 1 у каждого процесса свой файл). Формат — gzip
+с JSON по строке на апдейт: {"t": unix-время получения, "u": апдейт}.
+Существующий файл дописывается (после перезапуска — с новой солью).
+Каждые FLUSH_RECORDS апдейтов или FLUSH_INTERVAL секунд текущий gzip-member
+закрывается и начинается новый, так что при падении процесса теряется
+только последний, недописанный member; read_recording его пропускает.
+
+Апдейт обезличивается до записи:
+- id пользователей и чатов заменяются стабильным хэшем с солью записи
+  (один человек — один и тот же id внутри файла, но не между файлами);
+- имена, username, телефоны и file_id заменяются заглушками,
+  в том числе у пользователя в сущностях text_mention; ссылки text_link —
+  на example.invalid;
+- свободный текст заменяется на «x» той же длины, кроме команд, #ID,
+  коротких ответов форм и надписей кнопок меню.
+"""
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Tuple
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import secrets
+import time
+import zlib
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+logger = logging.getLogger(__name__)
+
+# Сколько апдейтов или секунд копить в одном gzip-member до его закрытия
+FLUSH_RECORDS = 100
+FLUSH_INTERVAL = 5.0
+
+# Поля объектов User/Chat, в которых лежит идентификатор
+_ID_PARENTS = {
+    "from", "chat", "user", "sender_chat", "forward_from", "forward_from_chat",
+    "new_chat_members", "left_chat_member",
+}
+_NAME_FIELDS = {"first_name", "last_name", "username", "title"}
+_DROP_FIELDS = {"phone_number", "contact", "location", "venue", "bio"}
+_TEXT_FIELDS = {"text", "caption", "query"}
+# Чем заменяется url в сущностях text_link
+_ANON_URL = "https://example.invalid/"
+
+# Текст, который сохраняем как есть: он управляет роутингом, а не несёт данных.
+_KEEP_TEXT_RE = re.compile(r"^(/\w+|#\d+|\d{1,5}(\s+\d{1,7})?|-|да|нет|yes|y|отмена)$", re.IGNORECASE)
+MENU_TEXTS = {
+    "Каталог мастеров",
+    "Поиск",
+    "Стать мастером",
+    "О нас",
+    "FAQ",
+    "Контакты",
+}
+
+
+class Anonymizer:
+    def __init__(self, salt: Optional[bytes] = None):
+        self.salt = salt or secrets.token_bytes(16)
+
+    def anon_id(self, value: int) -> int:
+        digest = hashlib.blake2b(str(value).encode(), key=self.salt, digest_size=6).digest()
+        anon = int.from_bytes(digest, "big") or 1
+        # Знак сохраняем: у групп и каналов id отрицательные
+        return -anon if value < 0 else anon
+
+    def _text(self, text: str) -> str:
+        stripped = text.strip()
+        if stripped in MENU_TEXTS or _KEEP_TEXT_RE.match(stripped):
+            return text
+        return "x" * len(text)
+
+    def _entity(self, entity: Any) -> Any:
+        """
+        text_mention несёт пользователя целиком, text_link — ссылку:
+        пользователь обезличивается как from, ссылка заменяется заглушкой.
+        """
+        if not isinstance(entity, dict):
+            return entity
+        result = dict(entity)
+        if isinstance(result.get("user"), dict):
+            result["user"] = self(result["user"], "user")
+        if "url" in result:
+            result["url"] = _ANON_URL
+        return result
+
+    def __call__(self, value: Any, parent: str = "") -> Any:
+        if isinstance(value, dict):
+            result = {}
+            for key, item in value.items():
+                if key in _DROP_FIELDS:
+                    continue
+                if key == "id" and parent in _ID_PARENTS and isinstance(item, int):
+                    result[key] = self.anon_id(item)
+                elif key in _NAME_FIELDS and isinstance(item, str):
+                    result[key] = "anon"
+                elif key in _TEXT_FIELDS and isinstance(item, str):
+                    result[key] = self._text(item)
+                elif key in ("file_id", "file_unique_id"):
+                    result[key] = "file"
+                elif key in ("entities", "caption_entities") and isinstance(item, list):
+                    # Смещения сущностей не меняются: длина текста сохранена
+                    result[key] = [self._entity(entity) for entity in item]
+                else:
+                    result[key] = self(item, key)
+            return result
+        if isinstance(value, list):
+            return [self(item, parent) for item in value]
+        return value
+
+
+class UpdateRecorder:
+    def __init__(
+        self,
+        path: str,
+        flush_records: int = FLUSH_RECORDS,
+        flush_interval: float = FLUSH_INTERVAL,
+    ):
+        self.path = path.format(pid=os.getpid())
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval
+        self.anonymize = Anonymizer()
+        self._file = open(self.path, "ab")
+        self._member: Optional[gzip.GzipFile] = None
+        self._member_records = 0
+        self._member_started = 0.0
+        self.recorded = 0
+        logger.info(f"Запись апдейтов в {self.path}")
+
+    def write(self, raw: Dict[str, Any]) -> None:
+        line = json.dumps(
+            {"t": round(time.time(), 4), "u": self.anonymize(raw)},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        if self._member is None:
+            self._member = gzip.GzipFile(fileobj=self._file, mode="wb")
+            self._member_started = time.monotonic()
+        self._member.write((line + "\n").encode("utf-8"))
+        self._member_records += 1
+        self.recorded += 1
+        if (
+            self._member_records >= self.flush_records
+            or time.monotonic() - self._member_started >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Закрыть текущий gzip-member и сбросить его на диск.
+        """
+        if self._member is None:
+            return
+        self._member.close()
+        self._member = None
+        self._member_records = 0
+        self._file.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self._file.close()
+
+
+class UpdateRecordingMiddleware(BaseMiddleware):
+    """
+    Outer-middleware на dp.update: пишет каждый входящий апдейт до обработки
+    (в том числе те, что потом отбросят ограничители).
+    """
+
+    def __init__(self, recorder: UpdateRecorder):
+        self.recorder = recorder
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if isinstance(event, Update):
+            try:
+                self.recorder.write(
+                    event.model_dump(mode="json", by_alias=True, exclude_none=True)
+                )
+            except Exception as e:
+                logger.error(f"Не удалось записать апдейт {event.update_id}: {e}")
+        return await handler(event, data)
+
+
+def read_recording(path: str) -> Iterator[Tuple[float, Dict[str, Any]]]:
+    """
+    Апдейты из файла записи: (unix-время получения, апдейт).
+    Недописанный хвост (процесс упал посреди gzip-member) пропускается.
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    yield entry["t"], entry["u"]
+        except (EOFError, gzip.BadGzipFile, zlib.error, json.JSONDecodeError) as e:
+            logger.warning(f"{path}: запись оборвана, хвост пропущен ({e})")
@@ -0,0 +1,236 @@
+"""
+Пользователи бота и задания рассылки (таблицы users и broadcasts).
+Отправкой занимается broadcaster.py.
+"""
+from datetime import datetime
+from typing import List, Optional
+
+import asyncpg
+
+from db.db import Executor, acquire
+from metrics import timed_service
+
+
+@timed_service
+async def upsert_users(
+    pool: Executor,
+    telegram_ids: List[int],
+    usernames: List[Optional[str]],
+    first_names: List[Optional[str]],
+    last_seen: List[datetime],
+) -> None:
+    """
+    Записать пачку пользователей одним запросом (см. user_registry.py).
+    Вернувшийся после блокировки снова становится активным; строки,
+    в которых ничего не изменилось, не переписываются.
+    """
+    async with acquire(pool) as conn:
+        await conn.execute(
+            """
+            INSERT INTO users (telegram_id, username, first_name, last_seen_at)
+            SELECT * FROM unnest($1::bigint[], $2::text[], $3::text[], $4::timestamptz[])
+            ON CONFLICT (telegram_id) DO UPDATE
+              SET username = EXCLUDED.username,
+                  first_name = EXCLUDED.first_name,
+                  is_active = TRUE,
+                  last_seen_at = GREATEST(users.last_seen_at, EXCLUDED.last_seen_at)
+              WHERE users.username IS DISTINCT FROM EXCLUDED.username
+                 OR users.first_name IS DISTINCT FROM EXCLUDED.first_name
+                 OR NOT users.is_active
+                 OR users.last_seen_at IS NULL
+                 OR users.last_seen_at < EXCLUDED.last_seen_at;
+            """,
+            telegram_ids,
+            usernames,
+            first_names,
+            last_seen,
+        )
+
+
+@timed_service
+async def deactivate_users(pool: Executor, telegram_ids: List[int]) -> None:
+    """
+    Пометить неактивными пользователей, заблокировавших бота: рассылка их пропустит.
+    """
+    async with acquire(pool) as conn:
+        await conn.execute(
+            "UPDATE users SET is_active = FALSE WHERE telegram_id = ANY($1::bigint[]) AND is_active;",
+            telegram_ids,
+        )
+
+
+@timed_service
+async def count_active_users(pool: Executor) -> int:
+    async with acquire(pool) as conn:
+        return await conn.fetchval("SELECT COUNT(*) FROM users WHERE is_active;")
+
+
+@timed_service
+async def create_broadcast(
+    pool: Executor,
+    admin_chat_id: int,
+    progress_message_id: int,
+    text: str,
+) -> asyncpg.Record:
+    """
+    Создать задание рассылки всем активным пользователям (статус 'pending').
+    Прогресс показывается в сообщении progress_message_id чата админа.
+    """
+    async with acquire(pool) as conn:
+        return await conn.fetchrow(
+            """
+            INSERT INTO broadcasts (admin_chat_id, progress_message_id, text, total)
+            VALUES ($1, $2, $3, (SELECT COUNT(*) FROM users WHERE is_active))
+            RETURNING *;
+            """,
+            admin_chat_id,
+            progress_message_id,
+            text,
+        )
+
+
+@timed_service
+async def claim_broadcast(pool: Executor, lease_seconds: float) -> Optional[asyncpg.Record]:
+    """
+    Взять в работу старейшее незаконченное задание: новое или брошенное
+    процессом, у которого истёк lease. Возвращает задание или None.
+    """
+    async with acquire(pool) as conn:
+        return await conn.fetchrow(
+            """
+            UPDATE broadcasts
+            SET status = 'running',
+                started_at = COALESCE(started_at, NOW()),
+                lease_expires_at = NOW() + make_interval(secs => $1)
+            WHERE id = (
+                SELECT id FROM broadcasts
+                WHERE status = 'pending'
+                   OR (status = 'running' AND lease_expires_at < NOW())
+                ORDER BY id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING *;
+            """,
+            float(lease_seconds),
+        )
+
+
+@timed_service
+async def get_broadcast_recipients(
+    pool: Executor,
+    after_user_id: int,
+    limit: int,
+) -> List[asyncpg.Record]:
+    """
+    Следующие получатели после users.id = after_user_id.
+    """
+    async with acquire(pool) as conn:
+        rows = await conn.fetch(
+            """
+            SELECT id, telegram_id FROM users
+            WHERE is_active AND id > $1
+            ORDER BY id
+            LIMIT $2;
+            """,
+            after_user_id,
+            limit,
+        )
+        return list(rows)
+
+
+@timed_service
+async def checkpoint_broadcast(
+    pool: Executor,
+    broadcast_id: int,
+    cursor_user_id: int,
+    sent: int,
+    blocked: int,
+    failed: int,
+    blocked_telegram_ids: List[int],
+    lease_seconds: float,
+) -> Optional[asyncpg.Record]:
+    """
+    Сохранить прогресс после пачки, продлить lease и пометить заблокировавших
+    бота неактивными — в одной транзакции. None — задание отменили,
+    рассылку надо остановить.
+    """
+    async with acquire(pool) as conn:
+        async with conn.transaction():
+            if blocked_telegram_ids:
+                await conn.execute(
+                    "UPDATE users SET is_active = FALSE WHERE telegram_id = ANY($1::bigint[]);",
+                    blocked_telegram_ids,
+                )
+            return await conn.fetchrow(
+                """
+                UPDATE broadcasts
+                SET cursor_user_id = $2,
+                    sent = sent + $3,
+                    blocked = blocked + $4,
+                    failed = failed + $5,
+                    lease_expires_at = NOW() + make_interval(secs => $6)
+                WHERE id = $1 AND status = 'running'
+                RETURNING *;
+                """,
+                broadcast_id,
+                cursor_user_id,
+                sent,
+                blocked,
+                failed,
+                float(lease_seconds),
+            )
+
+
+@timed_service
+async def extend_broadcast_lease(
+    pool: Executor,
+    broadcast_id: int,
+    lease_seconds: float,
+) -> bool:
+    """
+    Продлить lease посреди пачки. False — задание уже не выполняется.
+    """
+    async with acquire(pool) as conn:
+        row = await conn.fetchrow(
+            """
+            UPDATE broadcasts
+            SET lease_expires_at = NOW() + make_interval(secs => $2)
+            WHERE id = $1 AND status = 'running'
+            RETURNING id;
+            """,
+            broadcast_id,
+            float(lease_seconds),
+        )
+        return row is not None
+
+
+@timed_service
+async def finish_broadcast(pool: Executor, broadcast_id: int) -> Optional[asyncpg.Record]:
+    async with acquire(pool) as conn:
+        return await conn.fetchrow(
+            """
+            UPDATE broadcasts
+            SET status = 'done', finished_at = NOW(), lease_expires_at = NULL
+            WHERE id = $1 AND status = 'running'
+            RETURNING *;
+            """,
+            broadcast_id,
+        )
+
+
+@timed_service
+async def cancel_broadcast(pool: Executor, broadcast_id: int) -> Optional[asyncpg.Record]:
+    """
+    Отменить незаконченное задание. None — оно уже завершено или отменено.
+    """
+    async with acquire(pool) as conn:
+        return await conn.fetchrow(
+            """
+            UPDATE broadcasts
+            SET status = 'cancelled', finished_at = NOW(), lease_expires_at = NULL
+            WHERE id = $1 AND status IN ('pending', 'running')
+            RETURNING *;
+            """,
+            broadcast_id,
+        )
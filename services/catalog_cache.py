@@ -0,0 +1,77 @@
+"""
+In-process кэш отрендеренных страниц каталога.
+
+Страница (текст списка + клавиатура) хранится по ключу (категория, сортировка).
+Данные каталога меняются только при смене статуса мастера и новом отзыве,
+поэтому эти пути записи сами сбрасывают нужные страницы через invalidate().
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import time
+
+ALL_CATEGORIES = "Все"
+
+
+class CatalogPageCache:
+    """
+    Кэш страниц каталога с точечной инвалидацией по категории.
+    max_age — страховка на случай записи в БД в обход сервисов
+    (например, из другого процесса): страница живёт не дольше этого времени.
+    """
+
+    def __init__(self, max_age: float = 300.0):
+        self.max_age = max_age
+        self._pages: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+        # Растёт при каждой инвалидации: страница, рендер которой начался
+        # до инвалидации, в кэш уже не попадёт.
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get_or_render(
+        self,
+        category: str,
+        sort_key: str,
+        render: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """
+        Вернуть страницу из кэша или отрендерить её через render() и запомнить.
+        """
+        key = (category, sort_key)
+        entry = self._pages.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self.max_age:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        generation = self._generation
+        page = await render()
+        if generation == self._generation:
+            self._pages[key] = (time.monotonic(), page)
+        return page
+
+    def invalidate(self, category: Optional[str] = None) -> None:
+        """
+        Сбросить страницы категории и общего списка «Все».
+        Без аргумента сбрасывается весь кэш.
+        """
+        self._generation += 1
+        self.invalidations += 1
+        if category is None:
+            self._pages.clear()
+            return
+
+        for key in list(self._pages):
+            if key[0] in (category, ALL_CATEGORIES):
+                del self._pages[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pages": len(self._pages),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+catalog_cache = CatalogPageCache()
@@ -0,0 +1,34 @@
+from typing import List, Optional
+
+import asyncpg
+
+from db.db import Executor, acquire
+from metrics import timed_service
+
+
+@timed_service
+async def get_slow_query_plans(pool: Executor, limit: int = 10) -> List[asyncpg.Record]:
+    """
+    Последние сохранённые планы медленных запросов (без текста плана).
+    """
+    async with acquire(pool) as conn:
+        rows = await conn.fetch(
+            """
+            SELECT id, service, duration_ms, captured_at, left(query, 200) AS query
+            FROM slow_query_plans
+            ORDER BY captured_at DESC
+            LIMIT $1;
+            """,
+            limit,
+        )
+        return rows
+
+
+@timed_service
+async def get_slow_query_plan(pool: Executor, plan_id: int) -> Optional[asyncpg.Record]:
+    async with acquire(pool) as conn:
+        row = await conn.fetchrow(
+            "SELECT * FROM slow_query_plans WHERE id = $1;",
+            plan_id,
+        )
+        return row
@@ -0,0 +1,85 @@
+"""
+Выгрузка мастеров и отзывов в gzip-CSV для админов.
+
+Строки читаются серверным курсором (по prefetch строк за раз) и пачками
+пишутся во временный файл из отдельного потока (asyncio.to_thread), поэтому
+память не зависит от размера таблицы, а сжатие не блокирует цикл событий.
+Колонки мастеров — надмножество MASTER_IMPORT_COLUMNS, так что выгрузку
+можно загрузить обратно через services/import_service.py.
+"""
+from typing import List, Sequence, Tuple
+import asyncio
+import csv
+import gzip
+import os
+import tempfile
+
+from db.db import Executor, acquire
+from metrics import timed_service
+
+MASTER_EXPORT_COLUMNS = (
+    "id", "telegram_id", "name", "username", "phone", "category",
+    "description", "price_min", "price_max", "status",
+    "rating", "reviews_count", "created_at",
+)
+REVIEW_EXPORT_COLUMNS = (
+    "id", "master_id", "user_id", "username", "rating", "text",
+    "is_visible", "created_at",
+)
+EXPORTS = {
+    "masters": MASTER_EXPORT_COLUMNS,
+    "reviews": REVIEW_EXPORT_COLUMNS,
+}
+
+# Строк за одно обращение курсора к серверу
+EXPORT_PREFETCH = 2000
+# Сжатие: 6 почти не уступает 9 по размеру и заметно быстрее
+EXPORT_COMPRESSLEVEL = 6
+
+
+async def _write_csv(conn, table: str, columns: Sequence[str], path: str) -> int:
+    # Сжатие и запись на диск — в отдельном потоке, пачками по prefetch строк:
+    # пока идёт выгрузка, цикл событий продолжает обслуживать апдейты.
+    f = await asyncio.to_thread(
+        gzip.open, path, "wt", encoding="utf-8", newline="", compresslevel=EXPORT_COMPRESSLEVEL,
+    )
+    try:
+        writer = csv.writer(f)
+        await asyncio.to_thread(writer.writerow, columns)
+        rows = 0
+        batch: List[Tuple] = []
+        # Серверный курсор работает только внутри транзакции
+        async with conn.transaction(readonly=True):
+            async for record in conn.cursor(
+                f"SELECT {', '.join(columns)} FROM {table} ORDER BY id;",
+                prefetch=EXPORT_PREFETCH,
+            ):
+                batch.append(tuple(record.values()))
+                if len(batch) >= EXPORT_PREFETCH:
+                    await asyncio.to_thread(writer.writerows, batch)
+                    rows += len(batch)
+                    batch = []
+        if batch:
+            await asyncio.to_thread(writer.writerows, batch)
+            rows += len(batch)
+    finally:
+        await asyncio.to_thread(f.close)
+    return rows
+
+
+@timed_service
+async def export_table(pool: Executor, table: str) -> Tuple[str, int]:
+    """
+    Выгрузить таблицу ("masters" или "reviews") во временный .csv.gz.
+    Возвращает путь к файлу и число строк; удалить файл — забота вызывающего.
+    """
+    columns = EXPORTS[table]
+    fd, path = tempfile.mkstemp(prefix=f"{table}-", suffix=".csv.gz")
+    os.close(fd)
+    try:
+        async with acquire(pool) as conn:
+            rows = await _write_csv(conn, table, columns, path)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, rows
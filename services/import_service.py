@@ -0,0 +1,370 @@
+"""
+Массовая загрузка мастеров и отзывов через COPY (copy_records_to_table).
+
+Строки читаются потоком из CSV (заголовок = имена колонок) или JSONL,
+проверяются пачками по batch_size, и каждая пачка уходит в БД одним COPY.
+Чтение и проверка пачки идут в отдельном потоке (asyncio.to_thread), чтобы
+разбор большого файла не занимал цикл событий бота.
+Строки с ошибками откладываются в отчёт, остальные загружаются. Диапазоны
+целых и длина текста проверяются заранее; если COPY всё же отклонил пачку,
+она загружается половинами, пока не останутся только плохие строки.
+Если файл перестаёт читаться (битый JSON, кодировка), импорт останавливается,
+уже загруженные пачки остаются, а в отчёте видно, на какой строке он прервался.
+После загрузки отзывов агрегаты рейтинга пересчитываются одним
+set-based запросом (reconcile_master_ratings).
+
+Используется командой bulk_import.py и админской загрузкой файла (/import).
+"""
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import asyncio
+import csv
+import io
+import json
+import random
+import time
+
+import asyncpg
+
+from db.db import Executor, acquire
+from metrics import timed_service
+from services.catalog_cache import catalog_cache
+from services.reviews_service import reconcile_master_ratings
+
+MASTER_IMPORT_COLUMNS = (
+    "telegram_id", "name", "username", "phone", "category",
+    "description", "price_min", "price_max", "status",
+)
+REVIEW_IMPORT_COLUMNS = ("master_id", "user_id", "username", "rating", "text")
+
+MASTER_STATUSES = ("new", "approved", "rejected", "inactive")
+DEFAULT_BATCH_SIZE = 10_000
+# Сколько ошибок строк хранить в отчёте
+MAX_REPORTED_ERRORS = 20
+# Границы INTEGER и BIGINT в PostgreSQL
+INT4_MAX = 2**31 - 1
+INT8_MAX = 2**63 - 1
+# Длина текстовых полей: сообщение Telegram, в котором их покажут
+MAX_TEXT_LENGTH = 4096
+
+Row = Dict[str, Any]
+
+
+@dataclass
+class ImportResult:
+    inserted: int = 0
+    rejected: int = 0
+    elapsed: float = 0.0
+    ratings_fixed: int = 0
+    errors: List[str] = field(default_factory=list)
+    # Ошибка чтения файла, на которой импорт остановился
+    aborted: Optional[str] = None
+
+    @property
+    def rows_per_sec(self) -> float:
+        return (self.inserted + self.rejected) / self.elapsed if self.elapsed else 0.0
+
+    def reject(self, line: int, error: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"строка {line}: {error}")
+
+    def summary(self) -> str:
+        text = (
+            f"Загружено {self.inserted}, отклонено {self.rejected} "
+            f"за {self.elapsed:.1f} с ({self.rows_per_sec:.0f} строк/с)"
+        )
+        if self.ratings_fixed:
+            text += f", пересчитан рейтинг у {self.ratings_fixed} мастеров"
+        if self.aborted:
+            text = (
+                f"Импорт прерван: {self.aborted}. "
+                f"Строки до этого места обработаны. {text}"
+            )
+        return text
+
+
+def read_rows(stream: io.TextIOBase, fmt: str) -> Iterator[Row]:
+    """
+    Строки файла как словари: fmt = "csv" (первая строка — заголовок) или "jsonl".
+    """
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+    elif fmt == "jsonl":
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(f"Неизвестный формат: {fmt}")
+
+
+def detect_format(filename: str) -> str:
+    return "jsonl" if filename.endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+def _optional_str(value: Any, name: str = "") -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    if "\x00" in value:
+        # PostgreSQL не хранит нулевой символ в text
+        raise ValueError(f"{name}: недопустимый символ \\x00")
+    if len(value) > MAX_TEXT_LENGTH:
+        raise ValueError(f"{name}: длиннее {MAX_TEXT_LENGTH} символов")
+    return value or None
+
+
+def _optional_int(value: Any, name: str, max_value: int = INT4_MAX) -> Optional[int]:
+    value = _optional_str(value, name)
+    if value is None:
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{name}: ожидается целое число, получено {value!r}")
+    if not -max_value - 1 <= number <= max_value:
+        raise ValueError(f"{name}: число вне допустимого диапазона")
+    return number
+
+
+def _require_object(row: Any) -> None:
+    # В JSONL строка может быть корректным JSON, но не объектом: [1, 2], "x"
+    if not isinstance(row, dict):
+        raise ValueError(f"ожидается объект с полями, получено {type(row).__name__}")
+
+
+def validate_master(row: Row, default_status: str) -> Tuple:
+    """
+    Проверить строку мастера и вернуть запись в порядке MASTER_IMPORT_COLUMNS.
+    """
+    _require_object(row)
+    name = _optional_str(row.get("name"), "name")
+    if not name:
+        raise ValueError("name: пусто")
+    category = _optional_str(row.get("category"), "category")
+    if not category:
+        raise ValueError("category: пусто")
+    price_min = _optional_int(row.get("price_min"), "price_min")
+    price_max = _optional_int(row.get("price_max"), "price_max")
+    if (price_min is not None and price_min < 0) or (price_max is not None and price_max < 0):
+        raise ValueError("цена не может быть отрицательной")
+    if price_min is not None and price_max is not None and price_min > price_max:
+        raise ValueError("price_min больше price_max")
+    status = _optional_str(row.get("status"), "status") or default_status
+    if status not in MASTER_STATUSES:
+        raise ValueError(f"status: {status!r} не из {MASTER_STATUSES}")
+    username = _optional_str(row.get("username"), "username")
+    return (
+        _optional_int(row.get("telegram_id"), "telegram_id", INT8_MAX),
+        name[:200],
+        username.lstrip("@") if username else None,
+        _optional_str(row.get("phone"), "phone"),
+        category,
+        _optional_str(row.get("description"), "description"),
+        price_min,
+        price_max,
+        status,
+    )
+
+
+def validate_review(row: Row) -> Tuple:
+    """
+    Проверить строку отзыва и вернуть запись в порядке REVIEW_IMPORT_COLUMNS.
+    Существование мастера проверяется для всей пачки сразу (_existing_masters).
+    """
+    _require_object(row)
+    master_id = _optional_int(row.get("master_id"), "master_id")
+    if master_id is None:
+        raise ValueError("master_id: пусто")
+    user_id = _optional_int(row.get("user_id"), "user_id", INT8_MAX)
+    if user_id is None:
+        raise ValueError("user_id: пусто")
+    rating = _optional_int(row.get("rating"), "rating")
+    if rating is None or not 1 <= rating <= 5:
+        raise ValueError("rating: ожидается число от 1 до 5")
+    return (
+        master_id,
+        user_id,
+        _optional_str(row.get("username"), "username"),
+        rating,
+        _optional_str(row.get("text"), "text"),
+    )
+
+
+class _BatchReader:
+    """
+    Читает строки пачками по size и проверяет их функцией validate.
+    read выполняется в потоке: ни разбор файла, ни проверка не занимают цикл событий.
+    Ошибка чтения файла не выбрасывается: она записывается в result.aborted,
+    и отдаётся то, что прочитано до неё.
+    """
+
+    def __init__(self, rows: Iterable[Row], size: int, result: ImportResult):
+        self._rows = iter(rows)
+        self.size = size
+        self.result = result
+        # Номер строки считаем с 1 — так его проще найти в исходном файле.
+        self.line = 0
+        self.done = False
+
+    def read(self, validate: Callable[[Row], Tuple]) -> List[Tuple[int, Tuple]]:
+        """
+        Следующая пачка проверенных записей (номер строки, запись).
+        """
+        batch: List[Tuple[int, Tuple]] = []
+        try:
+            for _ in range(self.size):
+                try:
+                    row = next(self._rows)
+                except StopIteration:
+                    self.done = True
+                    break
+                self.line += 1
+                try:
+                    batch.append((self.line, validate(row)))
+                except (ValueError, TypeError) as e:
+                    self.result.reject(self.line, str(e))
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            self.result.aborted = f"строка {self.line + 1}: {e}"
+            self.done = True
+        return batch
+
+
+# Ошибки COPY из-за содержимого строк: такую пачку имеет смысл делить
+_ROW_ERRORS = (asyncpg.DataError, asyncpg.PostgresError, ValueError, OverflowError)
+
+
+async def _copy_batch(
+    conn,
+    table: str,
+    columns: Sequence[str],
+    records: List[Tuple],
+    lines: List[int],
+    result: ImportResult,
+) -> None:
+    if not records:
+        return
+    try:
+        await conn.copy_records_to_table(table, records=records, columns=columns)
+    except Exception as e:
+        if len(records) > 1 and isinstance(e, _ROW_ERRORS):
+            # COPY атомарен: делим пачку пополам, чтобы отклонить только плохие строки.
+            middle = len(records) // 2
+            await _copy_batch(conn, table, columns, records[:middle], lines[:middle], result)
+            await _copy_batch(conn, table, columns, records[middle:], lines[middle:], result)
+            return
+        result.rejected += len(records)
+        if len(result.errors) < MAX_REPORTED_ERRORS:
+            where = f"строка {lines[0]}" if len(lines) == 1 else f"строки {lines[0]}–{lines[-1]}"
+            result.errors.append(f"{where}: {e}")
+        return
+    result.inserted += len(records)
+
+
+@timed_service
+async def import_masters(
+    pool: Executor,
+    rows: Iterable[Row],
+    default_status: str = "approved",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> ImportResult:
+    """
+    Загрузить мастеров. Статус по умолчанию — approved: партнёрские списки
+    уже проверены; для модерации передайте default_status="new".
+    """
+    result = ImportResult()
+    started = time.perf_counter()
+    reader = _BatchReader(rows, batch_size, result)
+    async with acquire(pool) as conn:
+        while not reader.done:
+            batch = await asyncio.to_thread(
+                reader.read, lambda row: validate_master(row, default_status)
+            )
+            records = [record for _, record in batch]
+            lines = [line for line, _ in batch]
+            await _copy_batch(conn, "masters", MASTER_IMPORT_COLUMNS, records, lines, result)
+        await conn.execute("ANALYZE masters;")
+    result.elapsed = time.perf_counter() - started
+    catalog_cache.invalidate()
+    return result
+
+
+async def _existing_masters(conn, master_ids: Iterable[int]) -> set:
+    rows = await conn.fetch(
+        "SELECT id FROM masters WHERE id = ANY($1::int[]);",
+        list(set(master_ids)),
+    )
+    return {row["id"] for row in rows}
+
+
+@timed_service
+async def import_reviews(
+    pool: Executor,
+    rows: Iterable[Row],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> ImportResult:
+    """
+    Загрузить отзывы и затем одним запросом пересчитать агрегаты рейтинга.
+    """
+    result = ImportResult()
+    started = time.perf_counter()
+    reader = _BatchReader(rows, batch_size, result)
+    async with acquire(pool) as conn:
+        while not reader.done:
+            valid = await asyncio.to_thread(reader.read, validate_review)
+
+            # Внешний ключ проверяем одним запросом на пачку, а не ошибкой COPY.
+            existing = await _existing_masters(conn, (record[0] for _, record in valid))
+            records, lines = [], []
+            for line, record in valid:
+                if record[0] in existing:
+                    records.append(record)
+                    lines.append(line)
+                else:
+                    result.reject(line, f"мастер #{record[0]} не найден")
+            await _copy_batch(conn, "reviews", REVIEW_IMPORT_COLUMNS, records, lines, result)
+        await conn.execute("ANALYZE reviews;")
+
+        if result.inserted:
+            result.ratings_fixed = await reconcile_master_ratings(conn)
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+_FIRST_NAMES = ("Иван", "Пётр", "Алексей", "Сергей", "Дмитрий", "Андрей", "Ольга", "Марина")
+_LAST_NAMES = ("Иванов", "Петров", "Смирнов", "Кузнецов", "Попов", "Соколов", "Козлов")
+_CATEGORIES = ("Сантехника", "Электрика", "Ремонт")
+_WORDS = (
+    "установка", "ремонт", "замена", "смесителей", "розеток", "проводки",
+    "труб", "плитки", "ламината", "дверей", "котлов", "быстро", "недорого", "гарантия",
+)
+
+
+def synthetic_masters(count: int, seed: int = 1) -> Iterator[Row]:
+    """
+    Правдоподобные мастера для заполнения больших тестовых баз.
+    """
+    rnd = random.Random(seed)
+    for _ in range(count):
+        price_min = rnd.randint(500, 5000)
+        yield {
+            "name": f"{rnd.choice(_FIRST_NAMES)} {rnd.choice(_LAST_NAMES)}",
+            "category": rnd.choice(_CATEGORIES),
+            "description": " ".join(rnd.choices(_WORDS, k=rnd.randint(8, 14))),
+            "price_min": price_min,
+            "price_max": price_min + rnd.randint(1000, 20000),
+        }
+
+
+def synthetic_reviews(count: int, max_master_id: int, seed: int = 1) -> Iterator[Row]:
+    """
+    Отзывы к мастерам с id 1..max_master_id.
+    """
+    rnd = random.Random(seed)
+    for i in range(count):
+        yield {
+            "master_id": rnd.randint(1, max_master_id),
+            "user_id": 1_000_000 + i,
+            "rating": rnd.choices((1, 2, 3, 4, 5), weights=(1, 1, 2, 4, 6))[0],
+            "text": " ".join(rnd.choices(_WORDS, k=rnd.randint(3, 8))),
+        }
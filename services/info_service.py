@@ -2,12 +2,16 @@ from typing import Optional, List
 
 import asyncpg
 
+from db.db import Executor, acquire
+from metrics import timed_service
 
-async def get_info_page(pool: asyncpg.pool.Pool, slug: str) -> Optional[asyncpg.Record]:
+
+@timed_service
+async def get_info_page(pool: Executor, slug: str) -> Optional[asyncpg.Record]:
     """
     Получить инфо-страницу по slug (about, contacts и т.п.).
     """
-    async with pool.acquire() as conn:
+    async with acquire(pool) as conn:
         row = await conn.fetchrow(
             "SELECT * FROM info_pages WHERE slug = $1;",
             slug,
@@ -15,8 +19,9 @@ async def get_info_page(pool: asyncpg.pool.Pool, slug: str) -> Optional[asyncpg.
         return row
 
 
+@timed_service
 async def update_info_page(
-    pool: asyncpg.pool.Pool,
+    pool: Executor,
     slug: str,
     title: str,
     content: str,
@@ -24,7 +29,7 @@ async def update_info_page(
     """
     Обновить или создать инфо-страницу.
     """
-    async with pool.acquire() as conn:
+    async with acquire(pool) as conn:
         await conn.execute(
             """
             INSERT INTO info_pages (slug, title, content)
@@ -40,11 +45,12 @@ async def update_info_page(
         )
 
 
-async def get_faq(pool: asyncpg.pool.Pool) -> List[asyncpg.Record]:
+@timed_service
+async def get_faq(pool: Executor) -> List[asyncpg.Record]:
     """
     Получить видимые FAQ.
     """
-    async with pool.acquire() as conn:
+    async with acquire(pool) as conn:
         rows = await conn.fetch(
             """
             SELECT *
@@ -56,15 +62,16 @@ async def get_faq(pool: asyncpg.pool.Pool) -> List[asyncpg.Record]:
         return list(rows)
 
 
+@timed_service
 async def add_faq(
-    pool: asyncpg.pool.Pool,
+    pool: Executor,
     question: str,
     answer: str,
 ) -> None:
     """
     Добавить новый вопрос-ответ.
     """
-    async with pool.acquire() as conn:
+    async with acquire(pool) as conn:
         await conn.execute(
             """
             INSERT INTO faq (question, answer, is_visible)
@@ -1,13 +1,47 @@
-from typing import List, Optional, Literal, Any
+from typing import List, Optional, Literal, Any, Tuple
+import re
 
 import asyncpg
 
+from db.db import Executor, acquire
+from metrics import timed_service
+from services.catalog_cache import catalog_cache
+from services.models import MasterListItem
+from services.statements import statements
+
 
 SortBy = Literal["rating", "price", "reviews"]
 
+# Проекции: для строк списков — только то, что выводится в списке,
+# для карточки — всё, кроме служебных колонок (search_vector, rating_sum, даты).
+MASTER_LIST_COLUMNS = (
+    "id", "name", "category", "price_min", "price_max",
+    "rating", "reviews_count", "status",
+)
+MASTER_CARD_COLUMNS = (
+    "id", "telegram_id", "name", "username", "phone", "category",
+    "description", "price_min", "price_max", "photo_file_id", "status",
+    "rating", "reviews_count",
+    "stars_1", "stars_2", "stars_3", "stars_4", "stars_5",
+)
+
+# Вклад рейтинга в итоговый score поиска: ts_rank обычно лежит в пределах 0..1,
+# так что разница в 1 звезду весит примерно как заметная разница в релевантности.
+SEARCH_RATING_WEIGHT = 0.05
+
+
+def _columns(columns: tuple[str, ...], alias: str = "") -> str:
+    prefix = f"{alias}." if alias else ""
+    return ", ".join(prefix + column for column in columns)
+
 
+LIST_SELECT = _columns(MASTER_LIST_COLUMNS)
+CARD_SELECT = _columns(MASTER_CARD_COLUMNS)
+
+
+@timed_service
 async def create_master_application(
-    pool: asyncpg.pool.Pool,
+    pool: Executor,
     telegram_id: int,
     name: str,
     username: Optional[str],
@@ -22,7 +56,7 @@ async def create_master_application(
     Создаёт заявку мастера со статусом 'new'.
     Возвращает id мастера.
     """
-    async with pool.acquire() as conn:
+    async with acquire(pool) as conn:
         row = await conn.fetchrow(
             """
             INSERT INTO masters (
@@ -45,154 +79,519 @@ async def create_master_application(
         return int(row["id"])
 
 
+# Ключи сортировки каталога. id в конце делает порядок строгим,
+# что нужно для keyset-навигации по карусели.
+# NULL-цены уводим в конец через COALESCE, чтобы работало сравнение кортежей.
+_SORT_KEYS = {
+    "rating": (("rating", "reviews_count", "id"), "DESC"),
+    "reviews": (("reviews_count", "rating", "id"), "DESC"),
+    "price": (("COALESCE(price_min, 2147483647)", "id"), "ASC"),
+}
+
+NavDirection = Literal["next", "prev"]
+
+
+def _sort_spec(sort_by: str):
+    return _SORT_KEYS.get(sort_by, _SORT_KEYS["rating"])
+
+
+def _order_by(sort_by: str, reverse: bool = False) -> str:
+    keys, direction = _sort_spec(sort_by)
+    if reverse:
+        direction = "ASC" if direction == "DESC" else "DESC"
+    return ", ".join(f"{key} {direction}" for key in keys)
+
+
+def _approved_where(
+    has_category: bool,
+    has_price_min: bool = False,
+    has_price_max: bool = False,
+    first_idx: int = 1,
+) -> str:
+    """
+    Условие WHERE для одобренных мастеров с плейсхолдерами под фильтры.
+    """
+    conditions = ["status = 'approved'"]
+    idx = first_idx
+
+    if has_category:
+        conditions.append(f"category = ${idx}")
+        idx += 1
+
+    if has_price_min:
+        conditions.append(f"price_min >= ${idx}")
+        idx += 1
+
+    if has_price_max:
+        conditions.append(f"price_max <= ${idx}")
+        idx += 1
+
+    return " AND ".join(conditions)
+
+
+def _approved_params(
+    category: Optional[str],
+    price_min: Optional[int] = None,
+    price_max: Optional[int] = None,
+) -> list[Any]:
+    """
+    Значения фильтров в порядке плейсхолдеров _approved_where.
+    """
+    params: list[Any] = []
+    if category and category != "Все":
+        params.append(category)
+    if price_min is not None:
+        params.append(price_min)
+    if price_max is not None:
+        params.append(price_max)
+    return params
+
+
+def _normalize_sort(sort_by: str) -> str:
+    return sort_by if sort_by in _SORT_KEYS else "rating"
+
+
+def _shape(has_category: bool, has_price_min: bool = False, has_price_max: bool = False) -> str:
+    return (
+        ("c" if has_category else "-")
+        + ("m" if has_price_min else "-")
+        + ("M" if has_price_max else "-")
+    )
+
+
+def _approved_list_sql(
+    sort_by: str, has_category: bool, has_price_min: bool, has_price_max: bool
+) -> str:
+    limit_idx = 1 + has_category + has_price_min + has_price_max
+    where_clause = _approved_where(has_category, has_price_min, has_price_max)
+    return f"""
+    SELECT {LIST_SELECT}
+    FROM masters
+    WHERE {where_clause}
+    ORDER BY {_order_by(sort_by)}
+    LIMIT ${limit_idx};
+    """
+
+
+def _adjacent_sql(sort_by: str, direction: str, has_category: bool) -> str:
+    keys, sort_direction = _sort_spec(sort_by)
+    reverse = direction == "prev"
+    if (sort_direction == "DESC") != reverse:
+        op = "<"
+    else:
+        op = ">"
+
+    where_clause = _approved_where(has_category, first_idx=2)
+    key_tuple = ", ".join(keys)
+    order_by = _order_by(sort_by, reverse=reverse)
+
+    # Первая ветка — соседняя запись по keyset, вторая — край списка
+    # на случай, если дошли до конца или курсор не найден.
+    # has_neighbours — есть ли в каталоге кто-то кроме найденного мастера.
+    return f"""
+    SELECT {CARD_SELECT},
+           EXISTS (
+               SELECT 1 FROM masters
+               WHERE {where_clause} AND masters.id <> nav.id
+           ) AS has_neighbours
+    FROM (
+        (
+            SELECT {CARD_SELECT}, 0 AS nav_branch
+            FROM masters
+            WHERE {where_clause}
+              AND ({key_tuple}) {op} (
+                SELECT {key_tuple} FROM masters WHERE id = $1
+              )
+            ORDER BY {order_by}
+            LIMIT 1
+        )
+        UNION ALL
+        (
+            SELECT {CARD_SELECT}, 1 AS nav_branch
+            FROM masters
+            WHERE {where_clause}
+            ORDER BY {order_by}
+            LIMIT 1
+        )
+    ) AS nav
+    ORDER BY nav_branch
+    LIMIT 1;
+    """
+
+
+def _card_sql(sort_by: str, has_category: bool) -> str:
+    where_clause = _approved_where(has_category, first_idx=3)
+    return f"""
+    WITH ranked AS (
+        SELECT id,
+               ROW_NUMBER() OVER (ORDER BY {_order_by(sort_by)}) AS position,
+               COUNT(*) OVER () AS total
+        FROM masters
+        WHERE {where_clause}
+    )
+    SELECT {_columns(MASTER_CARD_COLUMNS, "m")},
+           ranked.position, ranked.total, lr.latest_reviews
+    FROM masters m
+    LEFT JOIN ranked ON ranked.id = m.id
+    LEFT JOIN LATERAL (
+        SELECT array_agg(x.review ORDER BY (x.review).created_at DESC) AS latest_reviews
+        FROM (
+            SELECT r AS review
+            FROM reviews r
+            WHERE r.master_id = m.id AND r.is_visible = TRUE
+            ORDER BY r.created_at DESC
+            LIMIT $2
+        ) AS x
+    ) AS lr ON TRUE
+    WHERE m.id = $1;
+    """
+
+
+def _register_statements() -> None:
+    """
+    Регистрирует все формы запросов каталога в реестре выражений.
+    Фильтры по цене хендлерами пока не используются, поэтому их не прогреваем.
+    """
+    for sort_by in _SORT_KEYS:
+        for has_category in (False, True):
+            category_arg = [""] if has_category else []
+
+            for has_min in (False, True):
+                for has_max in (False, True):
+                    statements.register(
+                        f"masters.approved_list:{sort_by}:{_shape(has_category, has_min, has_max)}",
+                        _approved_list_sql(sort_by, has_category, has_min, has_max),
+                        warmup_args=category_arg + [0] * (has_min + has_max) + [0],
+                        prewarm=not (has_min or has_max),
+                    )
+
+            for direction in ("next", "prev"):
+                # id = 0 обнуляет ветку по keyset, но ветка «край списка» без
+                # категории всё равно вернёт одну строку — для прогрева это дёшево.
+                statements.register(
+                    f"masters.adjacent:{sort_by}:{direction}:{_shape(has_category)}",
+                    _adjacent_sql(sort_by, direction, has_category),
+                    warmup_args=[0] + category_arg,
+                )
+
+            statements.register(
+                f"masters.card:{sort_by}:{_shape(has_category)}",
+                _card_sql(sort_by, has_category),
+                warmup_args=[0, 0] + category_arg,
+            )
+
+    statements.register(
+        "masters.by_id",
+        f"SELECT {CARD_SELECT} FROM masters WHERE id = $1;",
+        warmup_args=[0],
+    )
+    statements.register(
+        "masters.search",
+        f"""
+        SELECT {_columns(MASTER_LIST_COLUMNS, "m")},
+               ts_rank(m.search_vector, q) + {SEARCH_RATING_WEIGHT} * m.rating::float4
+                   AS search_score
+        FROM masters m, to_tsquery('russian', $1) AS q
+        WHERE m.status = 'approved'
+          AND m.search_vector @@ q
+        ORDER BY search_score DESC, m.id DESC
+        LIMIT $2 OFFSET $3;
+        """,
+        warmup_args=["", 0, 0],
+    )
+
+
+@timed_service
 async def get_approved_masters(
-    pool: asyncpg.pool.Pool,
+    pool: Executor,
     category: Optional[str] = None,
     price_min: Optional[int] = None,
     price_max: Optional[int] = None,
     sort_by: SortBy = "rating",
     limit: int = 10,
-) -> List[asyncpg.Record]:
+) -> List[MasterListItem]:
     """
     Получить список одобренных мастеров с фильтрами и сортировкой.
     """
-    async with pool.acquire() as conn:
-        conditions = ["status = 'approved'"]
-        params: list[Any] = []
-        idx = 1
-
-        if category and category != "Все":
-            conditions.append(f"category = ${idx}")
-            params.append(category)
-            idx += 1
-
-        if price_min is not None:
-            conditions.append(f"price_min >= ${idx}")
-            params.append(price_min)
-            idx += 1
-
-        if price_max is not None:
-            conditions.append(f"price_max <= ${idx}")
-            params.append(price_max)
-            idx += 1
-
-        where_clause = " AND ".join(conditions) if conditions else "TRUE"
-
-        if sort_by == "price":
-            order_by = "price_min ASC NULLS LAST"
-        elif sort_by == "reviews":
-            order_by = "reviews_count DESC, rating DESC"
-        else:
-            order_by = "rating DESC, reviews_count DESC"
-
-        query = f"""
-        SELECT *
-        FROM masters
-        WHERE {where_clause}
-        ORDER BY {order_by}
-        LIMIT {limit};
-        """
+    has_category = bool(category and category != "Все")
+    shape = _shape(has_category, price_min is not None, price_max is not None)
+    statement = statements.get(
+        f"masters.approved_list:{_normalize_sort(sort_by)}:{shape}"
+    )
+    params = _approved_params(category, price_min, price_max)
 
-        rows = await conn.fetch(query, *params)
-        return list(rows)
+    async with acquire(pool) as conn:
+        rows = await statement.fetch(conn, *params, limit)
+        return [MasterListItem.from_record(row) for row in rows]
 
 
-async def get_master_by_id(pool: asyncpg.pool.Pool, master_id: int) -> Optional[asyncpg.Record]:
+@timed_service
+async def get_adjacent_master(
+    pool: Executor,
+    cursor_id: int,
+    direction: NavDirection = "next",
+    category: Optional[str] = None,
+    sort_by: SortBy = "rating",
+) -> Optional[asyncpg.Record]:
+    """
+    Следующий/предыдущий одобренный мастер относительно позиции (ключ сортировки, id)
+    мастера cursor_id. Список закольцован: после последнего идёт первый и наоборот.
+    Если мастера cursor_id нет (например, cursor_id = 0), возвращается первый
+    (для next) или последний (для prev) мастер. has_neighbours = FALSE —
+    в каталоге больше никого нет, и листать некуда.
+    """
+    has_category = bool(category and category != "Все")
+    direction = "prev" if direction == "prev" else "next"
+    statement = statements.get(
+        f"masters.adjacent:{_normalize_sort(sort_by)}:{direction}:{_shape(has_category)}"
+    )
+
+    async with acquire(pool) as conn:
+        row = await statement.fetchrow(conn, cursor_id, *_approved_params(category))
+        return row
+
+
+@timed_service
+async def get_master_by_id(pool: Executor, master_id: int) -> Optional[asyncpg.Record]:
     """
     Получить мастера по id.
     """
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "SELECT * FROM masters WHERE id = $1;",
-            master_id,
+    async with acquire(pool) as conn:
+        row = await statements.get("masters.by_id").fetchrow(conn, master_id)
+        return row
+
+
+@timed_service
+async def get_master_card(
+    pool: Executor,
+    master_id: int,
+    category: Optional[str] = None,
+    sort_by: SortBy = "rating",
+    reviews_limit: int = 5,
+) -> Optional[asyncpg.Record]:
+    """
+    Мастер для карточки одним запросом: все поля мастера, плюс
+    - position/total — место мастера в каталоге (категория + сортировка)
+      и размер каталога; position = NULL, если мастер в каталог не входит;
+    - latest_reviews — последние видимые отзывы (список записей reviews) или NULL.
+    """
+    has_category = bool(category and category != "Все")
+    statement = statements.get(
+        f"masters.card:{_normalize_sort(sort_by)}:{_shape(has_category)}"
+    )
+
+    async with acquire(pool) as conn:
+        row = await statement.fetchrow(
+            conn, master_id, reviews_limit, *_approved_params(category)
         )
         return row
 
 
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def build_search_query(text: str) -> str:
+    """
+    Превращает пользовательский ввод в выражение to_tsquery:
+    все слова обязательны и ищутся по префиксу ("сантех" найдёт "сантехник").
+    """
+    words = _WORD_RE.findall(text.lower())
+    return " & ".join(f"{word}:*" for word in words)
+
+
+@timed_service
 async def search_masters(
-    pool: asyncpg.pool.Pool,
+    pool: Executor,
     text: str,
     limit: int = 10,
+    offset: int = 0,
+) -> List[MasterListItem]:
+    """
+    Полнотекстовый поиск одобренных мастеров (русская морфология, GIN-индекс).
+    Результаты упорядочены по релевантности с поправкой на рейтинг.
+    """
+    ts_query = build_search_query(text)
+    if not ts_query:
+        return []
+
+    async with acquire(pool) as conn:
+        rows = await statements.get("masters.search").fetch(conn, ts_query, limit, offset)
+        return [MasterListItem.from_record(row) for row in rows]
+
+
+# Сколько держится захват заявок модератором, если он их не обработал
+MODERATION_LEASE_SECONDS = 600
+
+# Заявка свободна для модератора $1, если она ничья, его собственная
+# или захват другого модератора истёк.
+_CLAIMABLE = """
+    status = 'new'
+    AND (claimed_by IS NULL OR claimed_by = $1 OR claim_expires_at < NOW())
+"""
+
+
+@timed_service
+async def claim_pending_masters(
+    pool: Executor,
+    admin_id: int,
+    limit: int,
+    lease_seconds: int = MODERATION_LEASE_SECONDS,
 ) -> List[asyncpg.Record]:
     """
-    Поиск мастеров по имени/описанию/категории (simple ILIKE).
+    Захватить для модератора admin_id до limit старейших заявок со статусом 'new'
+    и продлить захват уже взятых им. Заявки, которые в этот момент захватывает
+    другой модератор, пропускаются (FOR UPDATE SKIP LOCKED), а не ждут блокировки.
+    У каждой строки есть queue_total — сколько всего заявок ждёт модерации.
     """
-    pattern = f"%{text}%"
-    async with pool.acquire() as conn:
+    async with acquire(pool) as conn:
         rows = await conn.fetch(
-            """
-            SELECT *
-            FROM masters
-            WHERE status = 'approved'
-              AND (
-                name ILIKE $1
-                OR description ILIKE $1
-                OR category ILIKE $1
-              )
-            ORDER BY rating DESC, reviews_count DESC
-            LIMIT $2;
+            f"""
+            WITH claimable AS (
+                SELECT id FROM masters
+                WHERE {_CLAIMABLE}
+                ORDER BY claimed_by IS NOT DISTINCT FROM $1 DESC, created_at, id
+                LIMIT $2
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE masters m
+            SET claimed_by = $1,
+                claim_expires_at = NOW() + make_interval(secs => $3)
+            FROM claimable
+            WHERE m.id = claimable.id
+            RETURNING {_columns(MASTER_CARD_COLUMNS, "m")}, m.created_at,
+                      (SELECT COUNT(*) FROM masters WHERE status = 'new') AS queue_total;
             """,
-            pattern,
+            admin_id,
             limit,
+            float(lease_seconds),
         )
-        return list(rows)
+        return sorted(rows, key=lambda row: (row["created_at"], row["id"]))
 
 
-async def get_pending_masters(pool: asyncpg.pool.Pool) -> List[asyncpg.Record]:
+@timed_service
+async def release_pending_masters(pool: Executor, admin_id: int) -> None:
     """
-    Получить мастеров со статусом new.
+    Отпустить все заявки, захваченные модератором admin_id.
     """
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            """
-            SELECT * FROM masters
-            WHERE status = 'new'
-            ORDER BY created_at ASC;
+    async with acquire(pool) as conn:
+        await conn.execute(
             """
+            UPDATE masters
+            SET claimed_by = NULL, claim_expires_at = NULL
+            WHERE claimed_by = $1 AND status = 'new';
+            """,
+            admin_id,
         )
-        return list(rows)
 
 
-async def set_master_status(
-    pool: asyncpg.pool.Pool,
+@timed_service
+async def resolve_pending_master(
+    pool: Executor,
     master_id: int,
     status: str,
-) -> None:
+    admin_id: int,
+) -> Optional[asyncpg.Record]:
     """
-    Обновить статус мастера.
+    Перевести заявку из 'new' в status одним запросом.
+    Возвращает telegram_id и category мастера или None, если заявку уже
+    обработали или она захвачена другим модератором.
     """
-    async with pool.acquire() as conn:
-        await conn.execute(
-            """
+    async with acquire(pool) as conn:
+        row = await conn.fetchrow(
+            f"""
             UPDATE masters
             SET status = $2,
-                updated_at = NOW()
-            WHERE id = $1;
+                updated_at = NOW(),
+                claimed_by = NULL,
+                claim_expires_at = NULL
+            WHERE id = $3 AND {_CLAIMABLE}
+            RETURNING telegram_id, category;
             """,
+            admin_id,
+            status,
             master_id,
+        )
+
+    if row:
+        catalog_cache.invalidate(row["category"])
+    return row
+
+
+@timed_service
+async def set_master_status_many(
+    pool: Executor,
+    master_ids: List[int],
+    status: str,
+    admin_id: int,
+) -> List[asyncpg.Record]:
+    """
+    Перевести пачку заявок из 'new' в status одним запросом (массовая модерация).
+    Заявки, уже обработанные или захваченные другим модератором, пропускаются.
+    Возвращает id, telegram_id и category изменённых мастеров.
+    """
+    async with acquire(pool) as conn:
+        rows = await conn.fetch(
+            f"""
+            UPDATE masters
+            SET status = $2,
+                updated_at = NOW(),
+                claimed_by = NULL,
+                claim_expires_at = NULL
+            WHERE id = ANY($3::int[]) AND {_CLAIMABLE}
+            RETURNING id, telegram_id, category;
+            """,
+            admin_id,
             status,
+            master_ids,
         )
 
+    for category in {row["category"] for row in rows}:
+        catalog_cache.invalidate(category)
+    return list(rows)
+
 
-async def get_all_masters(pool: asyncpg.pool.Pool, category: Optional[str] = None) -> List[asyncpg.Record]:
+@timed_service
+async def get_masters_page(
+    pool: Executor,
+    cursor_id: int = 0,
+    direction: NavDirection = "next",
+    limit: int = 20,
+) -> Tuple[List[MasterListItem], bool, bool]:
     """
-    Получить всех мастеров, опционально по категории.
+    Страница всех мастеров (новые первыми) для списка в админке, keyset по id.
+    next — мастера старше cursor_id (cursor_id = 0 — с самых новых),
+    prev — новее cursor_id. Возвращает мастеров и флаги наличия
+    более новых и более старых страниц.
     """
-    async with pool.acquire() as conn:
-        if category and category != "Все":
-            rows = await conn.fetch(
-                """
-                SELECT * FROM masters
-                WHERE category = $1
-                ORDER BY created_at DESC;
-                """,
-                category,
-            )
-        else:
-            rows = await conn.fetch(
-                """
-                SELECT * FROM masters
-                ORDER BY created_at DESC;
-                """
+    if direction == "prev":
+        page_where, page_order = "id > $1", "id ASC"
+    else:
+        page_where, page_order = "($1 = 0 OR id < $1)", "id DESC"
+
+    async with acquire(pool) as conn:
+        rows = await conn.fetch(
+            f"""
+            WITH page AS (
+                SELECT {LIST_SELECT} FROM masters
+                WHERE {page_where}
+                ORDER BY {page_order}
+                LIMIT $2
             )
-        return list(rows)
+            SELECT page.*,
+                   EXISTS (SELECT 1 FROM masters WHERE id > (SELECT MAX(id) FROM page))
+                       AS has_newer,
+                   EXISTS (SELECT 1 FROM masters WHERE id < (SELECT MIN(id) FROM page))
+                       AS has_older
+            FROM page
+            ORDER BY id DESC;
+            """,
+            cursor_id,
+            limit,
+        )
+    if not rows:
+        return [], False, False
+    masters = [MasterListItem.from_record(row) for row in rows]
+    return masters, rows[0]["has_newer"], rows[0]["has_older"]
+
+
+_register_statements()
@@ -0,0 +1,63 @@
+"""
+Компактные доменные объекты для списков.
+
+Списки каталога, поиска и админки тянут из БД только нужные для строки
+списка колонки (см. MASTER_LIST_COLUMNS в services/masters_service.py)
+и хранят их в объектах со __slots__, без словаря на каждый экземпляр.
+"""
+from typing import Optional
+
+import asyncpg
+
+
+class MasterListItem:
+    """
+    Мастер в строке списка: каталог, результаты поиска, список в админке.
+    """
+
+    __slots__ = (
+        "id",
+        "name",
+        "category",
+        "price_min",
+        "price_max",
+        "rating",
+        "reviews_count",
+        "status",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        name: str,
+        category: Optional[str],
+        price_min: Optional[int],
+        price_max: Optional[int],
+        rating: float,
+        reviews_count: int,
+        status: str,
+    ):
+        self.id = id
+        self.name = name
+        self.category = category
+        self.price_min = price_min
+        self.price_max = price_max
+        self.rating = rating
+        self.reviews_count = reviews_count
+        self.status = status
+
+    @classmethod
+    def from_record(cls, record: asyncpg.Record) -> "MasterListItem":
+        return cls(
+            record["id"],
+            record["name"],
+            record["category"],
+            record["price_min"],
+            record["price_max"],
+            record["rating"] or 0.0,
+            record["reviews_count"] or 0,
+            record["status"],
+        )
+
+    def __repr__(self) -> str:
+        return f"MasterListItem(id={self.id}, name={self.name!r})"
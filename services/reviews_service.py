@@ -1,10 +1,20 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
+import asyncio
+import logging
 
 import asyncpg
 
+from db.db import Executor, acquire
+from metrics import timed_service
+from services.catalog_cache import catalog_cache
+from services.statements import statements
 
+logger = logging.getLogger(__name__)
+
+
+@timed_service
 async def add_review(
-    pool: asyncpg.pool.Pool,
+    pool: Executor,
     master_id: int,
     user_id: int,
     username: Optional[str],
@@ -13,68 +23,195 @@ async def add_review(
 ) -> None:
     """
     Добавить отзыв и обновить кэш рейтинга мастера.
+    Агрегаты (сумма, количество, гистограмма звёзд) сдвигаются на один отзыв
+    в том же выражении, что и INSERT — без пересчёта по всем отзывам.
     """
-    async with pool.acquire() as conn:
-        async with conn.transaction():
-            await conn.execute(
-                """
+    async with acquire(pool) as conn:
+        category = await conn.fetchval(
+            """
+            WITH new_review AS (
                 INSERT INTO reviews (master_id, user_id, username, rating, text)
-                VALUES ($1,$2,$3,$4,$5);
-                """,
-                master_id,
-                user_id,
-                username,
-                rating,
-                text,
+                VALUES ($1,$2,$3,$4,$5)
+                RETURNING master_id, rating
             )
+            UPDATE masters m
+            SET rating_sum = m.rating_sum + r.rating,
+                reviews_count = COALESCE(m.reviews_count, 0) + 1,
+                rating = ROUND(
+                    (m.rating_sum + r.rating)::numeric
+                    / (COALESCE(m.reviews_count, 0) + 1),
+                    2
+                ),
+                stars_1 = m.stars_1 + (r.rating = 1)::int,
+                stars_2 = m.stars_2 + (r.rating = 2)::int,
+                stars_3 = m.stars_3 + (r.rating = 3)::int,
+                stars_4 = m.stars_4 + (r.rating = 4)::int,
+                stars_5 = m.stars_5 + (r.rating = 5)::int,
+                updated_at = NOW()
+            FROM new_review r
+            WHERE m.id = r.master_id
+            RETURNING m.category;
+            """,
+            master_id,
+            user_id,
+            username,
+            rating,
+            text,
+        )
 
-            # Пересчёт рейтинга
-            row = await conn.fetchrow(
-                """
-                SELECT
-                    COALESCE(AVG(rating), 0) AS avg_rating,
-                    COUNT(*) AS cnt
-                FROM reviews
-                WHERE master_id = $1
-                  AND is_visible = TRUE;
-                """,
-                master_id,
-            )
-            avg_rating = float(row["avg_rating"]) if row["avg_rating"] is not None else 0.0
-            cnt = int(row["cnt"])
-
-            await conn.execute(
-                """
-                UPDATE masters
-                SET rating = $2,
-                    reviews_count = $3,
-                    updated_at = NOW()
-                WHERE id = $1;
-                """,
-                master_id,
-                avg_rating,
-                cnt,
-            )
+    # Сбрасываем кэш после коммита, чтобы новый рендер увидел свежий рейтинг.
+    catalog_cache.invalidate(category)
 
 
-async def get_reviews_for_master(
+# Мастеров на одну транзакцию сверки: столько строк masters блокируется разом
+RECONCILE_CHUNK = 10_000
+
+# Агрегаты видимых отзывов по мастерам, отобранным условием {where}
+_RATING_AGG = """
+    SELECT
+        master_id,
+        SUM(rating) AS rating_sum,
+        COUNT(*) AS cnt,
+        COUNT(*) FILTER (WHERE rating = 1) AS stars_1,
+        COUNT(*) FILTER (WHERE rating = 2) AS stars_2,
+        COUNT(*) FILTER (WHERE rating = 3) AS stars_3,
+        COUNT(*) FILTER (WHERE rating = 4) AS stars_4,
+        COUNT(*) FILTER (WHERE rating = 5) AS stars_5
+    FROM reviews
+    WHERE is_visible = TRUE AND {where}
+    GROUP BY master_id
+"""
+
+# Мастер без отзывов в agg не попадает — для него все агрегаты нулевые
+_RATING_DIFFERS = """
+    (
+        m.rating_sum, m.reviews_count,
+        m.stars_1, m.stars_2, m.stars_3, m.stars_4, m.stars_5
+    ) IS DISTINCT FROM (
+        COALESCE(agg.rating_sum, 0), COALESCE(agg.cnt, 0),
+        COALESCE(agg.stars_1, 0), COALESCE(agg.stars_2, 0), COALESCE(agg.stars_3, 0),
+        COALESCE(agg.stars_4, 0), COALESCE(agg.stars_5, 0)
+    )
+"""
+
+
+@timed_service
+async def reconcile_master_ratings(pool: Executor) -> int:
+    """
+    Пересчитать агрегаты рейтинга по видимым отзывам и исправить расхождения
+    (скрытые отзывы, ручные правки в БД и т.п.).
+    Возвращает количество исправленных мастеров.
+
+    Мастера обходятся диапазонами id по RECONCILE_CHUNK. В каждой транзакции
+    сначала блокируются (FOR UPDATE) мастера с расхождением, и только потом
+    агрегаты считаются заново — уже новым снимком. add_review, закоммиченный
+    до блокировки, в этот снимок попадает, а ожидающий блокировки прибавит
+    свой отзыв поверх исправленных значений: свежий рейтинг не затирается старым.
+    """
+    fixed_by_category: Dict[Optional[str], int] = {}
+    async with acquire(pool) as conn:
+        max_id = await conn.fetchval("SELECT COALESCE(MAX(id), 0) FROM masters;")
+        for low in range(0, max_id, RECONCILE_CHUNK):
+            async with conn.transaction():
+                stale_ids = await conn.fetchval(
+                    f"""
+                    SELECT array_agg(id) FROM (
+                        SELECT m.id
+                        FROM masters m
+                        LEFT JOIN ({_RATING_AGG.format(where="master_id > $1 AND master_id <= $2")}) agg
+                          ON agg.master_id = m.id
+                        WHERE m.id > $1 AND m.id <= $2
+                          AND {_RATING_DIFFERS}
+                        ORDER BY m.id
+                        FOR UPDATE OF m
+                    ) AS stale;
+                    """,
+                    low,
+                    low + RECONCILE_CHUNK,
+                )
+                if not stale_ids:
+                    continue
+                # Категории сворачиваем в БД: после массового импорта исправленных
+                # мастеров могут быть миллионы, а для кэша нужны только категории.
+                rows = await conn.fetch(
+                    f"""
+                    WITH updated AS (
+                        UPDATE masters m
+                        SET rating_sum = COALESCE(agg.rating_sum, 0),
+                            reviews_count = COALESCE(agg.cnt, 0),
+                            rating = CASE
+                                WHEN agg.cnt > 0 THEN ROUND(agg.rating_sum::numeric / agg.cnt, 2)
+                                ELSE 0
+                            END,
+                            stars_1 = COALESCE(agg.stars_1, 0),
+                            stars_2 = COALESCE(agg.stars_2, 0),
+                            stars_3 = COALESCE(agg.stars_3, 0),
+                            stars_4 = COALESCE(agg.stars_4, 0),
+                            stars_5 = COALESCE(agg.stars_5, 0),
+                            updated_at = NOW()
+                        FROM unnest($1::int[]) AS stale(id)
+                        LEFT JOIN ({_RATING_AGG.format(where="master_id = ANY($1::int[])")}) agg
+                          ON agg.master_id = stale.id
+                        WHERE m.id = stale.id
+                          AND {_RATING_DIFFERS}
+                        RETURNING m.category
+                    )
+                    SELECT category, COUNT(*) AS fixed
+                    FROM updated
+                    GROUP BY category;
+                    """,
+                    stale_ids,
+                )
+            for row in rows:
+                fixed_by_category[row["category"]] = (
+                    fixed_by_category.get(row["category"], 0) + row["fixed"]
+                )
+
+    for category in fixed_by_category:
+        catalog_cache.invalidate(category)
+    return sum(fixed_by_category.values())
+
+
+async def rating_reconciliation_loop(
     pool: asyncpg.pool.Pool,
+    interval: float = 3600.0,
+) -> None:
+    """
+    Фоновая задача: раз в interval секунд сверяет агрегаты рейтинга с отзывами.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            fixed = await reconcile_master_ratings(pool)
+        except Exception as e:
+            logger.error(f"Ошибка сверки рейтингов мастеров: {e}")
+            continue
+        if fixed:
+            logger.warning(f"Сверка рейтингов: исправлено мастеров — {fixed}")
+
+
+_LATEST_REVIEWS = statements.register(
+    "reviews.latest",
+    """
+    SELECT *
+    FROM reviews
+    WHERE master_id = $1 AND is_visible = TRUE
+    ORDER BY created_at DESC
+    LIMIT $2;
+    """,
+    warmup_args=[0, 0],
+)
+
+
+@timed_service
+async def get_reviews_for_master(
+    pool: Executor,
     master_id: int,
     limit: int = 5,
 ) -> List[asyncpg.Record]:
     """
     Получить последние отзывы по мастеру.
     """
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            """
-            SELECT *
-            FROM reviews
-            WHERE master_id = $1 AND is_visible = TRUE
-            ORDER BY created_at DESC
-            LIMIT $2;
-            """,
-            master_id,
-            limit,
-        )
+    async with acquire(pool) as conn:
+        rows = await _LATEST_REVIEWS.fetch(conn, master_id, limit)
         return list(rows)
@@ -0,0 +1,87 @@
+"""
+Реестр SQL-выражений каталога.
+
+Все формы запросов каталога (фильтры × сортировки × направление навигации)
+перечисляются заранее и полностью параметризованы, включая LIMIT, поэтому
+текст запроса не зависит от значений и переиспользуется из кэша
+подготовленных выражений asyncpg. Выражения с prewarm=True готовятся
+в init-хуке пула (db/db.py), так что первый запрос на свежем соединении
+не платит за parse/plan. Для каждого выражения считается число выполнений.
+"""
+from typing import Any, Dict, List, Optional, Sequence
+import logging
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+
+class Statement:
+    __slots__ = ("name", "sql", "warmup_args", "prewarm", "calls")
+
+    def __init__(self, name: str, sql: str, warmup_args: Sequence[Any], prewarm: bool):
+        self.name = name
+        self.sql = sql
+        self.warmup_args = tuple(warmup_args)
+        self.prewarm = prewarm
+        self.calls = 0
+
+    async def fetch(self, conn: asyncpg.Connection, *args: Any) -> List[asyncpg.Record]:
+        self.calls += 1
+        return await conn.fetch(self.sql, *args)
+
+    async def fetchrow(self, conn: asyncpg.Connection, *args: Any) -> Optional[asyncpg.Record]:
+        self.calls += 1
+        return await conn.fetchrow(self.sql, *args)
+
+
+class StatementRegistry:
+    def __init__(self):
+        self._statements: Dict[str, Statement] = {}
+
+    def register(
+        self,
+        name: str,
+        sql: str,
+        warmup_args: Sequence[Any] = (),
+        prewarm: bool = True,
+    ) -> Statement:
+        """
+        Зарегистрировать выражение. warmup_args — параметры, с которыми
+        выражение выполняется при прогреве; они должны делать запрос дешёвым:
+        пустым (id = 0, LIMIT 0 и т.п.) или не больше нескольких строк,
+        если у какой-то ветки запроса нет параметров (например, возврат
+        к краю списка в masters.adjacent без категории отдаёт одну строку).
+        """
+        if name in self._statements:
+            raise ValueError(f"Выражение {name} уже зарегистрировано")
+        statement = Statement(name, sql, warmup_args, prewarm)
+        self._statements[name] = statement
+        return statement
+
+    def get(self, name: str) -> Statement:
+        return self._statements[name]
+
+    def __len__(self) -> int:
+        return len(self._statements)
+
+    async def prewarm(self, conn: asyncpg.Connection) -> None:
+        """
+        Подготовить выражения на новом соединении.
+        Выполняем их с параметрами прогрева: так выражение попадает в кэш
+        подготовленных выражений соединения, которым пользуются fetch/fetchrow.
+        """
+        for statement in self._statements.values():
+            if not statement.prewarm:
+                continue
+            try:
+                await conn.fetch(statement.sql, *statement.warmup_args)
+            except asyncpg.PostgresError as e:
+                # Например, при самом первом запуске, когда миграции ещё не применены.
+                logger.debug(f"Не удалось подготовить {statement.name}: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {name: s.calls for name, s in self._statements.items()}
+
+
+statements = StatementRegistry()
@@ -0,0 +1,286 @@
+"""
+Обработка апдейтов в нескольких процессах (BOT_WORKERS > 1).
+
+Один процесс-приёмник получает апдейты (long polling или webhook) и, не разбирая
+их дальше ключа, раскладывает по воркерам: номер воркера = chat_id % N.
+Все апдейты одного чата попадают в один процесс, поэтому порядок внутри чата
+сохраняется, а FSM в памяти остаётся согласованным. Каждый воркер — обычный
+Dispatcher со своим Bot, пулом БД и FSM-хранилищем; порядок апдейтов одного
+чата внутри воркера держит ConcurrencyLimitMiddleware.
+
+Что остаётся на процесс:
+- кэш страниц каталога (services/catalog_cache.py) у каждого воркера свой;
+  инвалидация после записи видна только в одном процессе, остальные
+  обновятся по max_age;
+- пул соединений: в БД уходит до BOT_WORKERS * DB_POOL_SIZE соединений;
+- ограничение скорости отправки: лимит Bot API общий на бота, поэтому
+  каждый воркер отправляет не быстрее NOTIFY_RATE / BOT_WORKERS. Рассылку
+  выполняет тот воркер, что захватил задание, — в своей доле лимита.
+
+Миграции и фоновая сверка рейтингов выполняются только в приёмнике;
+рассылок приёмник не выполняет и сообщений не отправляет.
+"""
+from typing import Any, Callable, Dict, List, Optional, Set
+import asyncio
+import logging
+import multiprocessing
+import signal
+
+import aiohttp
+from aiogram.client.session.base import BaseSession
+
+from app import build_dispatcher, create_bot, create_storage, setup_database
+from config import Config
+from db.slow_queries import slow_query_tracer
+from metrics import start_metrics_server
+from notifier import NOTIFY_RATE
+from services.reviews_service import rating_reconciliation_loop
+from webhook import dispatcher_feeder, run_webhook, wait_for_stop_signal
+
+logger = logging.getLogger(__name__)
+
+POLLING_TIMEOUT = 30  # секунды long polling в getUpdates
+
+# Фабрика сессии Bot для воркера (в бенчмарке — фейковый Telegram).
+# Должна импортироваться по имени: воркеры запускаются через spawn.
+SessionFactory = Callable[[], BaseSession]
+
+
+def shard_key(raw: Dict[str, Any]) -> int:
+    """
+    Ключ шардирования: id чата апдейта, иначе id пользователя, иначе update_id.
+    """
+    for payload in raw.values():
+        if not isinstance(payload, dict):
+            continue
+        chat = payload.get("chat")
+        if chat is None and isinstance(payload.get("message"), dict):
+            # callback_query: чат сообщения с кнопкой
+            chat = payload["message"].get("chat")
+        if isinstance(chat, dict) and "id" in chat:
+            return int(chat["id"])
+        for user_field in ("from", "user"):
+            user = payload.get(user_field)
+            if isinstance(user, dict) and "id" in user:
+                return int(user["id"])
+    return int(raw.get("update_id", 0))
+
+
+async def _worker_loop(
+    index: int,
+    config: Config,
+    queue: multiprocessing.Queue,
+    ready: Optional[multiprocessing.Queue],
+    session_factory: Optional[SessionFactory],
+) -> None:
+    bot = create_bot(config, session_factory() if session_factory else None)
+    db_pool = await setup_database(config, migrate=False)
+    storage = create_storage(config, db_pool)
+    dp = build_dispatcher(
+        config, db_pool, storage, send_rate=NOTIFY_RATE / config.bot.workers
+    )
+    feed = dispatcher_feeder(bot, dp)
+    # Приёмник слушает METRICS_PORT, воркер i — METRICS_PORT + 1 + i.
+    metrics_port = config.metrics.port + 1 + index if config.metrics.port else 0
+    metrics_runner = await start_metrics_server(config.metrics.host, metrics_port)
+    tasks: Set[asyncio.Task] = set()
+    loop = asyncio.get_running_loop()
+
+    async def process(raw: Dict[str, Any]) -> None:
+        try:
+            await feed(raw)
+        except Exception:
+            logger.exception(f"Воркер {index}: ошибка обработки апдейта {raw.get('update_id')}")
+
+    await dp.emit_startup(bot=bot)
+    if ready is not None:
+        ready.put(index)
+    logger.info(f"Воркер {index} запущен")
+    try:
+        while True:
+            raw = await loop.run_in_executor(None, queue.get)
+            if raw is None:
+                break
+            task = asyncio.create_task(process(raw))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        await dp.emit_shutdown(bot=bot)
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await storage.close()
+        await slow_query_tracer.close()
+        await db_pool.close()
+        await bot.session.close()
+        logger.info(f"Воркер {index} остановлен")
+
+
+def worker_main(
+    index: int,
+    config: Config,
+    queue: multiprocessing.Queue,
+    ready: Optional[multiprocessing.Queue] = None,
+    session_factory: Optional[SessionFactory] = None,
+) -> None:
+    """
+    Точка входа процесса-воркера. Останавливается по None в очереди;
+    Ctrl+C получает приёмник и сам рассылает остановку.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    asyncio.run(_worker_loop(index, config, queue, ready, session_factory))
+
+
+class WorkerPool:
+    """
+    N процессов-воркеров с очередью на каждый; submit кладёт апдейт в очередь
+    воркера по shard_key.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        workers: int,
+        session_factory: Optional[SessionFactory] = None,
+    ):
+        self.config = config
+        self.workers = workers
+        self.session_factory = session_factory
+        self._ctx = multiprocessing.get_context("spawn")
+        self._queues: List[multiprocessing.Queue] = []
+        self._processes: List[multiprocessing.Process] = []
+        self.submitted = 0
+
+    async def start(self) -> None:
+        """
+        Запустить воркеры и дождаться, пока каждый поднимет пул и диспетчер.
+        """
+        ready = self._ctx.Queue()
+        for index in range(self.workers):
+            queue = self._ctx.Queue()
+            process = self._ctx.Process(
+                target=worker_main,
+                args=(index, self.config, queue, ready, self.session_factory),
+                name=f"worker-{index}",
+                daemon=True,
+            )
+            process.start()
+            self._queues.append(queue)
+            self._processes.append(process)
+
+        loop = asyncio.get_running_loop()
+        for _ in range(self.workers):
+            await loop.run_in_executor(None, ready.get)
+        logger.info(f"Запущено воркеров: {self.workers}")
+
+    def submit(self, raw: Dict[str, Any]) -> None:
+        index = shard_key(raw) % self.workers
+        if not self._processes[index].is_alive():
+            logger.error(f"Воркер {index} не работает, апдейт {raw.get('update_id')} потерян")
+            return
+        self._queues[index].put(raw)
+        self.submitted += 1
+
+    async def feed(self, raw: Dict[str, Any]) -> None:
+        """
+        UpdateFeeder для webhook.create_webhook_app.
+        """
+        self.submit(raw)
+
+    async def stop(self) -> None:
+        """
+        Дождаться обработки уже отправленных апдейтов и остановить воркеры.
+        """
+        for queue in self._queues:
+            queue.put(None)
+        loop = asyncio.get_running_loop()
+        for process in self._processes:
+            await loop.run_in_executor(None, process.join)
+        self._queues.clear()
+        self._processes.clear()
+
+
+async def poll_raw_updates(config: Config, workers: WorkerPool, allowed_updates: List[str]) -> None:
+    """
+    Long polling без разбора апдейтов в модели aiogram: JSON из getUpdates
+    сразу уходит воркерам.
+    """
+    bot = create_bot(config)
+    url = bot.session.api.api_url(token=config.bot.token, method="getUpdates")
+    await bot.session.close()
+
+    offset = 0
+    backoff = 1
+    timeout = aiohttp.ClientTimeout(total=POLLING_TIMEOUT + 10)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        while True:
+            try:
+                async with session.post(
+                    url,
+                    json={
+                        "offset": offset,
+                        "timeout": POLLING_TIMEOUT,
+                        "allowed_updates": allowed_updates,
+                    },
+                ) as response:
+                    payload = await response.json()
+                if not payload.get("ok"):
+                    raise RuntimeError(payload.get("description"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка getUpdates: {e}; повтор через {backoff} с")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+                continue
+
+            backoff = 1
+            for raw in payload["result"]:
+                workers.submit(raw)
+                offset = raw["update_id"] + 1
+
+
+async def run_sharded(config: Config) -> None:
+    """
+    Приёмник: накатывает миграции, запускает воркеры и раздаёт им апдейты
+    до сигнала остановки.
+    """
+    db_pool = await setup_database(config)
+    bot = create_bot(config)
+    # Диспетчер приёмника ничего не обрабатывает: нужен для allowed_updates
+    # и хуков startup/shutdown в run_webhook. Рассылку ведут воркеры.
+    storage = create_storage(config, db_pool)
+    dp = build_dispatcher(config, db_pool, storage, run_broadcasts=False)
+    workers = WorkerPool(config, config.bot.workers)
+    await workers.start()
+    metrics_runner = await start_metrics_server(config.metrics.host, config.metrics.port)
+
+    reconcile_task = asyncio.create_task(rating_reconciliation_loop(db_pool))
+    try:
+        if config.webhook.mode == "webhook":
+            await run_webhook(bot, dp, config.webhook, db_pool, feed=workers.feed)
+        else:
+            polling = asyncio.create_task(
+                poll_raw_updates(config, workers, dp.resolve_used_update_types())
+            )
+            try:
+                await wait_for_stop_signal()
+            finally:
+                polling.cancel()
+                await asyncio.gather(polling, return_exceptions=True)
+    finally:
+        reconcile_task.cancel()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await workers.stop()
+        await storage.close()
+        await slow_query_tracer.close()
+        await db_pool.close()
+        await bot.session.close()
+        logger.info("Бот остановлен")
@@ -0,0 +1,168 @@
+"""
+FSM-хранилище в памяти с ограниченным размером для одного процесса.
+
+В отличие от MemoryStorage aiogram, брошенные диалоги не живут вечно:
+у каждого ключа есть TTL (продлевается при любом обращении), общее число
+ключей ограничено (самые давно не использованные вытесняются), а фоновая
+очистка удаляет истёкшие записи. live_dialogs и approx_bytes показывают,
+сколько диалогов и данных сейчас в памяти.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import asyncio
+import copy
+import json
+import logging
+import time
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+logger = logging.getLogger(__name__)
+
+
+class _Record:
+    __slots__ = ("state", "data", "expires_at", "size")
+
+    def __init__(self):
+        self.state: Optional[str] = None
+        self.data: Dict[str, Any] = {}
+        self.expires_at = 0.0
+        self.size = 0
+
+
+def _estimate_size(state: Optional[str], data: Dict[str, Any]) -> int:
+    try:
+        data_size = len(json.dumps(data, ensure_ascii=False, default=str).encode())
+    except (TypeError, ValueError):
+        data_size = len(repr(data))
+    return data_size + len(state or "")
+
+
+class TTLMemoryStorage(BaseStorage):
+    def __init__(
+        self,
+        ttl: float = 86400.0,
+        max_entries: int = 100_000,
+        sweep_interval: float = 60.0,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        # Порядок = порядок последнего обращения, а значит и истечения TTL.
+        self._records: "OrderedDict[StorageKey, _Record]" = OrderedDict()
+        self._bytes = 0
+        self._sweeper: Optional[asyncio.Task] = None
+        self.expired = 0
+        self.evicted = 0
+
+    @property
+    def live_dialogs(self) -> int:
+        return len(self._records)
+
+    @property
+    def approx_bytes(self) -> int:
+        return self._bytes
+
+    def start(self) -> None:
+        """
+        Запустить фоновую очистку истёкших диалогов.
+        """
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    def _get(self, key: StorageKey) -> Optional[_Record]:
+        record = self._records.get(key)
+        if record is None:
+            return None
+        now = time.monotonic()
+        if record.expires_at <= now:
+            self._remove(key)
+            self.expired += 1
+            return None
+        record.expires_at = now + self.ttl
+        self._records.move_to_end(key)
+        return record
+
+    def _get_or_create(self, key: StorageKey) -> _Record:
+        record = self._get(key)
+        if record is None:
+            record = _Record()
+            record.expires_at = time.monotonic() + self.ttl
+            self._records[key] = record
+            while len(self._records) > self.max_entries:
+                oldest = next(iter(self._records))
+                self._remove(oldest)
+                self.evicted += 1
+        return record
+
+    def _remove(self, key: StorageKey) -> None:
+        record = self._records.pop(key, None)
+        if record is not None:
+            self._bytes -= record.size
+
+    def _store(self, key: StorageKey, record: _Record) -> None:
+        if record.state is None and not record.data:
+            # Диалог завершён (state.clear()) — ключ больше не нужен.
+            self._remove(key)
+            return
+        size = _estimate_size(record.state, record.data)
+        self._bytes += size - record.size
+        record.size = size
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = self._get_or_create(key)
+        record.state = state.state if isinstance(state, State) else state
+        self._store(key, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = self._get(key)
+        return record.state if record else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = self._get_or_create(key)
+        record.data = copy.deepcopy(data)
+        self._store(key, record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = self._get(key)
+        return copy.deepcopy(record.data) if record else {}
+
+    def sweep(self) -> int:
+        """
+        Удалить истёкшие записи. Идём с начала: там самые старые обращения.
+        """
+        now = time.monotonic()
+        removed = 0
+        while self._records:
+            key, record = next(iter(self._records.items()))
+            if record.expires_at > now:
+                break
+            self._remove(key)
+            removed += 1
+        self.expired += removed
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "live_dialogs": self.live_dialogs,
+            "approx_bytes": self.approx_bytes,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            removed = self.sweep()
+            if removed:
+                logger.info(
+                    f"Очистка FSM: удалено {removed}, активных диалогов {self.live_dialogs}"
+                )
+
+    async def close(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        self._records.clear()
+        self._bytes = 0
@@ -0,0 +1,265 @@
+"""
+FSM-хранилище aiogram поверх пула asyncpg.
+
+Переживает перезапуск бота и позволяет запускать несколько процессов.
+Записи одного апдейта (update_data, set_state, ...) копятся в памяти
+и сбрасываются в БД одним UPSERT: явно через flush() в конце апдейта
+(см. FSMFlushMiddleware) или по таймеру flush_delay, если flush не вызвали.
+Запись остаётся в памяти, пока UPSERT не закоммичен, так что апдейт,
+который ещё идёт, не перечитает из БД устаревшее состояние.
+Внутри апдейта чтение и запись идут через его ConnectionScope
+(db.db.current_scope) — лишнего соединения из пула FSM не берёт.
+Данные сериализуются в JSON уже в set_data: ошибка сериализации
+достаётся хендлеру, а не фоновой записи.
+Брошенные диалоги живут ttl секунд и удаляются фоновой очисткой.
+"""
+from typing import Any, Dict, Optional, Set
+import asyncio
+import copy
+import json
+import logging
+
+import asyncpg
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from db.db import Executor, acquire, current_scope
+
+logger = logging.getLogger(__name__)
+
+_KEY_WHERE = """
+    bot_id = $1 AND chat_id = $2 AND user_id = $3
+    AND thread_id = $4 AND business_connection_id = $5 AND destiny = $6
+"""
+
+
+class _Entry:
+    __slots__ = ("state", "data", "payload", "dirty", "flush_handle", "lock")
+
+    def __init__(self, state: Optional[str], data: Dict[str, Any], payload: str):
+        self.state = state
+        self.data = data
+        # data в JSON — в том виде, в каком уйдёт в БД
+        self.payload = payload
+        self.dirty = False
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+        # Записи одного ключа идут по очереди: таймер и flush в конце апдейта
+        self.lock = asyncio.Lock()
+
+
+class PostgresStorage(BaseStorage):
+    def __init__(
+        self,
+        pool: asyncpg.pool.Pool,
+        ttl: float = 86400.0,
+        flush_delay: float = 1.0,
+        sweep_interval: float = 3600.0,
+    ):
+        self.pool = pool
+        self.ttl = ttl
+        self.flush_delay = flush_delay
+        self.sweep_interval = sweep_interval
+        self._entries: Dict[StorageKey, _Entry] = {}
+        self._loading: Dict[StorageKey, asyncio.Future] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._sweeper: Optional[asyncio.Task] = None
+        self.loads = 0
+        self.flushes = 0
+
+    @staticmethod
+    def _key_args(key: StorageKey) -> tuple:
+        return (
+            key.bot_id,
+            key.chat_id,
+            key.user_id,
+            key.thread_id or 0,
+            key.business_connection_id or "",
+            key.destiny,
+        )
+
+    def _executor(self) -> Executor:
+        # Внутри апдейта — соединение хендлера, вне его — пул
+        return current_scope.get() or self.pool
+
+    def start(self) -> None:
+        """
+        Запустить фоновую очистку истёкших диалогов.
+        """
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def _entry(self, key: StorageKey) -> _Entry:
+        """
+        Запись для ключа: из буфера текущего апдейта или из БД (один SELECT).
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry
+
+        # Параллельные обращения к одному ключу ждут одну загрузку.
+        loading = self._loading.get(key)
+        if loading is not None:
+            return await asyncio.shield(loading)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            async with acquire(self._executor()) as conn:
+                row = await conn.fetchrow(
+                    f"""
+                    SELECT state, data FROM fsm_storage
+                    WHERE {_KEY_WHERE} AND expires_at > NOW();
+                    """,
+                    *self._key_args(key),
+                )
+            self.loads += 1
+            if row:
+                entry = _Entry(row["state"], json.loads(row["data"]), row["data"])
+            else:
+                entry = _Entry(None, {}, "{}")
+            entry = self._entries.setdefault(key, entry)
+            future.set_result(entry)
+            return entry
+        except BaseException as e:
+            future.set_exception(e)
+            # Исключение уже передано ожидающим, само future никто не читает.
+            future.exception()
+            raise
+        finally:
+            del self._loading[key]
+
+    def _mark_dirty(self, key: StorageKey, entry: _Entry) -> None:
+        entry.dirty = True
+        if entry.flush_handle is None:
+            entry.flush_handle = asyncio.get_running_loop().call_later(
+                self.flush_delay, self._spawn_flush, key
+            )
+
+    def _spawn_flush(self, key: StorageKey) -> None:
+        task = asyncio.create_task(self._flush_logged(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush_logged(self, key: StorageKey) -> None:
+        try:
+            # Таймер срабатывает в контексте апдейта, но его соединение
+            # занято хендлером — пишем через пул.
+            await self.flush(key, self.pool)
+        except Exception as e:
+            logger.error(f"Не удалось сохранить состояние FSM: {e}")
+
+    async def flush(self, key: StorageKey, executor: Optional[Executor] = None) -> None:
+        """
+        Записать накопленные изменения ключа одним запросом и выгрузить его из памяти.
+        Запись выгружается только после коммита и только если за время записи
+        её не изменили снова.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        async with entry.lock:
+            if entry.flush_handle is not None:
+                entry.flush_handle.cancel()
+                entry.flush_handle = None
+            if entry.dirty:
+                entry.dirty = False
+                try:
+                    await self._write(key, entry.state, entry.payload, executor or self._executor())
+                except Exception:
+                    # Изменения остаются в буфере; повторит следующий flush или таймер.
+                    self._mark_dirty(key, entry)
+                    raise
+                self.flushes += 1
+            if not entry.dirty and self._entries.get(key) is entry:
+                del self._entries[key]
+
+    async def _write(
+        self,
+        key: StorageKey,
+        state: Optional[str],
+        payload: str,
+        executor: Executor,
+    ) -> None:
+        async with acquire(executor) as conn:
+            if state is None and payload == "{}":
+                await conn.execute(
+                    f"DELETE FROM fsm_storage WHERE {_KEY_WHERE};",
+                    *self._key_args(key),
+                )
+            else:
+                await conn.execute(
+                    """
+                    INSERT INTO fsm_storage (
+                        bot_id, chat_id, user_id, thread_id,
+                        business_connection_id, destiny,
+                        state, data, expires_at
+                    )
+                    VALUES (
+                        $1, $2, $3, $4, $5, $6, $7, $8::jsonb,
+                        NOW() + $9 * INTERVAL '1 second'
+                    )
+                    ON CONFLICT (
+                        bot_id, chat_id, user_id, thread_id,
+                        business_connection_id, destiny
+                    ) DO UPDATE
+                      SET state = EXCLUDED.state,
+                          data = EXCLUDED.data,
+                          expires_at = EXCLUDED.expires_at;
+                    """,
+                    *self._key_args(key),
+                    state,
+                    payload,
+                    float(self.ttl),
+                )
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        entry = await self._entry(key)
+        entry.state = state.state if isinstance(state, State) else state
+        self._mark_dirty(key, entry)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        entry = await self._entry(key)
+        return entry.state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        # TypeError на несериализуемых данных — здесь, у вызывающего
+        payload = json.dumps(data, ensure_ascii=False)
+        entry = await self._entry(key)
+        entry.data = copy.deepcopy(data)
+        entry.payload = payload
+        self._mark_dirty(key, entry)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        entry = await self._entry(key)
+        return copy.deepcopy(entry.data)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "buffered": len(self._entries),
+            "loads": self.loads,
+            "flushes": self.flushes,
+        }
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                async with self.pool.acquire() as conn:
+                    result = await conn.execute(
+                        "DELETE FROM fsm_storage WHERE expires_at <= NOW();"
+                    )
+                logger.info(f"Очистка FSM-хранилища: {result}")
+            except Exception as e:
+                logger.error(f"Ошибка очистки FSM-хранилища: {e}")
+
+    async def close(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        for key in list(self._entries):
+            try:
+                await self.flush(key)
+            except Exception as e:
+                logger.error(f"Не удалось сохранить состояние FSM при остановке: {e}")
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,27 @@
+"""
+Общие фикстуры. Роутеры handlers/* — модульные объекты и подключаются
+к диспетчеру один раз, поэтому диспетчер собирается один на весь прогон.
+"""
+import pytest
+
+
+@pytest.fixture(scope="session")
+def config():
+    pytest.importorskip("aiogram")
+    pytest.importorskip("asyncpg")
+    from config import load_config
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("BOT_TOKEN", "42:TEST")
+        mp.setenv("FSM_STORAGE", "memory")
+        mp.setenv("RECORD_UPDATES", "")
+        return load_config()
+
+
+@pytest.fixture(scope="session")
+def dispatcher(config):
+    from app import build_dispatcher, create_storage
+
+    # Пул при сборке только сохраняется в middleware и фоновых сервисах
+    db_pool = object()
+    return build_dispatcher(config, db_pool, create_storage(config, db_pool))
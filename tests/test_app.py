@@ -0,0 +1,18 @@
+"""
+Смоук-тест сборки бота: build_dispatcher со всеми middleware, роутерами
+и подключением stats() к /metrics — без БД и сети.
+"""
+import pytest
+
+pytest.importorskip("aiogram")
+pytest.importorskip("asyncpg")
+
+
+def test_build_dispatcher(dispatcher):
+    from metrics import registry
+
+    assert "notifier" in dispatcher.workflow_data
+    assert "broadcaster" in dispatcher.workflow_data
+    text = registry.render()
+    assert "masters_bot_update_queue_in_flight" in text
+    assert "masters_bot_user_registry_pending" in text
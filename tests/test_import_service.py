@@ -0,0 +1,67 @@
+"""
+Проверка строк импорта: validate_master / validate_review.
+"""
+import pytest
+
+pytest.importorskip("asyncpg")
+
+
+def test_valid_master_row():
+    from services.import_service import validate_master
+
+    row = {
+        "telegram_id": "5000000000",
+        "name": " Иван ",
+        "username": "@ivan",
+        "category": "Сантехника",
+        "price_min": "500",
+        "price_max": "",
+    }
+    assert validate_master(row, "approved") == (
+        5000000000, "Иван", "ivan", None, "Сантехника", None, 500, None, "approved",
+    )
+
+
+@pytest.mark.parametrize(
+    "row, message",
+    [
+        ({"name": " ", "category": "Ремонт"}, "name"),
+        ({"name": "Иван", "category": "Ремонт", "price_min": "10", "price_max": "5"}, "price_min"),
+        ({"name": "Иван", "category": "Ремонт", "price_min": "-1"}, "отрицательной"),
+        ({"name": "Иван", "category": "Ремонт", "price_min": "3000000000"}, "диапазона"),
+        ({"name": "Иван", "category": "Ремонт", "telegram_id": "1" * 20}, "диапазона"),
+        ({"name": "Ив\x00ан", "category": "Ремонт"}, "недопустимый символ"),
+        ({"name": "Иван", "category": "Ремонт", "description": "x" * 5000}, "длиннее"),
+        ({"name": "Иван", "category": "Ремонт", "status": "deleted"}, "status"),
+        (["Иван", "Ремонт"], "объект"),
+    ],
+)
+def test_invalid_master_row(row, message):
+    from services.import_service import validate_master
+
+    with pytest.raises(ValueError, match=message):
+        validate_master(row, "approved")
+
+
+def test_valid_review_row():
+    from services.import_service import validate_review
+
+    row = {"master_id": "3", "user_id": 5000000000, "rating": "5", "text": "Отлично"}
+    assert validate_review(row) == (3, 5000000000, None, 5, "Отлично")
+
+
+@pytest.mark.parametrize(
+    "row, message",
+    [
+        ({"user_id": "1", "rating": "5"}, "master_id"),
+        ({"master_id": "1", "rating": "5"}, "user_id"),
+        ({"master_id": "1", "user_id": "1", "rating": "6"}, "rating"),
+        ({"master_id": "1", "user_id": "1", "rating": "пять"}, "целое"),
+        ("1,1,5", "объект"),
+    ],
+)
+def test_invalid_review_row(row, message):
+    from services.import_service import validate_review
+
+    with pytest.raises(ValueError, match=message):
+        validate_review(row)
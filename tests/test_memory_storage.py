@@ -0,0 +1,91 @@
+"""
+TTLMemoryStorage: истечение TTL, вытеснение давно не использованных диалогов и учёт памяти.
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiogram")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _key(chat_id):
+    from aiogram.fsm.storage.base import StorageKey
+
+    return StorageKey(bot_id=1, chat_id=chat_id, user_id=chat_id)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    import storage.memory
+
+    clock = Clock()
+    monkeypatch.setattr(storage.memory.time, "monotonic", clock)
+    return clock
+
+
+def test_dialog_expires_after_ttl_and_access_extends_it(clock):
+    from storage.memory import TTLMemoryStorage
+
+    async def scenario():
+        storage = TTLMemoryStorage(ttl=10.0)
+        await storage.set_state(_key(1), "Form:name")
+        clock.now += 8
+        # Обращение продлевает TTL
+        assert await storage.get_state(_key(1)) == "Form:name"
+        clock.now += 8
+        assert await storage.get_state(_key(1)) == "Form:name"
+        clock.now += 11
+        assert await storage.get_state(_key(1)) is None
+        assert await storage.get_data(_key(1)) == {}
+        return storage.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["expired"] == 1
+    assert stats["live_dialogs"] == 0
+
+
+def test_least_recently_used_dialog_is_evicted(clock):
+    from storage.memory import TTLMemoryStorage
+
+    async def scenario():
+        storage = TTLMemoryStorage(max_entries=2)
+        await storage.set_data(_key(1), {"a": 1})
+        await storage.set_data(_key(2), {"b": 2})
+        await storage.get_data(_key(1))
+        await storage.set_data(_key(3), {"c": 3})
+        assert await storage.get_data(_key(2)) == {}
+        assert await storage.get_data(_key(1)) == {"a": 1}
+        return storage.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["evicted"] == 1
+    assert stats["live_dialogs"] == 2
+
+
+def test_sweep_and_clear_release_bytes(clock):
+    from storage.memory import TTLMemoryStorage
+
+    async def scenario():
+        storage = TTLMemoryStorage(ttl=10.0)
+        await storage.set_data(_key(1), {"text": "x" * 100})
+        await storage.set_state(_key(2), "Form:name")
+        assert storage.approx_bytes > 100
+        # Завершённый диалог (state.clear()) ключ не держит
+        await storage.set_data(_key(2), {})
+        await storage.set_state(_key(2), None)
+        assert storage.live_dialogs == 1
+        clock.now += 11
+        assert storage.sweep() == 1
+        return storage
+
+    storage = asyncio.run(scenario())
+    assert storage.live_dialogs == 0
+    assert storage.approx_bytes == 0
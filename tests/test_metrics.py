@@ -0,0 +1,67 @@
+"""
+Текстовый формат Prometheus: счётчики, гистограммы и stats().
+"""
+import pytest
+
+pytest.importorskip("aiogram")
+pytest.importorskip("asyncpg")
+
+
+def test_counter_and_gauge_render_labels():
+    from metrics import Registry
+
+    registry = Registry()
+    errors = registry.counter("errors_total", "Ошибки", ("handler",))
+    errors.inc(handler='say "hi"\n')
+    errors.inc(2, handler='say "hi"\n')
+    registry.gauge("pool_size", "Соединений").set(1.5)
+
+    assert registry.render().splitlines() == [
+        "# HELP masters_bot_errors_total Ошибки",
+        "# TYPE masters_bot_errors_total counter",
+        'masters_bot_errors_total{handler="say \\"hi\\"\\n"} 3',
+        "# HELP masters_bot_pool_size Соединений",
+        "# TYPE masters_bot_pool_size gauge",
+        "masters_bot_pool_size 1.5",
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    from metrics import Registry
+
+    registry = Registry()
+    seconds = registry.histogram("seconds", "Время", ("service",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 7.0):
+        seconds.observe(value, service="catalog")
+
+    lines = registry.render().splitlines()
+    assert lines[2:] == [
+        'masters_bot_seconds_bucket{service="catalog",le="0.1"} 1',
+        'masters_bot_seconds_bucket{service="catalog",le="1"} 3',
+        'masters_bot_seconds_bucket{service="catalog",le="+Inf"} 4',
+        'masters_bot_seconds_sum{service="catalog"} 8.05',
+        'masters_bot_seconds_count{service="catalog"} 4',
+    ]
+
+
+def test_stats_collector_and_failing_collector():
+    from metrics import Registry
+
+    registry = Registry()
+    registry.add_stats(
+        "cache",
+        lambda: {"hits": 4, "enabled": True, "name": "x", "by_kind": {"page": 3, "card": 1}},
+        label="kind",
+    )
+
+    def broken():
+        raise RuntimeError("boom")
+
+    registry.add_collector(broken)
+    assert registry.render().splitlines() == [
+        "# TYPE masters_bot_cache_hits gauge",
+        "masters_bot_cache_hits 4",
+        "# TYPE masters_bot_cache_by_kind gauge",
+        'masters_bot_cache_by_kind{kind="page"} 3',
+        'masters_bot_cache_by_kind{kind="card"} 1',
+    ]
@@ -0,0 +1,77 @@
+"""
+PostgresStorage: буфер записей апдейта и его сброс — на поддельном пуле.
+"""
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+import pytest
+
+pytest.importorskip("aiogram")
+pytest.importorskip("asyncpg")
+
+
+class FakePool:
+    """
+    Одна строка fsm_storage в памяти; запись занимает write_delay секунд.
+    """
+
+    def __init__(self, write_delay: float = 0.0):
+        self.write_delay = write_delay
+        self.row = None
+        self.loads = 0
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    async def fetchrow(self, sql, *args):
+        self.loads += 1
+        return self.row
+
+    async def execute(self, sql, *args):
+        await asyncio.sleep(self.write_delay)
+        if sql.lstrip().startswith("DELETE"):
+            self.row = None
+        else:
+            self.row = {"state": args[6], "data": args[7]}
+
+
+def _key():
+    from aiogram.fsm.storage.base import StorageKey
+
+    return StorageKey(bot_id=1, chat_id=2, user_id=2)
+
+
+def test_timer_flush_keeps_entry_until_commit():
+    from storage.postgres import PostgresStorage
+
+    async def scenario():
+        pool = FakePool(write_delay=0.05)
+        storage = PostgresStorage(pool, flush_delay=0.01)
+        key = _key()
+        await storage.set_data(key, {"step": 1})
+        # Таймер начал запись, а апдейт ещё идёт
+        await asyncio.sleep(0.02)
+        assert await storage.get_data(key) == {"step": 1}
+        await storage.set_data(key, {"step": 2})
+        await storage.flush(key)
+        await storage.close()
+        return pool
+
+    pool = asyncio.run(scenario())
+    assert pool.loads == 1
+    assert json.loads(pool.row["data"]) == {"step": 2}
+
+
+def test_set_data_rejects_non_json():
+    from storage.postgres import PostgresStorage
+
+    async def scenario():
+        storage = PostgresStorage(FakePool())
+        with pytest.raises(TypeError):
+            await storage.set_data(_key(), {"when": object()})
+        assert storage.stats()["buffered"] == 0
+        await storage.close()
+
+    asyncio.run(scenario())
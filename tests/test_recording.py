@@ -0,0 +1,78 @@
+"""
+Запись апдейтов: обезличивание и чтение файла записи.
+"""
+import gzip
+
+import pytest
+
+pytest.importorskip("aiogram")
+
+
+def test_truncated_tail_is_skipped(tmp_path):
+    from recording import UpdateRecorder, read_recording
+
+    path = str(tmp_path / "updates.jsonl.gz")
+    recorder = UpdateRecorder(path, flush_records=2)
+    for update_id in range(5):
+        recorder.write({"update_id": update_id})
+    recorder.close()
+    # Процесс упал посреди следующего member: на диске только его начало
+    member = gzip.compress(b'{"t":1,"u":{"update_id":5}}\n' * 50)
+    with open(path, "ab") as f:
+        f.write(member[: len(member) // 2])
+
+    assert [u["update_id"] for _, u in read_recording(path)] == [0, 1, 2, 3, 4]
+
+
+def test_ids_are_hashed_consistently_within_recording():
+    from recording import Anonymizer
+
+    anonymize = Anonymizer(salt=b"s" * 16)
+    raw = {
+        "update_id": 10,
+        "message": {
+            "message_id": 3,
+            "from": {"id": 7, "first_name": "Иван", "username": "ivan"},
+            "chat": {"id": 7, "type": "private", "first_name": "Иван"},
+            "contact": {"phone_number": "+79990000000"},
+        },
+    }
+    message = anonymize(raw)["message"]
+    assert message["from"]["id"] == message["chat"]["id"] != 7
+    assert message["from"]["id"] == anonymize.anon_id(7)
+    assert message["from"]["first_name"] == message["from"]["username"] == "anon"
+    assert "contact" not in message
+    # update_id и message_id — не идентификаторы людей
+    assert message["message_id"] == 3
+    # У групп id остаётся отрицательным; другая соль — другой id
+    assert anonymize.anon_id(-100) < 0
+    assert Anonymizer(salt=b"t" * 16).anon_id(7) != anonymize.anon_id(7)
+
+
+def test_free_text_is_masked_but_routing_text_kept():
+    from recording import Anonymizer
+
+    anonymize = Anonymizer()
+    texts = ["/start", "#15", "Каталог мастеров", "да", "1500 3000", "Течёт кран"]
+    masked = [anonymize({"text": text})["text"] for text in texts]
+    assert masked == ["/start", "#15", "Каталог мастеров", "да", "1500 3000", "x" * 10]
+
+
+def test_entities_are_anonymized():
+    from recording import Anonymizer
+
+    anonymize = Anonymizer()
+    message = anonymize({
+        "text": "Иван сайт",
+        "entities": [
+            {
+                "type": "text_mention", "offset": 0, "length": 4,
+                "user": {"id": 7, "first_name": "Иван"},
+            },
+            {"type": "text_link", "offset": 5, "length": 4, "url": "https://secret.example/"},
+        ],
+    })
+    mention, link = message["entities"]
+    assert mention["user"] == {"id": anonymize.anon_id(7), "first_name": "anon"}
+    assert (mention["offset"], mention["length"]) == (0, 4)
+    assert link["url"] == "https://example.invalid/"
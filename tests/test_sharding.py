@@ -0,0 +1,44 @@
+"""
+shard_key: все апдейты одного чата попадают в один воркер.
+"""
+import pytest
+
+pytest.importorskip("aiogram")
+pytest.importorskip("asyncpg")
+
+
+def test_message_uses_chat_id():
+    from sharding import shard_key
+
+    raw = {"update_id": 1, "message": {"chat": {"id": -100}, "from": {"id": 7}}}
+    assert shard_key(raw) == -100
+
+
+def test_callback_query_uses_chat_of_message():
+    from sharding import shard_key
+
+    raw = {
+        "update_id": 2,
+        "callback_query": {"from": {"id": 7}, "message": {"chat": {"id": 42}}},
+    }
+    assert shard_key(raw) == 42
+
+
+def test_inline_query_falls_back_to_user():
+    from sharding import shard_key
+
+    raw = {"update_id": 3, "inline_query": {"from": {"id": 7}, "query": ""}}
+    assert shard_key(raw) == 7
+
+
+def test_my_chat_member_uses_chat_id():
+    from sharding import shard_key
+
+    raw = {"update_id": 4, "my_chat_member": {"chat": {"id": 7}, "from": {"id": 7}}}
+    assert shard_key(raw) == 7
+
+
+def test_unknown_update_uses_update_id():
+    from sharding import shard_key
+
+    assert shard_key({"update_id": 5, "poll": {"id": "p"}}) == 5
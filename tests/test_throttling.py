@@ -0,0 +1,56 @@
+"""
+ThrottlingMiddleware: token bucket по (пользователь, группа) и удаление простаивающих корзин.
+"""
+import pytest
+
+pytest.importorskip("aiogram")
+pytest.importorskip("asyncpg")
+
+
+def _middleware():
+    from middleware import ThrottlingMiddleware
+
+    return ThrottlingMiddleware({"default": (1.0, 2.0), "search": (0.5, 1.0)})
+
+
+def test_burst_then_throttled_until_refill():
+    throttling = _middleware()
+    key = (1, "default")
+    assert throttling._take(key, 0.0)
+    assert throttling._take(key, 0.0)
+    assert not throttling._take(key, 0.0)
+    # 1 токен в секунду: через полсекунды ещё нет, через секунду — есть
+    assert not throttling._take(key, 0.5)
+    assert throttling._take(key, 1.0)
+
+
+def test_groups_and_users_have_separate_buckets():
+    throttling = _middleware()
+    assert throttling._take((1, "search"), 0.0)
+    assert not throttling._take((1, "search"), 0.0)
+    assert throttling._take((1, "default"), 0.0)
+    assert throttling._take((2, "search"), 0.0)
+    # Неизвестная группа живёт по правилам default
+    assert throttling._take((1, "unknown"), 0.0)
+
+
+def test_refill_is_capped_by_burst():
+    throttling = _middleware()
+    key = (1, "default")
+    throttling._take(key, 0.0)
+    # После долгого простоя токенов не больше burst
+    assert throttling._take(key, 100.0)
+    assert throttling._take(key, 100.0)
+    assert not throttling._take(key, 100.0)
+
+
+def test_evict_idle_drops_only_refilled_buckets():
+    throttling = _middleware()
+    # Самая медленная корзина наполняется за max(2 / 1, 1 / 0.5) = 2 с
+    assert throttling.idle_ttl == 2.0
+    throttling._take((1, "default"), 0.0)
+    throttling._take((2, "default"), 1.5)
+    throttling._evict_idle(2.5)
+    assert list(throttling._buckets) == [(2, "default")]
+    throttling._evict_idle(3.5)
+    assert throttling.stats()["buckets"] == 0
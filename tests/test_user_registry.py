@@ -0,0 +1,96 @@
+"""
+UserRegistry: запись только изменившихся пользователей и возврат
+заблокировавших бота в активные.
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiogram")
+pytest.importorskip("asyncpg")
+
+
+def test_returning_user_is_upserted_after_forget(monkeypatch):
+    from aiogram.types import User
+
+    import user_registry
+    from user_registry import UserRegistry
+
+    flushed = []
+
+    async def fake_upsert(pool, telegram_ids, usernames, first_names, last_seen):
+        flushed.append(list(telegram_ids))
+
+    monkeypatch.setattr(user_registry, "upsert_users", fake_upsert)
+
+    async def scenario():
+        registry = UserRegistry(pool=None)
+        user = User(id=1, is_bot=False, first_name="A")
+        registry.seen(user)
+        await registry.flush()
+        # Тот же час, те же данные — писать нечего
+        registry.seen(user)
+        await registry.flush()
+        # Рассылка пометила пользователя неактивным, он вернулся
+        registry.forget([1])
+        registry.seen(user)
+        await registry.close()
+
+    asyncio.run(scenario())
+    assert flushed == [[1], [1]]
+
+
+def _member_update(update_id, old_status, new_status):
+    from aiogram.types import Update
+
+    bot_user = {"id": 42, "is_bot": True, "first_name": "Bot"}
+
+    def member(status):
+        extra = {"until_date": 0} if status == "kicked" else {}
+        return {"status": status, "user": bot_user, **extra}
+
+    return Update.model_validate({
+        "update_id": update_id,
+        "my_chat_member": {
+            "chat": {"id": 7, "type": "private"},
+            "from": {"id": 7, "is_bot": False, "first_name": "A"},
+            "date": 0,
+            "old_chat_member": member(old_status),
+            "new_chat_member": member(new_status),
+        },
+    })
+
+
+def test_block_and_unblock_through_dispatcher(monkeypatch, dispatcher):
+    from aiogram import Bot
+
+    import user_registry
+    from handlers import common
+
+    flushed = []
+    deactivated = []
+
+    async def fake_upsert(pool, telegram_ids, usernames, first_names, last_seen):
+        flushed.append(list(telegram_ids))
+
+    async def fake_deactivate(pool, telegram_ids):
+        deactivated.append(list(telegram_ids))
+
+    monkeypatch.setattr(user_registry, "upsert_users", fake_upsert)
+    monkeypatch.setattr(common, "deactivate_users", fake_deactivate)
+
+    dp = dispatcher
+    # Без хендлера Telegram не присылает my_chat_member вовсе
+    assert "my_chat_member" in dp.resolve_used_update_types()
+
+    async def scenario():
+        bot = Bot("42:TEST")
+        await dp.feed_update(bot, _member_update(1, "member", "kicked"))
+        assert deactivated == [[7]]
+        await dp.feed_update(bot, _member_update(2, "kicked", "member"))
+        await dp.emit_shutdown(bot=bot)
+        await bot.session.close()
+
+    asyncio.run(scenario())
+    # Разблокировка записывается заново и возвращает is_active = TRUE
+    assert flushed == [[7]]
@@ -0,0 +1,62 @@
+"""
+Webhook: проверка секретного заголовка и разбор тела запроса.
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiogram")
+pytest.importorskip("asyncpg")
+
+
+def _post_all(requests):
+    """
+    Отправить запросы (headers, body) в приложение webhook;
+    вернуть коды ответов и апдейты, дошедшие до feed.
+    """
+    from aiohttp.test_utils import TestClient, TestServer
+
+    from config import WebhookConfig
+    from webhook import create_webhook_app
+
+    fed = []
+
+    async def feed(raw):
+        fed.append(raw)
+
+    async def scenario():
+        config = WebhookConfig(
+            mode="webhook", url="", path="/webhook", secret="s3cret", host="127.0.0.1", port=0
+        )
+        app = create_webhook_app(config, feed)
+        async with TestClient(TestServer(app)) as client:
+            statuses = []
+            for headers, body in requests:
+                response = await client.post("/webhook", data=body, headers=headers)
+                statuses.append(response.status)
+            await asyncio.gather(*app["webhook_tasks"])
+        return statuses
+
+    return asyncio.run(scenario()), fed
+
+
+def test_secret_is_required():
+    from webhook import SECRET_HEADER
+
+    body = '{"update_id": 1}'
+    statuses, fed = _post_all([
+        ({}, body),
+        ({SECRET_HEADER: "wrong"}, body),
+        ({SECRET_HEADER: "s3cret"}, body),
+    ])
+    assert statuses == [401, 401, 200]
+    assert fed == [{"update_id": 1}]
+
+
+def test_malformed_body_is_rejected():
+    from webhook import SECRET_HEADER
+
+    headers = {SECRET_HEADER: "s3cret"}
+    statuses, fed = _post_all([(headers, "{not json"), (headers, "[1, 2]")])
+    assert statuses == [400, 400]
+    assert fed == []
@@ -0,0 +1,181 @@
+"""
+Учёт пользователей бота (таблица users) без запроса к БД на каждый апдейт.
+
+UserRegistryMiddleware отмечает автора каждого апдейта в UserRegistry.
+Реестр помнит в памяти последних MAX_TRACKED пользователей вместе с тем,
+что о них уже записано: username, имя и last_seen, огрублённый до
+LAST_SEEN_RESOLUTION. Пока ничего из этого не изменилось, апдейт
+не порождает записи. Изменённые пользователи копятся в буфере и
+сбрасываются одним UPSERT по массивам (unnest) раз в FLUSH_INTERVAL
+секунд или при FLUSH_BATCH накопленных.
+
+После перезапуска реестр пуст, и первый апдейт каждого пользователя снова
+попадает в буфер, но UPSERT не трогает строку, если в ней ничего не поменялось.
+
+Неактивных пользователей (заблокировавших бота) реестр забывает.
+Блокировка и разблокировка приходят апдейтом my_chat_member (его запрашивает
+хендлер handlers/common.bot_blocked), а при шардировании — в тот же воркер,
+что и остальные апдейты этого чата. Разблокировка всегда записывается заново,
+поэтому пользователь снова становится активным, даже в пределах того же часа
+и даже если неактивным его пометила рассылка в другом процессе. Рассылка
+дополнительно сообщает о заблокировавших через forget — это нужно только
+локальному реестру.
+"""
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+import asyncio
+import logging
+import time
+
+import asyncpg
+from aiogram import BaseMiddleware
+from aiogram.enums import ChatMemberStatus, ChatType
+from aiogram.types import TelegramObject, Update, User
+
+from metrics import USER_FLUSH_ERRORS, USER_FLUSH_ROWS, USER_FLUSH_SECONDS
+from services.broadcast_service import upsert_users
+
+logger = logging.getLogger(__name__)
+
+# Точность last_seen_at, секунды: чаще раза в час строку пользователя не переписываем
+LAST_SEEN_RESOLUTION = 3600
+FLUSH_INTERVAL = 5.0
+FLUSH_BATCH = 1000
+# Сколько пользователей помнить в памяти (LRU)
+MAX_TRACKED = 200_000
+
+# username, first_name, начало интервала last_seen (unix-время)
+UserInfo = Tuple[Optional[str], Optional[str], int]
+
+
+class UserRegistry:
+    def __init__(
+        self,
+        pool: asyncpg.pool.Pool,
+        flush_interval: float = FLUSH_INTERVAL,
+        flush_batch: int = FLUSH_BATCH,
+        max_tracked: int = MAX_TRACKED,
+    ):
+        self.pool = pool
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.max_tracked = max_tracked
+        self._known: "OrderedDict[int, UserInfo]" = OrderedDict()
+        self._pending: Dict[int, UserInfo] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._early_flushes: Set[asyncio.Task] = set()
+        self._flush_lock = asyncio.Lock()
+        self.hits = 0
+        self.flushes = 0
+
+    def seen(self, user: User) -> None:
+        """
+        Отметить пользователя. Без обращения к БД: запись, если нужна, уйдёт со сбросом.
+        """
+        now = int(time.time())
+        info = (user.username, user.first_name, now - now % LAST_SEEN_RESOLUTION)
+        known = self._known.get(user.id)
+        if known == info:
+            self._known.move_to_end(user.id)
+            self.hits += 1
+            return
+
+        self._known[user.id] = info
+        self._known.move_to_end(user.id)
+        if len(self._known) > self.max_tracked:
+            self._known.popitem(last=False)
+        self._pending[user.id] = info
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop())
+        if len(self._pending) >= self.flush_batch and not self._flush_lock.locked():
+            task = asyncio.create_task(self.flush())
+            self._early_flushes.add(task)
+            task.add_done_callback(self._early_flushes.discard)
+
+    def forget(self, telegram_ids: Iterable[int]) -> None:
+        """
+        Забыть пользователей, помеченных в БД неактивными: их следующий апдейт
+        попадёт в буфер, и UPSERT вернёт is_active = TRUE.
+        """
+        for telegram_id in telegram_ids:
+            self._known.pop(telegram_id, None)
+            self._pending.pop(telegram_id, None)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            started = time.perf_counter()
+            try:
+                await upsert_users(
+                    self.pool,
+                    list(batch),
+                    [info[0] for info in batch.values()],
+                    [info[1] for info in batch.values()],
+                    [datetime.fromtimestamp(info[2], timezone.utc) for info in batch.values()],
+                )
+            except Exception as e:
+                USER_FLUSH_ERRORS.inc()
+                logger.error(f"Не удалось записать пользователей ({len(batch)}): {e}")
+                # Вернуть в буфер; более свежие данные из нового буфера важнее
+                batch.update(self._pending)
+                self._pending = batch
+                return
+            finally:
+                USER_FLUSH_SECONDS.observe(time.perf_counter() - started)
+            self.flushes += 1
+            USER_FLUSH_ROWS.inc(len(batch))
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tracked": len(self._known),
+            "pending": len(self._pending),
+            "hits": self.hits,
+            "flushes": self.flushes,
+        }
+
+
+class UserRegistryMiddleware(BaseMiddleware):
+    """
+    Outer-middleware на dp.update: отмечает автора апдейта (event_from_user).
+    """
+
+    def __init__(self, user_registry: UserRegistry):
+        self.user_registry = user_registry
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is not None and not user.is_bot:
+            member_update = event.my_chat_member if isinstance(event, Update) else None
+            if member_update is not None and member_update.chat.type != ChatType.PRIVATE:
+                # Бота добавили или убрали из группы — это не про автора апдейта
+                member_update = None
+            if member_update is None:
+                self.user_registry.seen(user)
+            elif member_update.new_chat_member.status == ChatMemberStatus.KICKED:
+                # Пользователь заблокировал бота — это не повод считать его активным
+                self.user_registry.forget((user.id,))
+            else:
+                # Разблокировал: записать заново, даже если данные не менялись
+                self.user_registry.forget((user.id,))
+                self.user_registry.seen(user)
+        return await handler(event, data)
@@ -0,0 +1,148 @@
+"""
+Приём апдейтов через webhook: aiohttp-сервер, который отдаёт апдейты
+прямо в Dispatcher.feed_update.
+
+Эндпоинты:
+- POST WEBHOOK_PATH — апдейт от Telegram; проверяется заголовок
+  X-Telegram-Bot-Api-Secret-Token, если задан WEBHOOK_SECRET;
+- GET /healthz — проверка живости (включая доступность БД).
+
+Локально можно проверить без Telegram (WEBHOOK_URL пустой):
+    curl -X POST -H "Content-Type: application/json" \\
+         -H "X-Telegram-Bot-Api-Secret-Token: $WEBHOOK_SECRET" \\
+         -d @update.json http://localhost:8080/webhook
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+import asyncio
+import hmac
+import logging
+import signal
+
+import asyncpg
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from config import WebhookConfig
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+# Получатель сырого апдейта (dict из JSON Telegram).
+UpdateFeeder = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def dispatcher_feeder(bot: Bot, dp: Dispatcher) -> UpdateFeeder:
+    """
+    Получатель, который разбирает апдейт и передаёт его в диспетчер.
+    """
+
+    async def feed(raw: Dict[str, Any]) -> None:
+        update = Update.model_validate(raw, context={"bot": bot})
+        await dp.feed_update(bot, update)
+
+    return feed
+
+
+def create_webhook_app(
+    config: WebhookConfig,
+    feed: UpdateFeeder,
+    db_pool: Optional[asyncpg.pool.Pool] = None,
+) -> web.Application:
+    """
+    aiohttp-приложение с эндпоинтами webhook и /healthz.
+    Апдейт обрабатывается в фоне: Telegram сразу получает 200 и не ждёт хендлер.
+    """
+    app = web.Application()
+    tasks: Set[asyncio.Task] = set()
+    app["webhook_tasks"] = tasks
+
+    async def process(raw: Dict[str, Any]) -> None:
+        try:
+            await feed(raw)
+        except Exception:
+            logger.exception(f"Ошибка обработки апдейта {raw.get('update_id')}")
+
+    async def handle_update(request: web.Request) -> web.Response:
+        if config.secret and not hmac.compare_digest(
+            request.headers.get(SECRET_HEADER, ""), config.secret
+        ):
+            return web.Response(status=401)
+        try:
+            raw = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        if not isinstance(raw, dict):
+            return web.Response(status=400)
+
+        task = asyncio.create_task(process(raw))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        return web.Response()
+
+    async def health(request: web.Request) -> web.Response:
+        if db_pool is not None:
+            try:
+                async with db_pool.acquire(timeout=2) as conn:
+                    await conn.fetchval("SELECT 1")
+            except Exception as e:
+                return web.json_response({"status": "db_unavailable", "error": str(e)}, status=503)
+        return web.json_response({"status": "ok", "in_flight": len(tasks)})
+
+    app.router.add_post(config.path, handle_update)
+    app.router.add_get("/healthz", health)
+    return app
+
+
+async def wait_for_stop_signal() -> None:
+    """
+    Ждать SIGINT/SIGTERM.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows: остаётся KeyboardInterrupt
+            pass
+    await stop.wait()
+
+
+async def run_webhook(
+    bot: Bot,
+    dp: Dispatcher,
+    config: WebhookConfig,
+    db_pool: Optional[asyncpg.pool.Pool] = None,
+    feed: Optional[UpdateFeeder] = None,
+) -> None:
+    """
+    Запустить webhook-сервер и работать до сигнала остановки.
+    При остановке дожидается уже принятых апдейтов.
+    """
+    app = create_webhook_app(config, feed or dispatcher_feeder(bot, dp), db_pool)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, config.host, config.port)
+    await site.start()
+    logger.info(f"Webhook-сервер слушает {config.host}:{config.port}{config.path}")
+
+    if config.url:
+        await bot.set_webhook(
+            url=config.url.rstrip("/") + config.path,
+            secret_token=config.secret or None,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+        logger.info("Webhook зарегистрирован в Telegram")
+
+    await dp.emit_startup(bot=bot)
+    try:
+        await wait_for_stop_signal()
+    finally:
+        logger.info("Остановка webhook-сервера...")
+        await runner.cleanup()
+        tasks = app["webhook_tasks"]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        await dp.emit_shutdown(bot=bot)